@@ -1,13 +1,19 @@
 #!/usr/bin/env fish
 
-# Terminate already running bar instances
+# Terminate already running bar instances and the quota daemon
 killall -q polybar
+pkill -f "quota-daemon.py serve"
 
 # Wait until the processes have been shut down
 while pgrep -x polybar >/dev/null
     sleep 1
 end
 
+# The daemon pushes changed quota lines to the quota-* ipc modules, so the
+# bars spawn no process per interval
+uv run ~/.config/scripts/polybar/quota-daemon.py serve --ipc >/dev/null 2>&1 &
+disown
+
 for m in (polybar --list-monitors | cut -d":" -f1)
     set -x MONITOR $m
     polybar --reload top -r &
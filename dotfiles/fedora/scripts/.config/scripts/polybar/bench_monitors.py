@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""\
+bench_monitors.py
+
+End-to-end benchmark of the polybar monitors against replay_server.py.
+
+Each monitor runs as its own process rendering that one provider, the way
+a bar runs it, in a sandbox (HOME, XDG dirs, placeholder credentials) whose
+requests all go to an in-process ReplayServer. Due refreshes run inline,
+as in the resident daemon, so that they are measured. Every round runs it
+three times:
+
+  cold       empty quota cache, so the run fetches over HTTP
+  warm       straight after, so the run renders from the cache
+  unchanged  with the cache entry made due, so the run revalidates data the
+             server still has (a 304, or an identical body) and should not
+             parse anything
+
+and records the child's wall time, CPU time (user + system), peak RSS and
+the time its quota_trace "parse" spans took, plus the number of requests
+the server saw. The table shows medians over --runs rounds (peak RSS is
+the maximum); --json prints every sample for comparing runs. Latency,
+jitter, 429s and truncated bodies are passed on to the server.
+
+Usage: python3 bench_monitors.py [--runs N] [--latency MS] [--jitter MS]
+                                 [--rate-limit P] [--truncate P] [--seed N]
+                                 [--json] [provider ...]
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import quota
+from replay_server import ReplayServer
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+MODES = ("cold", "warm", "unchanged")
+# Renders the providers in argv without forking background refreshes.
+CHILD = ("import sys, quota, quota_cache; quota_cache.BACKGROUND_REFRESH = False; "
+         "sys.exit(quota.main(sys.argv[1:]))")
+ORG_ID = "org-bench"
+# Placeholder credentials; the replay server accepts anything.
+CREDENTIALS = {
+    "SYNTHETIC_API_KEY": "bench-synthetic",
+    "ZAI_API_KEY": "bench-zai",
+    "OPENROUTER_API_KEY": "bench-openrouter",
+    "NEURALWATT_API_KEY": "bench-neuralwatt",
+    "OPENWEATHER_API_KEY": "bench-weather",
+    "OPENCODE_GO_WORKSPACE_ID": "wrk_bench",
+    "OPENCODE_GO_AUTH_COOKIE": "bench-opencode",
+}
+
+
+def sandbox(root, base_url):
+    """The environment for monitor runs confined to `root`."""
+    env = {
+        "PATH": os.environ.get("PATH", ""),
+        "HOME": root,
+        "XDG_RUNTIME_DIR": os.path.join(root, "run"),
+        "XDG_STATE_HOME": os.path.join(root, "state"),
+        "XDG_DATA_HOME": os.path.join(root, "data"),
+        "XDG_CONFIG_HOME": os.path.join(root, "config"),
+        "QUOTA_BASE_URL": base_url,
+        **CREDENTIALS,
+    }
+    org_id_path = os.path.join(root, ".config", "anthropic", "org_id")
+    os.makedirs(os.path.dirname(org_id_path))
+    with open(org_id_path, "w") as f:
+        f.write(ORG_ID + "\n")
+    return env
+
+
+def reset_cache(env):
+    """Empty the quota cache, keeping claude-credits out of the browser.
+
+    Its cookie cache is seeded with a placeholder session, so the run
+    skips browser_cookie3 and measures the fetch alone.
+    """
+    import quota_cache
+
+    cache_dir = os.path.join(env["XDG_RUNTIME_DIR"], "quota-monitors")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(cache_dir, mode=0o700)
+    quota_cache.write_entry(os.path.join(cache_dir, "claude-credits-cookies.json"), {
+        "saved_at": time.time(),
+        "cookie_file": None,
+        "signature": None,
+        "cookies": {"sessionKey": "bench-claude"},
+    })
+
+
+def expire(env, provider):
+    """Make the provider's cached data due for a refresh, keeping the data
+    and the validators it was fetched with."""
+    import quota_cache
+
+    cache_dir = os.path.join(env["XDG_RUNTIME_DIR"], "quota-monitors")
+    for name in os.listdir(cache_dir):
+        if not (name.startswith(provider + "-") and name.endswith(".json")):
+            continue
+        path = os.path.join(cache_dir, name)
+        entry = quota_cache.read_entry(path)
+        if entry and "data" in entry:
+            entry["fetched_at"] = 0
+            if entry.get("schedule"):
+                entry["schedule"]["refresh_at"] = 0
+            quota_cache.write_entry(path, entry)
+
+
+def parse_time(env):
+    """Seconds of "parse" spans in the sandbox's trace log, which is then
+    removed."""
+    path = os.path.join(env["XDG_STATE_HOME"], "quota-monitors", "trace.jsonl")
+    try:
+        with open(path) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        os.unlink(path)
+    except FileNotFoundError:
+        return 0.0
+    return sum(record["spans"].get("parse", 0.0) for record in records)
+
+
+def run_once(provider, env):
+    """Run the monitor once: {wall, cpu, rss, parse, status, line}; times in
+    seconds, peak RSS in bytes."""
+    parse_time(env)
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", CHILD, provider], cwd=SCRIPT_DIR,
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    line = proc.stdout.read().decode(errors="replace").strip()
+    proc.stdout.close()
+    # wait4 rather than wait() for the child's own resource usage.
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "wall": wall,
+        "cpu": usage.ru_utime + usage.ru_stime,
+        "rss": usage.ru_maxrss * 1024,
+        "parse": parse_time(env),
+        "status": proc.returncode,
+        "line": line,
+    }
+
+
+def bench(providers, runs, server):
+    """Samples per (provider, mode): lists of run_once() results, each with
+    the number of `requests` the server answered during it."""
+    samples = {(provider, mode): [] for provider in providers for mode in MODES}
+    with tempfile.TemporaryDirectory(prefix="bench-monitors-") as root:
+        env = sandbox(root, server.base_url)
+        for _ in range(runs):
+            for provider in providers:
+                reset_cache(env)
+                for mode in MODES:
+                    if mode == "unchanged":
+                        expire(env, provider)
+                    before = sum(server.hits.values())
+                    result = run_once(provider, env)
+                    result["requests"] = sum(server.hits.values()) - before
+                    samples[provider, mode].append(result)
+    return samples
+
+
+def summarize(samples):
+    """One row per (provider, mode): medians of wall/cpu/parse/requests, peak
+    RSS and the number of failed runs."""
+    rows = []
+    for (provider, mode), results in samples.items():
+        rows.append({
+            "provider": provider,
+            "mode": mode,
+            "wall": statistics.median(r["wall"] for r in results),
+            "cpu": statistics.median(r["cpu"] for r in results),
+            "parse": statistics.median(r["parse"] for r in results),
+            "rss": max(r["rss"] for r in results),
+            "requests": statistics.median(r["requests"] for r in results),
+            "failed": sum(r["status"] != 0 for r in results),
+            "runs": len(results),
+        })
+    return rows
+
+
+def format_rows(rows):
+    """The summary as an aligned table."""
+    lines = [f"{'provider':<12} {'mode':<9} {'wall ms':>8} {'cpu ms':>8} {'parse ms':>8} "
+             f"{'rss MiB':>8} {'reqs':>5} {'failed':>7}"]
+    for row in rows:
+        lines.append(
+            f"{row['provider']:<12} {row['mode']:<9} {row['wall'] * 1000:>8.1f} "
+            f"{row['cpu'] * 1000:>8.1f} {row['parse'] * 1000:>8.2f} "
+            f"{row['rss'] / 2**20:>8.1f} {row['requests']:>5g} "
+            f"{row['failed']:>3}/{row['runs']:<3}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the monitors end to end.")
+    parser.add_argument("providers", nargs="*", metavar="provider",
+                        help=f"any of {', '.join(quota.PROVIDERS)} (default all)")
+    parser.add_argument("--runs", type=int, default=5, help="rounds per provider (default 5)")
+    parser.add_argument("--latency", type=float, default=0, help="server delay (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="+/- delay spread (ms)")
+    parser.add_argument("--rate-limit", type=float, default=0, metavar="P",
+                        help="probability of a 429")
+    parser.add_argument("--truncate", type=float, default=0, metavar="P",
+                        help="probability of a truncated body")
+    parser.add_argument("--seed", type=int, help="seed for jitter and faults")
+    parser.add_argument("--json", action="store_true", help="print every sample as JSON")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.providers if name not in quota.PROVIDERS]
+    if unknown or args.runs < 1:
+        parser.error(f"unknown provider: {', '.join(unknown)}" if unknown
+                     else "--runs must be at least 1")
+
+    providers = args.providers or list(quota.PROVIDERS)
+    with ReplayServer(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                      rate_limit=args.rate_limit, truncate=args.truncate,
+                      seed=args.seed) as server:
+        samples = bench(providers, args.runs, server)
+
+    if args.json:
+        print(json.dumps([{"provider": provider, "mode": mode, **result}
+                          for (provider, mode), results in samples.items()
+                          for result in results], indent=1))
+    else:
+        print(format_rows(summarize(samples)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -13,7 +13,7 @@ chmod 700 "$CONFIG_DIR"
 # Using theme-str to ensure prompt/message are visible (config.rasi doesn't include them in inputbar)
 ORG_ID=$(rofi -dmenu \
     -p " Org ID" \
-    -mesg "Paste your Anthropic Organization ID from platform.claude.com/settings/organization" \
+    -mesg "Paste your Anthropic Organization ID from platform.claude.com/settings/organization (several: separate with commas)" \
     -theme-str 'mainbox { children: [ message, inputbar ]; }' \
     -theme-str 'message { background-color: @background; text-color: @foreground; padding: 8px; }' \
     -theme-str 'inputbar { children: [ prompt, entry ]; }' \
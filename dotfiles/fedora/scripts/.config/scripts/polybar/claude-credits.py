@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # /// script
-# dependencies = ["browser-cookie3", "requests"]
+# dependencies = ["browser-cookie3"]
 # ///
 """\
 claude-credits.py
@@ -8,47 +8,200 @@ claude-credits.py
 Displays remaining Anthropic Claude prepaid credit balance.
 Uses browser_cookie3 to extract session cookies automatically from Firefox/Chrome.
 
-Usage: uv run claude-credits.py
+Decrypted cookies are cached in $XDG_RUNTIME_DIR until the browser's cookie
+DB changes, the TTL runs out, or the API answers 401/403. Chrome's derived
+decryption keys are kept in the kernel user keyring (via keyctl, if present)
+so re-reading a changed DB skips the Secret Service round trip.
+
+The org_id file may list several organizations (one per line, or separated
+by commas); the bar then shows their total balance (see quota_accounts.py).
+
+Usage: uv run claude-credits.py [--accounts]
 """
 
+import json
 import os
+import subprocess
 import sys
+import time
 
-import requests
-import browser_cookie3
+import quota_accounts
+import quota_forecast
+import quota_format
+import quota_trace
+from quota_cache import CACHE_DIR, DisplayError, cached_many, read_entry, write_entry
+from quota_http import HTTPError, cookie_header, get_json
+
+# Imported on first use: it pulls in the crypto and keyring stack, which a
+# warm run served from the cookie cache never needs.
+browser_cookie3 = None
 
 
 # Configuration
 ORG_ID_PATH = os.path.expanduser("~/.config/anthropic/org_id")
+CACHE_TTL = 600
+COOKIE_DOMAIN = "platform.claude.com"
+COOKIE_CACHE_PATH = os.path.join(CACHE_DIR, "claude-credits-cookies.json")
+COOKIE_CACHE_TTL = 6 * 3600
+KEYRING_DESC = "claude-credits:chrome-keys"
+KEYRING_TTL = 24 * 3600
+
+RED = quota_format.RED
+EXPIRED_TEXT = f"%{{F{RED}}}Expired%{{F-}}"
+ERROR_TEXT = quota_format.ERROR_TEXT
 
-# Colors (solarized scheme)
-RED = "#dc322f"
 
+def _browser_cookie3():
+    """Import browser_cookie3 on first use."""
+    global browser_cookie3
+    if browser_cookie3 is None:
+        import browser_cookie3 as module
+        browser_cookie3 = module
+    return browser_cookie3
 
-def get_org_id():
-    """Get organization ID from file."""
+
+def get_org_ids():
+    """Get the organization IDs listed in the org_id file."""
     try:
         with open(ORG_ID_PATH) as f:
-            return f.read().strip()
+            return quota_accounts.split(f.read())
     except FileNotFoundError:
+        return []
+
+
+# --------------------------------------------------------------------------- #
+# Cookie and key caches
+# --------------------------------------------------------------------------- #
+def _db_signature(path):
+    """(mtime, size) of a cookie DB and its WAL; None if the DB is gone."""
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
         return None
+    try:
+        wal = os.stat(path + "-wal")
+        wal_sig = [wal.st_mtime_ns, wal.st_size]
+    except OSError:
+        wal_sig = [0, 0]
+    return [st.st_mtime_ns, st.st_size] + wal_sig
 
 
-def get_browser_cookies():
-    """Extract cookies from Firefox or Chrome for platform.claude.com."""
-    # Try Firefox first (most reliable on Linux - no encryption issues)
+def load_cached_cookies():
+    """Return the cached decrypted cookies if their source DB is unchanged."""
+    entry = read_entry(COOKIE_CACHE_PATH)
+    if not entry or time.time() - entry.get("saved_at", 0) > COOKIE_CACHE_TTL:
+        return None
+    if _db_signature(entry.get("cookie_file")) != entry.get("signature"):
+        return None
+
+    return entry.get("cookies") or None
+
+
+def save_cached_cookies(cookie_file, cookies):
+    """Cache decrypted cookies along with the signature of their source DB."""
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    write_entry(COOKIE_CACHE_PATH, {
+        "saved_at": time.time(),
+        "cookie_file": cookie_file,
+        "signature": _db_signature(cookie_file),
+        "cookies": cookies,
+    })
+
+
+def invalidate_cookie_cache():
+    """Drop the cached cookies (after the API rejected them)."""
     try:
-        return browser_cookie3.firefox(domain_name="platform.claude.com")
-    except Exception:
+        os.unlink(COOKIE_CACHE_PATH)
+    except FileNotFoundError:
         pass
 
-    # Fallback to Chrome/Chromium
+
+def _keyring_read():
+    """Read Chrome's cached key state from the kernel user keyring."""
     try:
-        return browser_cookie3.chrome(domain_name="platform.claude.com")
-    except Exception:
+        result = subprocess.run(
+            ["keyctl", "pipe", f"%user:{KEYRING_DESC}"],
+            capture_output=True, timeout=2, check=True,
+        )
+        return json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def _keyring_write(state):
+    """Store Chrome's key state in the kernel user keyring with a timeout."""
+    try:
+        result = subprocess.run(
+            ["keyctl", "padd", "user", KEYRING_DESC, "@u"],
+            input=json.dumps(state).encode(), capture_output=True, timeout=2, check=True,
+        )
+        subprocess.run(
+            ["keyctl", "timeout", result.stdout.decode().strip(), str(KEYRING_TTL)],
+            capture_output=True, timeout=2,
+        )
+    except (OSError, subprocess.SubprocessError):
         pass
 
-    return None
+
+def _dump_chrome_state(chrome):
+    """Serialise a browser_cookie3.Chrome's derived keys and settings."""
+    state = {}
+    for name, value in vars(chrome).items():
+        if isinstance(value, bytes):
+            state[name] = {"hex": value.hex()}
+        elif value is None or isinstance(value, (str, int)):
+            state[name] = value
+    return state
+
+
+def _restore_chrome(state):
+    """Rebuild a browser_cookie3.Chrome from cached state, skipping the keyring."""
+    chrome_cls = _browser_cookie3().Chrome
+    chrome = chrome_cls.__new__(chrome_cls)
+    for name, value in state.items():
+        if isinstance(value, dict):
+            value = bytes.fromhex(value["hex"])
+        setattr(chrome, name, value)
+    return chrome
+
+
+def _load_chrome_cookies():
+    """Load Chrome cookies, reusing cached keys when they still decrypt."""
+    state = _keyring_read()
+    if state:
+        try:
+            chrome = _restore_chrome(state)
+            return chrome.load(), chrome.cookie_file
+        except Exception:
+            pass
+
+    chrome = _browser_cookie3().Chrome(domain_name=COOKIE_DOMAIN)
+    jar = chrome.load()
+    _keyring_write(_dump_chrome_state(chrome))
+    return jar, chrome.cookie_file
+
+
+def get_browser_cookies():
+    """Extract cookies from Firefox or Chrome for platform.claude.com.
+
+    Returns a name -> value dict. The decrypted result is cached against the
+    cookie DB it came from.
+    """
+    # Try Firefox first (most reliable on Linux - no encryption issues)
+    try:
+        firefox = _browser_cookie3().Firefox(domain_name=COOKIE_DOMAIN)
+        jar, cookie_file = firefox.load(), firefox.cookie_file
+    except Exception:
+        # Fallback to Chrome/Chromium
+        try:
+            jar, cookie_file = _load_chrome_cookies()
+        except Exception:
+            return None
+
+    cookies = {c.name: c.value for c in jar if c.value}
+    if cookies:
+        save_cached_cookies(cookie_file, cookies)
+    return cookies
 
 
 def fetch_balance(org_id, cookies):
@@ -57,48 +210,97 @@ def fetch_balance(org_id, cookies):
         "Accept": "application/json",
         "Referer": "https://platform.claude.com/settings/billing",
     }
-    response = requests.get(
+    headers["Cookie"] = cookie_header(cookies)
+    return get_json(
         f"https://platform.claude.com/api/organizations/{org_id}/prepaid/credits",
-        cookies=cookies,
         headers=headers,
         timeout=10,
     )
-    response.raise_for_status()
-    return response.json()
+
+
+def fetch_credits(org_id):
+    """Resolve browser cookies and fetch the balance for `org_id`.
+
+    Raises DisplayError for states the user has to act on (login, expiry).
+    """
+    # Warm runs reuse the cached cookies; a rejection re-reads the browser once.
+    with quota_trace.span("credentials"):
+        cookies = load_cached_cookies()
+    from_cache = cookies is not None
+    while True:
+        if cookies is None:
+            with quota_trace.span("credentials"):
+                cookies = get_browser_cookies()
+        if not cookies:
+            raise DisplayError("Login")
+
+        try:
+            return fetch_balance(org_id, cookies)
+        except HTTPError as e:
+            if e.status not in (401, 403):
+                raise
+            invalidate_cookie_cache()
+            if not from_cache:
+                raise DisplayError(EXPIRED_TEXT)
+        cookies, from_cache = None, False
+
+
+def format_balance(data):
+    """Format the prepaid balance (red only when below $5)."""
+    amount_cents = data.get("amount", 0)
+    balance_dollars = amount_cents / 100.0
+
+    if balance_dollars < 5:
+        return f"%{{F{RED}}}${balance_dollars:.2f}%{{F-}}"
+    return f"${balance_dollars:.2f}"
+
+
+def combine_balances(datas):
+    """Several organizations' balances as one, for the aggregate line."""
+    return {"amount": sum(data.get("amount", 0) for data in datas)}
+
+
+def format_account(data, forecast=None):
+    """The balance line, with a warning when `forecast` projects it to run
+    out within a week."""
+    return format_balance(data) + quota_forecast.warning(forecast, "balance")
+
+
+def schedule_windows(data):
+    """The prepaid balance as a single unbounded window for quota_schedule."""
+    return [(data.get("amount", 0), None, None)]
+
+
+def history_samples(data):
+    """The prepaid balance in dollars for quota_history."""
+    return {"balance": data.get("amount", 0) / 100.0}
+
+
+def render(detail=False):
+    """Resolve credentials, fetch and format the balance line (per-org lines
+    with `detail`).
+
+    Setup/login/expiry states are returned as text; other failures raise.
+    """
+    # Get org IDs
+    org_ids = get_org_ids()
+    if not org_ids:
+        return "Setup"
+
+    outcomes = cached_many("claude", org_ids, fetch_credits, CACHE_TTL,
+                           windows=schedule_windows, samples=history_samples)
+    with quota_trace.span("format"):
+        try:
+            return quota_accounts.render("claude", org_ids, outcomes, format_account,
+                                         combine_balances, detail=detail,
+                                         error_text=ERROR_TEXT)
+        except DisplayError as exc:
+            return exc.text
 
 
 def main():
-    # Get org ID
-    org_id = get_org_id()
-    if not org_id:
-        print("Setup")
-        sys.exit(0)
-
-    # Get cookies from browser
-    cookies = get_browser_cookies()
-    if not cookies:
-        print("Login")
-        sys.exit(0)
-
-    # Try to fetch balance
-    try:
-        data = fetch_balance(org_id, cookies)
-        amount_cents = data.get("amount", 0)
-        balance_dollars = amount_cents / 100.0
-
-        # Color red only when low balance (< $5)
-        if balance_dollars < 5:
-            print(f"%{{F{RED}}}${balance_dollars:.2f}%{{F-}}")
-        else:
-            print(f"${balance_dollars:.2f}")
-
-    except requests.HTTPError as e:
-        if e.response.status_code in (401, 403):
-            print(f"%{{F{RED}}}Expired%{{F-}}")
-        else:
-            print(f"%{{F{RED}}}?%{{F-}}")
-    except Exception:
-        print(f"%{{F{RED}}}?%{{F-}}")
+    detail = quota_accounts.wants_detail(sys.argv)
+    quota_format.print_line("claude", lambda: render(detail), ERROR_TEXT)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+"""Shared pytest setup for the polybar monitor tests."""
+import pytest
+
+import quota_trace
+
+
+@pytest.fixture(autouse=True)
+def trace_log(tmp_path, monkeypatch):
+    """Keep every test's timing spans out of the real quota_trace log."""
+    trace_dir = tmp_path / "trace"
+    monkeypatch.setattr(quota_trace, "TRACE_DIR", str(trace_dir))
+    monkeypatch.setattr(quota_trace, "TRACE_LOG", str(trace_dir / "trace.jsonl"))
+    return trace_dir / "trace.jsonl"
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(tmp_path, monkeypatch):
+    """Keep every test's Prometheus textfiles out of the real metrics dir."""
+    import quota_metrics
+
+    monkeypatch.setattr(quota_metrics, "METRICS_DIR", str(tmp_path / "metrics"))
+    return tmp_path / "metrics"
+
+
+@pytest.fixture(autouse=True)
+def snapshot_path(tmp_path_factory, monkeypatch):
+    """Keep every test's quota snapshot out of the real runtime dir."""
+    import quota_snapshot
+
+    path = tmp_path_factory.mktemp("snapshot") / "snapshot"
+    monkeypatch.setattr(quota_snapshot, "SNAPSHOT_PATH", str(path))
+    return path
+
+
+DEFAULT_ROUTE = (
+    "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+    "eth0\t00000000\t0102A8C0\t0003\t0\t0\t100\t00000000\t0\t0\t0\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def route_table(tmp_path_factory, monkeypatch):
+    """Give every test a default route, whatever the host's network is."""
+    import quota_network
+
+    path = tmp_path_factory.mktemp("net") / "route"
+    path.write_text(DEFAULT_ROUTE)
+    monkeypatch.setattr(quota_network, "ROUTE_FILES", (str(path),))
+    return path
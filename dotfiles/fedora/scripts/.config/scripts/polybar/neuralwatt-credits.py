@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # /// script
-# dependencies = ["requests"]
+# dependencies = []
 # ///
 """\
 neuralwatt-credits.py
@@ -8,19 +8,25 @@ neuralwatt-credits.py
 Displays remaining NeuralWatt Cloud credit balance (USD prepaid credits,
 not subscription usage). Intended for use in polybar.
 
-Usage: uv run neuralwatt-credits.py
+NEURALWATT_API_KEY may list several keys separated by commas; the bar then
+shows their total balance (see quota_accounts.py).
+
+Usage: uv run neuralwatt-credits.py [--accounts]
 """
 
-import os
 import sys
 
-import requests
+import quota_accounts
+import quota_forecast
+import quota_trace
+from quota_cache import cached_many
+from quota_format import ERROR_TEXT, RED, YELLOW, print_line
+from quota_http import get_json
 
 
-# Configuration (solarized scheme)
-RED = "#dc322f"
-YELLOW = "#b58900"
+# Configuration
 API_URL = "https://api.neuralwatt.com/v1/quota"
+CACHE_TTL = 300
 
 
 def fetch_balance(api_key):
@@ -30,9 +36,7 @@ def fetch_balance(api_key):
     balance field is absent.
     """
     headers = {"Authorization": f"Bearer {api_key}"}
-    response = requests.get(API_URL, headers=headers, timeout=10)
-    response.raise_for_status()
-    data = response.json()
+    data = get_json(API_URL, headers=headers, timeout=10)
     return data.get("balance", {}).get("credits_remaining_usd", 0)
 
 
@@ -48,19 +52,41 @@ def format_balance(balance):
     return f"${balance:.2f}"
 
 
+def format_account(balance, forecast=None):
+    """The balance line, with a warning when `forecast` projects it to run
+    out within a week."""
+    return format_balance(balance) + quota_forecast.warning(forecast, "balance")
+
+
+def schedule_windows(balance):
+    """The balance as a single unbounded window for quota_schedule."""
+    return [(balance, None, None)]
+
+
+def history_samples(balance):
+    """The remaining balance for quota_history."""
+    return {"balance": balance}
+
+
+def render(detail=False):
+    """Fetch and format the balance line (per-account lines with `detail`).
+
+    Raises on any failure.
+    """
+    api_keys = quota_accounts.from_env("NEURALWATT_API_KEY")
+    if not api_keys:
+        raise RuntimeError("NEURALWATT_API_KEY is not set")
+
+    outcomes = cached_many("neuralwatt", api_keys, fetch_balance, CACHE_TTL,
+                           windows=schedule_windows, samples=history_samples)
+    with quota_trace.span("format"):
+        return quota_accounts.render("neuralwatt", api_keys, outcomes, format_account, sum,
+                                     detail=detail, error_text=ERROR_TEXT)
+
+
 def main():
-    api_key = os.environ.get("NEURALWATT_API_KEY", '')
-
-    if not api_key:
-        print(f"%{{F{RED}}}?%{{F-}}")
-        sys.exit(1)
-
-    try:
-        balance = fetch_balance(api_key)
-        print(format_balance(balance))
-    except Exception:
-        print(f"%{{F{RED}}}?%{{F-}}")
-        sys.exit(1)
+    detail = quota_accounts.wants_detail(sys.argv)
+    sys.exit(print_line("neuralwatt", lambda: render(detail), ERROR_TEXT))
 
 
 if __name__ == "__main__":
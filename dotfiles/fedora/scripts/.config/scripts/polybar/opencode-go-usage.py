@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # /// script
-# dependencies = ["browser-cookie3", "requests"]
+# dependencies = ["browser-cookie3"]
 # ///
 """\
 opencode-go-usage.py
@@ -19,27 +19,36 @@ Credentials are resolved in this order (first non-empty wins):
                 ~/.config/opencode-bar/opencode-go.json  (cross-tool compat)
   Auth cookie:  OPENCODE_GO_AUTH_COOKIE env
                 ~/.config/opencode-bar/opencode-go.json  (cross-tool compat)
+                ~/.local/state/opencode-go-usage/cookies.json  (rotated jar)
                 browser cookies for opencode.ai (cookie name "auth")
 
 Usage: uv run opencode-go-usage.py
 """
 
-import glob
+import codecs
+import functools
 import json
 import os
-import re
 import shutil
-import sqlite3
 import sys
 import tempfile
-from datetime import datetime, timezone
+import time
+import urllib.parse
 
-import requests
+import quota_forecast
+import quota_trace
+from quota_cache import (
+    CACHE_DIR, DisplayError, cached, latest_forecast, mark_stale, read_entry,
+    write_entry,
+)
+from quota_format import ERROR_TEXT, RED, color_for_percent, format_countdown, print_line
+from quota_http import HTTPError
 
-try:
-    import browser_cookie3
-except Exception:
-    browser_cookie3 = None
+# http.cookiejar, browser_cookie3 and the modules only the browser paths use
+# (sqlite3, subprocess, ...) are imported inside the functions that need them:
+# a run served from the cache needs none of them, and an explicit
+# OPENCODE_GO_AUTH_COOKIE never touches a browser profile.
+browser_cookie3 = None
 
 
 # Configuration
@@ -51,17 +60,64 @@ COOKIE_NAME = "auth"
 # dashboard request. opencode.ai holds the Iron-sealed session cookie;
 # auth.opencode.ai holds the OpenAuth tokens used during the OAuth handshake.
 COOKIE_DOMAINS = ("opencode.ai", "auth.opencode.ai")
-FIREFOX_PROFILE_GLOB = os.path.expanduser("~/.mozilla/firefox/*")
-
-# Colors (solarized scheme, matching the other quota monitors)
-GREEN = "#2aa198"
-YELLOW = "#b58900"
-RED = "#dc322f"
+FIREFOX_DIR = os.path.expanduser("~/.mozilla/firefox")
+FIREFOX_PROFILE_GLOB = os.path.join(FIREFOX_DIR, "*")
+# Cookie rows per profile, keyed by the cookie DB's stat signature. Lives in
+# the runtime dir (tmpfs, 0700) since it holds session cookie values.
+FIREFOX_INDEX_PATH = os.path.join(CACHE_DIR, "opencode-go-firefox-index.json")
+# Our own copy of the session cookies, updated from every Set-Cookie the
+# dashboard sends, so steady-state runs never touch a browser database.
+COOKIE_JAR_PATH = os.path.join(
+    os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"),
+    "opencode-go-usage",
+    "cookies.json",
+)
+# browser_cookie3 loaders swept in step 5 of get_cookie_jar(), and where each
+# browser keeps its profile data; a missing dir means it isn't installed.
+BROWSER_LOADERS = ("chrome", "chromium", "brave", "edge", "firefox")
+BROWSER_DATA_DIRS = {
+    "chrome": "~/.config/google-chrome",
+    "chromium": "~/.config/chromium",
+    "brave": "~/.config/BraveSoftware/Brave-Browser",
+    "edge": "~/.config/microsoft-edge",
+    "firefox": "~/.mozilla/firefox",
+}
+BROWSER_SWEEP_WORKERS = 3
+BROWSER_SWEEP_DEADLINE = 8  # seconds, across all loaders
+# Extra time the sweep process gets to report before it is killed.
+BROWSER_SWEEP_GRACE = 2
+SWEEP_ARG = "--sweep-browsers"
+# Sources whose cookies rotate with the browser session and are worth keeping.
+PERSISTED_SOURCES = ("saved", "firefox", "browser")
+USAGE_FIELDS = ("rollingUsage", "weeklyUsage", "monthlyUsage")
+STREAM_CHUNK_SIZE = 16 * 1024
+# Hard limits so a malformed or enormous page can never stall the module:
+# usage objects are a few hundred bytes, the real page well under 1 MiB.
+MAX_OBJECT_LEN = 1024
+MAX_DASHBOARD_CHARS = 8 * 1024 * 1024
+# Longest tail that may hold an unfinished entity/escape chain (e.g. a
+# backslash followed by "&quot;"), and how much decoded text is kept between
+# chunks so a usage object split across them is still matched.
+ENTITY_HOLDBACK = 12
+SCAN_OVERLAP = 2048
+CACHE_TTL = 300
 
 
 # --------------------------------------------------------------------------- #
 # Credential resolution
 # --------------------------------------------------------------------------- #
+def _browser_cookie3():
+    """Import browser_cookie3 on first use; None if it is not installed."""
+    global browser_cookie3
+    if browser_cookie3 is None:
+        try:
+            import browser_cookie3 as module
+        except Exception:
+            return None
+        browser_cookie3 = module
+    return browser_cookie3
+
+
 def _read_opencode_bar_config():
     """Read the opencode-bar JSON config if present (cross-tool compatibility)."""
     try:
@@ -98,77 +154,346 @@ def get_workspace_id():
     return None
 
 
+def _firefox_profiles():
+    """Firefox profile directories, the default from profiles.ini first."""
+    import configparser
+    import glob
+
+    profiles = []
+    parser = configparser.RawConfigParser()
+    try:
+        parser.read(os.path.join(FIREFOX_DIR, "profiles.ini"))
+    except configparser.Error:
+        pass
+
+    # [Install<hash>] Default= is the profile Firefox actually launches;
+    # [Profile<n>] Default=1 is the legacy marker.
+    sections = parser.sections()
+    for section in sorted(sections, key=lambda name: not name.startswith("Install")):
+        if section.startswith("Install"):
+            path, relative = parser.get(section, "Default", fallback=None), True
+        elif parser.get(section, "Default", fallback="0") == "1":
+            path = parser.get(section, "Path", fallback=None)
+            relative = parser.get(section, "IsRelative", fallback="1") == "1"
+        else:
+            continue
+        if path:
+            profiles.append(os.path.join(FIREFOX_DIR, path) if relative else path)
+
+    for profile in sorted(glob.glob(FIREFOX_PROFILE_GLOB)):
+        if profile not in profiles:
+            profiles.append(profile)
+    return profiles
+
+
+def _cookie_db_signature(db_path):
+    """Cheap change signature for a cookies.sqlite and its WAL (one stat pair)."""
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    try:
+        wal = os.stat(db_path + "-wal")
+        wal_sig = [wal.st_mtime_ns, wal.st_size]
+    except OSError:
+        wal_sig = [0, 0]
+    return [st.st_mtime_ns, st.st_size] + wal_sig
+
+
+def _query_cookie_rows(con):
+    """Select the non-empty cookies for every domain in COOKIE_DOMAINS."""
+    domains = tuple(COOKIE_DOMAINS)
+    query = (
+        "SELECT name, value, host, path, isSecure FROM moz_cookies WHERE "
+        + " OR ".join(["host LIKE ?" for _ in domains])
+    )
+    rows = con.execute(query, [f"%{d}" for d in domains]).fetchall()
+    return [list(row) for row in rows if row[1]]
+
+
+def _read_cookie_rows_copy(src):
+    """Read cookie rows from a private copy of cookies.sqlite plus its WAL.
+
+    Fallback for when the live database refuses a read-only connection.
+    """
+    import sqlite3
+
+    tmp_dir = tempfile.mkdtemp(prefix="ocg-cookies-")
+    tmp_db = os.path.join(tmp_dir, "cookies.sqlite")
+    try:
+        shutil.copy2(src, tmp_db)
+        wal = src + "-wal"
+        if os.path.exists(wal):
+            shutil.copy2(wal, tmp_db + "-wal")
+
+        con = sqlite3.connect(tmp_db)
+        try:
+            con.execute("PRAGMA wal_checkpoint(FULL)")
+            return _query_cookie_rows(con)
+        finally:
+            con.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _read_cookie_rows(src):
+    """Read cookie rows straight from the live cookies.sqlite.
+
+    A read-only connection still consults the -wal journal through the shared
+    -shm index, so it sees the values Firefox is using without copying
+    anything or checkpointing.
+    """
+    import sqlite3
+
+    uri = "file:" + urllib.parse.quote(src) + "?mode=ro"
+    try:
+        con = sqlite3.connect(uri, uri=True)
+        try:
+            return _query_cookie_rows(con)
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return _read_cookie_rows_copy(src)
+
+
+def _new_jar(cookies=()):
+    """A stdlib CookieJar (what quota_client takes) holding `cookies`."""
+    from http.cookiejar import CookieJar
+
+    jar = CookieJar()
+    for cookie in cookies:
+        jar.set_cookie(cookie)
+    return jar
+
+
+def _cookie(name, value, domain=COOKIE_DOMAINS[0], path="/", secure=False, expires=None):
+    """An http.cookiejar.Cookie set for `domain` and `path`."""
+    from http.cookiejar import Cookie
+
+    return Cookie(
+        version=0, name=name, value=value, port=None, port_specified=False,
+        domain=domain, domain_specified=bool(domain),
+        domain_initial_dot=domain.startswith("."), path=path, path_specified=True,
+        secure=secure, expires=expires, discard=expires is None, comment=None,
+        comment_url=None, rest={},
+    )
+
+
 def _read_firefox_cookies_live():
-    """Read cookies from Firefox with WAL checkpointing.
+    """Read live cookies from Firefox, preferring the default profile.
 
     browser_cookie3 opens cookies.sqlite without the accompanying -wal journal,
     so while Firefox is running it reads stale cookie values. OpenCode's OpenAuth
     session cookie rotates frequently, and the stale value is rejected (the
-    dashboard redirects to a login page). Copying cookies.sqlite together with
-    cookies.sqlite-wal into a temp DB and running a WAL checkpoint gives the
-    live values Firefox is actually using.
+    dashboard redirects to a login page), so the database is opened read-only
+    and WAL-aware instead.
+
+    Rows are indexed by each database's (mtime, size, wal mtime, wal size), so
+    an unchanged profile costs one stat pair and no SQLite work at all. The
+    first profile holding the auth cookie wins.
 
-    Returns a requests RequestsCookieJar spanning every domain in COOKIE_DOMAINS.
+    Returns a CookieJar spanning every domain in COOKIE_DOMAINS.
     """
-    jar = requests.cookies.RequestsCookieJar()
-    domains = tuple(COOKIE_DOMAINS)
+    jar = _new_jar()
+    index = read_entry(FIREFOX_INDEX_PATH) or {}
+    changed = False
 
-    for profile in glob.glob(FIREFOX_PROFILE_GLOB):
+    for profile in _firefox_profiles():
         src = os.path.join(profile, "cookies.sqlite")
-        if not os.path.exists(src):
+        signature = _cookie_db_signature(src)
+        if signature is None:
             continue
 
-        tmp_dir = tempfile.mkdtemp(prefix="ocg-cookies-")
-        tmp_db = os.path.join(tmp_dir, "cookies.sqlite")
-        try:
-            shutil.copy2(src, tmp_db)
-            wal = src + "-wal"
-            if os.path.exists(wal):
-                shutil.copy2(wal, tmp_db + "-wal")
+        cached = index.get(src)
+        if cached and cached.get("signature") == signature:
+            rows = cached["rows"]
+        else:
+            try:
+                rows = _read_cookie_rows(src)
+            except Exception:
+                continue
+            index[src] = {"signature": signature, "rows": rows}
+            changed = True
+
+        for name, value, host, path, secure in rows:
+            jar.set_cookie(_cookie(name, value, host, path, bool(secure)))
+        if any(row[0] == COOKIE_NAME for row in rows):
+            break
+
+    if changed:
+        os.makedirs(os.path.dirname(FIREFOX_INDEX_PATH), mode=0o700, exist_ok=True)
+        write_entry(FIREFOX_INDEX_PATH, index)
+    return jar
 
-            con = sqlite3.connect(tmp_db)
-            con.execute("PRAGMA wal_checkpoint(FULL)")
-            cur = con.cursor()
-            query = (
-                "SELECT name, value, host, path, isSecure FROM moz_cookies WHERE "
-                + " OR ".join(["host LIKE ?" for _ in domains])
-            )
-            cur.execute(query, [f"%{d}" for d in domains])
-            for name, value, host, path, secure in cur.fetchall():
-                if not value:
-                    continue
-                jar.set(name, value, domain=host, path=path, secure=bool(secure))
-            con.close()
+
+@functools.lru_cache(maxsize=None)
+def _installed_browsers():
+    """Loaders whose browser has a profile directory on this machine."""
+    return tuple(
+        name for name in BROWSER_LOADERS
+        if os.path.isdir(os.path.expanduser(BROWSER_DATA_DIRS[name]))
+    )
+
+
+def _load_browser_cookies(loader_name):
+    """Every non-empty opencode cookie one browser_cookie3 loader can see."""
+    loader = getattr(_browser_cookie3(), loader_name, None)
+    cookies = []
+    if loader is None:
+        return cookies
+    for domain in COOKIE_DOMAINS:
+        try:
+            cookies.extend(c for c in loader(domain_name=domain) if c.value)
         except Exception:
             continue
-        finally:
-            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return cookies
 
+
+def _sweep_loaders(names):
+    """Run the browser_cookie3 loaders for `names` in parallel and return the
+    cookies of the first browser with the auth cookie, or None.
+
+    This runs in the sweep process (see _sweep_browsers()). Each loader may
+    unlock a keyring and decrypt a database, so they run on a small pool of
+    daemon threads under one overall deadline. As soon as one browser yields
+    the auth cookie the remaining loaders are not started, and any still in
+    flight are abandoned rather than waited for.
+    """
+    import queue
+    import threading
+
+    pending = queue.Queue()
+    for name in names:
+        pending.put(name)
+    results = queue.Queue()
+    done = threading.Event()
+
+    def worker():
+        while not done.is_set():
+            try:
+                name = pending.get_nowait()
+            except queue.Empty:
+                return
+            results.put(_load_browser_cookies(name))
+
+    for _ in range(min(len(names), BROWSER_SWEEP_WORKERS)):
+        threading.Thread(target=worker, daemon=True).start()
+
+    deadline = time.monotonic() + BROWSER_SWEEP_DEADLINE
+    try:
+        for _ in names:
+            try:
+                cookies = results.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if any(c.name == COOKIE_NAME for c in cookies):
+                return cookies
+    finally:
+        done.set()
+    return None
+
+
+def _sweep_command():
+    """The command that runs the sweep: this script with SWEEP_ARG."""
+    return [sys.executable, os.path.realpath(__file__), SWEEP_ARG]
+
+
+def _sweep_browsers():
+    """Sweep the installed browsers for the auth cookie; first hit wins.
+
+    The loaders run in a child process, which is killed if it overruns the
+    deadline. A loader stuck on a keyring or a locked database therefore
+    never leaves a thread behind in this process, which quota_cache may
+    still fork for a background refresh.
+    """
+    import subprocess
+
+    if not _installed_browsers():
+        return None
+    try:
+        proc = subprocess.run(_sweep_command(), capture_output=True, text=True,
+                              timeout=BROWSER_SWEEP_DEADLINE + BROWSER_SWEEP_GRACE)
+        cookies = json.loads(proc.stdout)
+    except (subprocess.TimeoutExpired, OSError, ValueError):
+        return None
+    if not cookies:
+        return None
+    return _new_jar(_cookie(c["name"], c["value"], c["domain"], c["path"]) for c in cookies)
+
+
+def _sweep_main():
+    """Body of the sweep process: print the cookies found as JSON."""
+    cookies = _sweep_loaders(_installed_browsers()) or []
+    print(json.dumps([{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path}
+                      for c in cookies]), flush=True)
+    # Exit at once: loaders abandoned at the deadline may still be running.
+    os._exit(0)
+
+
+def load_saved_jar():
+    """Load the persisted cookie jar, dropping cookies that have expired."""
+    entry = read_entry(COOKIE_JAR_PATH)
+    if not entry:
+        return None
+
+    jar = _new_jar()
+    for item in entry.get("cookies", []):
+        try:
+            cookie = _cookie(item["name"], item["value"], item["domain"],
+                             item.get("path", "/"), bool(item.get("secure")),
+                             item.get("expires"))
+        except (KeyError, TypeError, AttributeError):
+            continue
+        if not cookie.is_expired():
+            jar.set_cookie(cookie)
     return jar
 
 
-def get_cookie_jar():
+def save_jar(jar):
+    """Persist the opencode.ai cookies in `jar`, rotated values included."""
+    cookies = [
+        {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+         "secure": c.secure, "expires": c.expires}
+        for c in jar
+        if c.value and c.domain.lstrip(".").endswith(COOKIE_DOMAINS[0])
+    ]
+    os.makedirs(os.path.dirname(COOKIE_JAR_PATH), mode=0o700, exist_ok=True)
+    write_entry(COOKIE_JAR_PATH, {"cookies": cookies})
+
+
+def clear_saved_jar():
+    """Forget the persisted jar after the dashboard has rejected it."""
+    try:
+        os.unlink(COOKIE_JAR_PATH)
+    except FileNotFoundError:
+        pass
+
+
+def get_cookie_jar(use_saved=True):
     """Build a cookie jar for the authenticated dashboard request.
 
     Resolution order (first source yielding the auth cookie wins):
       1. OPENCODE_GO_AUTH_COOKIE env (single value, or a full "name=value; ..." string).
       2. ~/.config/opencode-bar/opencode-go.json (cross-tool compatibility).
-      3. Firefox cookies read with WAL checkpointing (live values).
-      4. browser_cookie3 fallback (Chrome/Chromium/Brave/Edge, then Firefox).
+      3. The persisted jar from the last successful run (skipped if not use_saved).
+      4. Firefox cookies read live from the default profile (WAL-aware).
+      5. browser_cookie3 fallback (Chrome/Chromium/Brave/Edge, then Firefox).
+
+    Returns (jar, source), or (None, None) when no source has the auth cookie.
     """
     # 1. Explicit env var.
     env = os.environ.get("OPENCODE_GO_AUTH_COOKIE", "").strip()
     if env:
-        jar = requests.cookies.RequestsCookieJar()
+        jar = _new_jar()
         if "=" in env:
             for part in env.split(";"):
                 name, _, val = part.strip().partition("=")
                 if name and val:
-                    jar.set(name, val, domain=COOKIE_DOMAINS[0], path="/")
+                    jar.set_cookie(_cookie(name, val))
         else:
-            jar.set(COOKIE_NAME, env, domain=COOKIE_DOMAINS[0], path="/")
+            jar.set_cookie(_cookie(COOKIE_NAME, env))
         if len(jar):
-            return jar
+            return jar, "env"
 
     # 2. opencode-bar JSON config.
     config = _read_opencode_bar_config()
@@ -176,37 +501,29 @@ def get_cookie_jar():
         for key in ("authCookie", "auth_cookie", "cookie"):
             value = config.get(key)
             if isinstance(value, str) and value.strip():
-                jar = requests.cookies.RequestsCookieJar()
-                jar.set(COOKIE_NAME, value.strip(), domain=COOKIE_DOMAINS[0], path="/")
-                return jar
+                return _new_jar([_cookie(COOKIE_NAME, value.strip())]), "config"
 
-    # 3. Firefox (live, WAL-checkpointed).
+    # 3. Persisted jar.
+    if use_saved:
+        jar = load_saved_jar()
+        if jar is not None and any(c.name == COOKIE_NAME for c in jar):
+            return jar, "saved"
+
+    # 4. Firefox (live, read-only, WAL-aware).
     try:
         jar = _read_firefox_cookies_live()
         if any(c.name == COOKIE_NAME for c in jar):
-            return jar
+            return jar, "firefox"
     except Exception:
         pass
 
-    # 4. browser_cookie3 fallback for other browsers.
-    if browser_cookie3 is not None:
-        jar = requests.cookies.RequestsCookieJar()
-        for domain in COOKIE_DOMAINS:
-            for loader_name in ("chrome", "chromium", "brave", "edge", "firefox"):
-                loader = getattr(browser_cookie3, loader_name, None)
-                if loader is None:
-                    continue
-                try:
-                    for cookie in loader(domain_name=domain):
-                        if cookie.value:
-                            jar.set(cookie.name, cookie.value,
-                                    domain=cookie.domain, path=cookie.path)
-                except Exception:
-                    continue
-        if any(c.name == COOKIE_NAME for c in jar):
-            return jar
+    # 5. browser_cookie3 fallback for other browsers.
+    if _browser_cookie3() is not None:
+        jar = _sweep_browsers()
+        if jar is not None:
+            return jar, "browser"
 
-    return None
+    return None, None
 
 
 # --------------------------------------------------------------------------- #
@@ -218,7 +535,7 @@ def get_cookie_jar():
 # or as Solid resource refs ($R[31]={...rollingUsage:$R[31]={status:"ok",...}}).
 # --------------------------------------------------------------------------- #
 def normalize_html(html):
-    """Decode HTML entities and escaped quotes so the regexes can match both forms."""
+    """Decode HTML entities and escaped quotes so both forms parse the same way."""
     for encoded, decoded in (
         ("&quot;", '"'),
         ("&#34;", '"'),
@@ -232,31 +549,107 @@ def normalize_html(html):
     return html
 
 
+def _skip_ws(text, i):
+    """Index of the first non-whitespace character at or after i."""
+    n = len(text)
+    while i < n and text[i].isspace():
+        i += 1
+    return i
+
+
+def _key_values(text, key):
+    """Yield the index of the value after each `key["']?\\s*:\\s*` in text.
+
+    Matching is done with str.find and a forward-only cursor rather than a
+    regex, so the whole search is linear in len(text): the whitespace skipped
+    after one occurrence can never be rescanned for the next.
+    """
+    n = len(text)
+    pos = 0
+    while True:
+        i = text.find(key, pos)
+        if i < 0:
+            return
+        pos = i + len(key)
+        j = pos + 1 if pos < n and text[pos] in "\"'" else pos
+        j = _skip_ws(text, j)
+        if j < n and text[j] == ":":
+            yield _skip_ws(text, j + 1)
+
+
+def _skip_resource_ref(text, i):
+    """Skip a Solid `$R[n]=` prefix at i, if present."""
+    if not text.startswith("$R[", i):
+        return i
+    j = i + 3
+    digits = j
+    while j < len(text) and text[j].isdecimal():
+        j += 1
+    if j == digits or not text.startswith("]", j):
+        return i
+    j = _skip_ws(text, j + 1)
+    if not text.startswith("=", j):
+        return i
+    return _skip_ws(text, j + 1)
+
+
 def _capture_object_body(text, field_name):
-    """Capture the flat object body following `field_name:` (handles $R[n]= prefix)."""
-    pattern = (
-        r'''["']?''' + re.escape(field_name) + r'''["']?\s*:\s*(?:\$R\[\d+\]\s*=\s*)?\{([^{}]*)\}'''
-    )
-    match = re.search(pattern, text, re.DOTALL)
-    return match.group(1) if match else None
+    """Capture the flat object body following `field_name:` (handles $R[n]= prefix).
+
+    Only flat objects (no nested braces) of at most MAX_OBJECT_LEN characters
+    count. The positions of the next "{" and "}" are cached and only ever move
+    forward, so many unterminated candidates still cost one pass over text.
+    """
+    next_open = next_close = -1
+    for i in _key_values(text, field_name):
+        i = _skip_resource_ref(text, i)
+        if not text.startswith("{", i):
+            continue
+        if next_close <= i:
+            next_close = text.find("}", i + 1)
+            if next_close < 0:
+                return None
+        if next_open <= i:
+            next_open = text.find("{", i + 1)
+            if next_open < 0:
+                next_open = len(text)
+        if next_open < next_close or next_close - i > MAX_OBJECT_LEN:
+            continue
+        return text[i + 1:next_close]
+    return None
 
 
 def _capture_number(body, field_name):
     """Capture a numeric value (quoted or unquoted) from a parsed object body."""
-    pattern = r'''["']?''' + re.escape(field_name) + r'''["']?\s*:\s*"?(-?\d+(?:\.\d+)?)"?'''
-    match = re.search(pattern, body)
-    if not match:
-        return None
-    try:
-        return float(match.group(1))
-    except ValueError:
-        return None
+    for i in _key_values(body, field_name):
+        if body.startswith('"', i):
+            i += 1
+        j = i + 1 if body.startswith("-", i) else i
+        digits = j
+        while j < len(body) and body[j].isdecimal():
+            j += 1
+        if j == digits:
+            continue
+        if body.startswith(".", j) and j + 1 < len(body) and body[j + 1].isdecimal():
+            j += 1
+            while j < len(body) and body[j].isdecimal():
+                j += 1
+        try:
+            return float(body[i:j])
+        except ValueError:
+            return None
+    return None
 
 
 def _capture_status(body):
     """Capture the status string if present (e.g. "ok", "rate-limited")."""
-    match = re.search(r'''["']?status["']?\s*:\s*"([^"]*)"''', body)
-    return match.group(1) if match else None
+    for i in _key_values(body, "status"):
+        if body.startswith('"', i):
+            end = body.find('"', i + 1)
+            if end < 0:
+                return None
+            return body[i + 1:end]
+    return None
 
 
 def parse_window(text, field_name):
@@ -278,43 +671,98 @@ def parse_window(text, field_name):
 
 
 def parse_use_balance(text):
-    """Detect whether the workspace has "use Zen balance" enabled."""
-    return bool(re.search(r'''["']?useBalance["']?\s*:\s*(?:true|!0)''', text))
+    """Detect whether the workspace has "use Zen balance" enabled.
+
+    Returns None until the flag has been seen, so a streaming caller can tell
+    "false" from "not yet".
+    """
+    for i in _key_values(text, "useBalance"):
+        for literal, value in (("true", True), ("!0", True), ("false", False), ("!1", False)):
+            if text.startswith(literal, i):
+                return value
+    return None
+
+
+def _entity_tail(text):
+    """Index where a possibly unfinished entity or escape at the end starts.
+
+    Everything from there on is held back until the next chunk arrives, so
+    normalize_html() never sees half of "&quot;" or "\\u0022".
+    """
+    for i in range(max(0, len(text) - ENTITY_HOLDBACK), len(text)):
+        if text[i] in "&\\":
+            return i
+    return len(text)
+
+
+class DashboardScanner:
+    """Incremental extractor for the usage windows embedded in the dashboard.
+
+    Chunks are entity-decoded as they arrive and only a short overlap of the
+    decoded text is kept between chunks, so memory stays bounded no matter
+    how large the page is. feed() returns True once every usage window and
+    the useBalance flag have been found and the rest of the page can be
+    skipped.
+    """
+
+    def __init__(self):
+        self.found = {}
+        self._carry = ""
+        self._text = ""
+
+    @property
+    def done(self):
+        return len(self.found) == len(USAGE_FIELDS) + 1
+
+    def feed(self, chunk):
+        text = self._carry + chunk
+        cut = _entity_tail(text)
+        self._carry = text[cut:]
+        self._scan(normalize_html(text[:cut]))
+        return self.done
+
+    def close(self):
+        """Flush held-back text and return the usage dict (see parse_dashboard)."""
+        self._scan(normalize_html(self._carry))
+        self._carry = ""
+        usage = {field_name: self.found.get(field_name) for field_name in USAGE_FIELDS}
+        usage["useBalance"] = bool(self.found.get("useBalance"))
+        return usage
+
+    def _scan(self, decoded):
+        # Objects are at most MAX_OBJECT_LEN characters, so a match can only
+        # straddle a chunk boundary by less than SCAN_OVERLAP characters.
+        self._text = self._text[-SCAN_OVERLAP:] + decoded
+        for field_name in USAGE_FIELDS:
+            if field_name not in self.found:
+                window = parse_window(self._text, field_name)
+                if window:
+                    self.found[field_name] = window
+        if "useBalance" not in self.found:
+            use_balance = parse_use_balance(self._text)
+            if use_balance is not None:
+                self.found["useBalance"] = use_balance
 
 
 # --------------------------------------------------------------------------- #
 # Formatting (matches the synthetic / zai monitor styling)
 # --------------------------------------------------------------------------- #
-def format_time_remaining(seconds):
-    """Format seconds remaining until window reset in compact form."""
-    if seconds is None or seconds <= 0:
-        return "now"
-
-    minutes = int(seconds // 60)
-    hours = int(minutes // 60)
-    days = int(hours // 24)
-    minutes %= 60
-    hours %= 24
-
-    if days > 0:
-        return f"{days}d {hours}h"
-    elif hours > 0:
-        return f"{hours}h {minutes}m"
-    else:
-        return f"{minutes}m"
-
-
-def color_for_percent(remaining_percent):
-    """Return color based on percentage remaining (matches zai/synthetic monitors)."""
-    if remaining_percent > 50:
-        return GREEN
-    elif remaining_percent >= 20:
-        return YELLOW
-    return RED
-
-
-def format_window(window, icon=""):
-    """Format a single usage window: icon + colored percent + time to reset."""
+def reset_in(window, now=None):
+    """Seconds until a window resets, counted from its absolute resetAt.
+
+    Falls back to the dashboard's relative resetInSec for windows that were
+    never anchored to a fetch time.
+    """
+    if "resetAt" not in window:
+        return window["resetInSec"]
+    return window["resetAt"] - (time.time() if now is None else now)
+
+
+def format_window(window, icon="", warning=""):
+    """Format a single usage window: icon + colored percent + time to reset.
+
+    `warning` (from quota_forecast) is appended unless already rate-limited.
+    """
     if not window:
         return ""
 
@@ -328,86 +776,182 @@ def format_window(window, icon=""):
         return f"{prefix}%{{F{RED}}}{int(remaining_percent)}%%{{F-}} [lim]"
 
     color = color_for_percent(remaining_percent)
-    time_str = format_time_remaining(window["resetInSec"])
-    return f"{prefix}%{{F{color}}}{int(remaining_percent)}%%{{F-}} [{time_str}]"
+    time_str = format_countdown(reset_in(window))
+    return f"{prefix}%{{F{color}}}{int(remaining_percent)}%%{{F-}} [{time_str}]{warning}"
 
 
 # --------------------------------------------------------------------------- #
 # Main
 # --------------------------------------------------------------------------- #
-def main():
-    workspace_id = get_workspace_id()
-    if not workspace_id:
-        # Mirrors claude-credits.py: prompt the user to run the setup action.
-        print("Setup")
-        sys.exit(0)
+EXPIRED_TEXT = f"%{{F{RED}}}Expired%{{F-}}"
+
 
-    cookie_jar = get_cookie_jar()
+def fetch_dashboard(workspace_id, cookie_jar):
+    """Stream the authenticated dashboard and parse its usage windows.
+
+    The body is fed to a DashboardScanner as it downloads (over a pooled
+    quota_client connection) and the connection is closed as soon as every
+    field has been found. Cookies set by the
+    response (and any redirect hops) are merged into `cookie_jar` in place.
+    Raises DisplayError(EXPIRED_TEXT) when the session cookie was rejected
+    (redirect onto the auth host, or a 401/403), and HTTPError on any other
+    error status. Other failures raise as-is.
+    """
+    import quota_client
+
+    headers = {
+        "Accept": "text/html,application/xhtml+xml",
+        "Referer": "https://opencode.ai/",
+        "User-Agent": (
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+        ),
+    }
+    response = quota_client.request(
+        DASHBOARD_URL_TMPL.format(workspace_id=workspace_id),
+        headers=headers,
+        timeout=15,
+        cookie_jar=cookie_jar,
+    )
+    with response:
+        # A redirect onto the auth host (or a 401/403) means the session cookie
+        # was rejected (expired, rotated, or stale). Surface that specifically
+        # rather than a generic parse failure.
+        if response.url.startswith("https://auth.opencode.ai/"):
+            raise DisplayError(EXPIRED_TEXT)
+        if response.status in (401, 403):
+            raise DisplayError(EXPIRED_TEXT)
+        if response.status >= 400:
+            raise HTTPError(response.status, dict(response.headers))
+
+        charset = response.headers.get_content_charset() or "utf-8"
+        decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+        scanner = DashboardScanner()
+        read = 0
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            text = decoder.decode(chunk)
+            read += len(text)
+            with quota_trace.span("parse"):
+                done = scanner.feed(text)
+            if done or read >= MAX_DASHBOARD_CHARS:
+                break
+        with quota_trace.span("parse"):
+            return scanner.close()
+
+
+def parse_dashboard(html):
+    """Extract every usage window plus the Zen balance flag from the page."""
+    scanner = DashboardScanner()
+    scanner.feed(html)
+    return scanner.close()
+
+
+def fetch_usage(workspace_id):
+    """Resolve cookies, fetch the dashboard and parse its usage windows.
+
+    The jar is saved after every successful fetch so rotated session cookies
+    carry over to the next run. Only when the saved jar is rejected do we go
+    back to the browser, once.
+    """
+    with quota_trace.span("credentials"):
+        cookie_jar, source = get_cookie_jar()
     if cookie_jar is None:
-        print("Login")
-        sys.exit(0)
+        raise DisplayError("Login")
 
-    # Fetch the authenticated dashboard HTML.
     try:
-        headers = {
-            "Accept": "text/html,application/xhtml+xml",
-            "Referer": "https://opencode.ai/",
-            "User-Agent": (
-                "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-                "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
-            ),
-        }
-        session = requests.Session()
-        session.cookies = cookie_jar
-        response = session.get(
-            DASHBOARD_URL_TMPL.format(workspace_id=workspace_id),
-            headers=headers,
-            timeout=15,
-        )
-        # A redirect onto the auth host means the session cookie was rejected
-        # (expired, rotated, or stale). Surface that specifically rather than a
-        # generic parse failure.
-        if response.url.startswith("https://auth.opencode.ai/"):
-            print(f"%{{F{RED}}}Expired%{{F-}}")
-            sys.exit(0)
-        response.raise_for_status()
-        html = response.text
-    except requests.HTTPError as exc:
-        if exc.response is not None and exc.response.status_code in (401, 403):
-            print(f"%{{F{RED}}}Expired%{{F-}}")
-        else:
-            print(f"%{{F{RED}}}?%{{F-}}")
-        sys.exit(0)
-    except Exception:
-        print(f"%{{F{RED}}}?%{{F-}}")
-        sys.exit(0)
+        usage = fetch_dashboard(workspace_id, cookie_jar)
+    except DisplayError:
+        if source != "saved":
+            raise
+        clear_saved_jar()
+        with quota_trace.span("credentials"):
+            cookie_jar, source = get_cookie_jar(use_saved=False)
+        if cookie_jar is None:
+            raise DisplayError("Login")
+        usage = fetch_dashboard(workspace_id, cookie_jar)
+
+    if source in PERSISTED_SOURCES:
+        save_jar(cookie_jar)
+
+    # The dashboard's resetInSec is relative to this response. Anchor it so
+    # the countdown can be re-rendered from the cache without refetching.
+    fetched_at = time.time()
+    for field_name in USAGE_FIELDS:
+        window = usage.get(field_name)
+        if window:
+            window["resetAt"] = fetched_at + window["resetInSec"]
+    return usage
+
+
+def format_usage(usage, forecast=None):
+    """Format the parsed usage windows as a single polybar line.
+
+    `forecast` is the quota_forecast state used for exhaustion warnings.
+    """
+    now = time.time()
+    parts = []
+    for field_name, icon in (
+        ("rollingUsage", "\uf017"),   # clock  -> 5-hour window
+        ("weeklyUsage", "\uf073"),    # calendar -> weekly window
+        ("monthlyUsage", "\uf133"),   # calendar-o -> monthly window
+    ):
+        window = usage.get(field_name)
+        if window:
+            warning = quota_forecast.warning(forecast, field_name.removesuffix("Usage"),
+                                             now + reset_in(window, now), now)
+            parts.append(format_window(window, icon=icon, warning=warning))
+
+    if usage.get("useBalance"):
+        parts.append("\uf155")  # dollar icon -> Zen balance fallback enabled
+
+    if not parts:
+        return ERROR_TEXT
+
+    return " \u00b7 ".join(parts)  # middle-dot separator, like zai/synthetic
+
+
+def schedule_windows(usage):
+    """Usage windows as (level, fraction remaining, reset time) for quota_schedule."""
+    now = time.time()
+    windows = []
+    for field_name in USAGE_FIELDS:
+        window = usage.get(field_name)
+        if window:
+            used = window["usagePercent"]
+            windows.append((used, max(0, 100 - used) / 100, now + reset_in(window, now)))
+    return windows
+
+
+def history_samples(usage):
+    """Percent remaining of each usage window for quota_history."""
+    return {field_name.removesuffix("Usage"): max(0, 100 - usage[field_name]["usagePercent"])
+            for field_name in USAGE_FIELDS if usage.get(field_name)}
+
+
+def render():
+    """Resolve credentials, fetch the dashboard and format the usage line.
+
+    Setup/login/expiry states are returned as text; other failures raise.
+    """
+    workspace_id = get_workspace_id()
+    if not workspace_id:
+        # Mirrors claude-credits.py: prompt the user to run the setup action.
+        return "Setup"
 
-    # Parse usage windows from the embedded dashboard JSON.
     try:
-        text = normalize_html(html)
-
-        parts = []
-        for field_name, icon in (
-            ("rollingUsage", "\uf017"),   # clock  -> 5-hour window
-            ("weeklyUsage", "\uf073"),    # calendar -> weekly window
-            ("monthlyUsage", "\uf133"),   # calendar-o -> monthly window
-        ):
-            window = parse_window(text, field_name)
-            if window:
-                parts.append(format_window(window, icon=icon))
-
-        if parse_use_balance(text):
-            parts.append("\uf155")  # dollar icon -> Zen balance fallback enabled
-
-        if not parts:
-            print(f"%{{F{RED}}}?%{{F-}}")
-            sys.exit(0)
-
-        print(" \u00b7 ".join(parts))  # middle-dot separator, like zai/synthetic
-
-    except (KeyError, TypeError, ValueError):
-        print(f"%{{F{RED}}}?%{{F-}}")
-        sys.exit(0)
+        usage, stale = cached("opencode-go", workspace_id,
+                              lambda: fetch_usage(workspace_id), CACHE_TTL,
+                              windows=schedule_windows, samples=history_samples)
+    except DisplayError as exc:
+        return exc.text
+    with quota_trace.span("format"):
+        return mark_stale(format_usage(usage, latest_forecast("opencode-go")), stale)
+
+
+def main():
+    if sys.argv[1:] == [SWEEP_ARG]:
+        _sweep_main()
+    print_line("opencode-go", render, ERROR_TEXT)
 
 
 if __name__ == "__main__":
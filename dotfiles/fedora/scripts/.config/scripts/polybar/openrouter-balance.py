@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # /// script
-# dependencies = ["requests"]
+# dependencies = []
 # ///
 
 """\
@@ -9,49 +9,90 @@ openrouter-balance.py
 Displays remaining account balance for OpenRouter.
 Intended for use in polybar.
 
-Usage: openrouter-balance.py
+OPENROUTER_API_KEY may list several keys separated by commas; the bar then
+shows their total balance (see quota_accounts.py).
+
+Usage: openrouter-balance.py [--accounts]
 """
 
-import requests
-import os
 import sys
 
+import quota_accounts
+import quota_forecast
+import quota_format
+import quota_trace
+from quota_cache import cached_many
+from quota_http import get_json
+
 
-# OpenRouter API Key
-api_key = os.environ.get('OPENROUTER_API_KEY', '')
+API_URL = "https://openrouter.ai/api/v1/credits"
+ERROR_TEXT = quota_format.ERROR_TEXT
+CACHE_TTL = 300
 
-if not api_key:
-    print("%{F#dc322f}?%{F-}")
-    sys.exit(1)
 
-# Get credits data from OpenRouter API
-try:
+def fetch_credits(api_key):
+    """Fetch credits data from the OpenRouter API."""
     headers = {"Authorization": f"Bearer {api_key}"}
-    response = requests.get(
-        "https://openrouter.ai/api/v1/credits",
-        headers=headers,
-        timeout=10
-    )
-    response.raise_for_status()
-    data = response.json()
-except Exception:
-    print("%{F#dc322f}?%{F-}")
-    sys.exit(1)
-
-# Extract balance data
-try:
+    return get_json(API_URL, headers=headers, timeout=10)
+
+
+def format_balance(data):
+    """Format the remaining balance (only red if under $5)."""
     total_credits = data.get("data", {}).get("total_credits", 0)
     total_usage = data.get("data", {}).get("total_usage", 0)
 
     # Calculate remaining balance
     balance = total_credits - total_usage
 
-    # Determine color based on balance (only red if under $5)
     if balance < 5:
-        print(f"$%{{F#dc322f}}{balance:.2f}%{{F-}}")
-    else:
-        print(f"${balance:.2f}")
+        return f"$%{{F{quota_format.RED}}}{balance:.2f}%{{F-}}"
+    return f"${balance:.2f}"
+
+
+def combine_credits(datas):
+    """Several accounts' credits as one, for the aggregate line."""
+    return {"data": {key: sum(data.get("data", {}).get(key, 0) for data in datas)
+                     for key in ("total_credits", "total_usage")}}
+
+
+def format_account(data, forecast=None):
+    """The balance line for `data`, with a warning when `forecast` projects
+    it to run out within a week."""
+    return format_balance(data) + quota_forecast.warning(forecast, "balance")
+
+
+def schedule_windows(data):
+    """The balance as a single unbounded window for quota_schedule."""
+    credits = data.get("data", {})
+    return [(credits.get("total_credits", 0) - credits.get("total_usage", 0), None, None)]
+
+
+def history_samples(data):
+    """The remaining balance for quota_history."""
+    return {"balance": schedule_windows(data)[0][0]}
+
+
+def render(detail=False):
+    """Fetch and format the balance line (per-account lines with `detail`).
+
+    Raises on any failure.
+    """
+    # OpenRouter API Keys
+    api_keys = quota_accounts.from_env('OPENROUTER_API_KEY')
+    if not api_keys:
+        raise RuntimeError("OPENROUTER_API_KEY is not set")
+
+    outcomes = cached_many("openrouter", api_keys, fetch_credits, CACHE_TTL,
+                           windows=schedule_windows, samples=history_samples)
+    with quota_trace.span("format"):
+        return quota_accounts.render("openrouter", api_keys, outcomes, format_account,
+                                     combine_credits, detail=detail, error_text=ERROR_TEXT)
+
+
+def main():
+    detail = quota_accounts.wants_detail(sys.argv)
+    sys.exit(quota_format.print_line("openrouter", lambda: render(detail), ERROR_TEXT))
+
 
-except (KeyError, TypeError):
-    print("%{F#dc322f}?%{F-}")
-    sys.exit(1)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# /// script
+# dependencies = ["browser-cookie3", "requests"]
+# ///
+"""\
+quota-daemon.py
+
+Resident asyncio daemon that serves every quota monitor from one process.
+Provider scripts are imported once and rendered concurrently; the latest
+line for each provider is streamed over a unix socket to polybar
+`tail = true` modules, so bar refreshes spawn no new processes.
+
+Rendering reads the shared cache; upstream fetches happen only when the
+provider's adaptive schedule (quota_schedule.py) says the data is due.
+Reset countdowns are computed from absolute timestamps at render time, so
+the daemon re-renders on the second each one ticks over, independently of
+how rarely the data itself is fetched.
+
+While there is no network route, or the machine is suspending, providers
+keep rendering from the cache and nothing is fetched (quota_network.py);
+when connectivity returns every provider is re-rendered at once, which
+fetches whatever fell due in the meantime.
+
+With `serve --ipc` (as launch.sh starts it) the daemon also pushes lines
+to polybar `custom/ipc` modules named quota-<provider>, which then need no
+tail process at all. Only a changed line is pushed, and one `polybar-msg`
+call updates every bar with `enable-ipc`, so bar-side work follows real
+changes instead of intervals. The latest line is also kept in IPC_DIR for
+the hook that fills a bar when it starts, as in the polybar config:
+
+  [module/quota-zai]
+  type = custom/ipc
+  hook-0 = cat $XDG_RUNTIME_DIR/quota-monitors/zai.line 2>/dev/null
+  initial = 1
+
+The `tail` client serves `custom/script` modules with `tail = true`
+instead; it is stdlib-only and cheap enough to run with plain python3.
+
+Usage: uv run quota-daemon.py serve [--ipc]
+       quota-daemon.py tail <provider>
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import time
+
+import quota
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+SOCKET_PATH = os.path.join(RUNTIME_DIR, "quota-daemon.sock")
+IPC_DIR = os.path.join(RUNTIME_DIR, "quota-monitors")
+IPC_MODULE = "quota-{}"
+POLYBAR_MSG = "polybar-msg"
+RECONNECT_DELAY = 5
+# Floor on the wait between renders, should a due time already have passed.
+MIN_WAIT = 1
+# Countdowns show whole minutes and change every COUNTDOWN_STEP seconds
+# before a reset; render just after each change.
+COUNTDOWN_STEP = 60
+COUNTDOWN_SLACK = 0.1
+
+# Provider name -> longest wait between renders in seconds. A render is a
+# cache read unless the provider's schedule has a fetch due.
+INTERVALS = {
+    "synthetic": 60,
+    "zai": 60,
+    "opencode-go": 60,
+    "openrouter": 60,
+    "neuralwatt": 60,
+    "claude": 60,
+}
+# Provider name -> (script filename, interval).
+PROVIDERS = {name: (quota.PROVIDERS[name], interval) for name, interval in INTERVALS.items()}
+
+ERROR_TEXT = "%{F#dc322f}?%{F-}"
+
+
+def load_script(filename):
+    """Import a hyphen-named provider script as a module."""
+    return quota.load_script(os.path.join(SCRIPT_DIR, filename))
+
+
+def write_line(name, line):
+    """Atomically replace the provider's line file in IPC_DIR."""
+    os.makedirs(IPC_DIR, mode=0o700, exist_ok=True)
+    path = os.path.join(IPC_DIR, f"{name}.line")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(line + "\n")
+    os.replace(tmp, path)
+
+
+# --------------------------------------------------------------------------- #
+# Daemon
+# --------------------------------------------------------------------------- #
+class QuotaDaemon:
+    """Polls providers and fans the latest line out to connected clients."""
+
+    def __init__(self, providers, ipc=False):
+        self.providers = providers
+        self.lines = {}
+        self.subscribers = {name: set() for name in providers}
+        self.ipc = ipc
+        self.pushers = {}
+        self.online = True
+        self.wakeups = {name: None for name in providers}
+
+    def publish(self, name, line):
+        """Record a provider's latest line and hand it to every subscriber."""
+        if self.lines.get(name) == line:
+            return
+        self.lines[name] = line
+        for queue in self.subscribers[name]:
+            # Each queue holds at most one line: a slow client only ever
+            # needs the newest value, so older ones are dropped.
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(line)
+        if self.ipc and name not in self.pushers:
+            import asyncio
+
+            self.pushers[name] = asyncio.create_task(self.push(name))
+
+    async def push(self, name):
+        """Send the provider's latest line to polybar until the bars have it.
+
+        Lines published while a send is running are coalesced into one
+        send of the newest, so sends never overtake each other.
+        """
+        import asyncio
+
+        try:
+            sent = None
+            while self.ipc and self.lines[name] != sent:
+                sent = self.lines[name]
+                write_line(name, sent)
+                try:
+                    proc = await asyncio.create_subprocess_exec(
+                        POLYBAR_MSG, "action", f"#{IPC_MODULE.format(name)}.send.{sent}",
+                        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+                    )
+                except FileNotFoundError:
+                    print(f"quota-daemon: {POLYBAR_MSG} not found, not pushing",
+                          file=sys.stderr)
+                    self.ipc = False
+                    break
+                # Failing with no bar running is fine: the line file has it.
+                await proc.wait()
+        finally:
+            del self.pushers[name]
+
+    def next_wait(self, name, interval):
+        """Seconds until the next render.
+
+        At most `interval`; sooner if a fetch is due or one of the provider's
+        reset countdowns is about to change.
+        """
+        import quota_cache
+
+        now = time.time()
+        wait = interval
+        due = quota_cache.due_at.get(name)
+        # Offline, a due fetch waits for the watcher's refresh instead.
+        if due is not None and self.online:
+            wait = min(wait, max(MIN_WAIT, due - now))
+        for reset_at in quota_cache.resets_at.get(name, ()):
+            if reset_at > now:
+                wait = min(wait, (reset_at - now) % COUNTDOWN_STEP + COUNTDOWN_SLACK)
+        return wait
+
+    async def poll(self, name, module, interval):
+        """Render one provider forever, at most `interval` apart."""
+        import asyncio
+
+        import quota_trace
+
+        error_text = getattr(module, "ERROR_TEXT", ERROR_TEXT)
+        wakeup = self.wakeups[name] = asyncio.Event()
+        while True:
+            try:
+                line = await asyncio.to_thread(quota_trace.traced, name, module.render)
+            except Exception:
+                line = error_text
+            self.publish(name, line)
+            try:
+                await asyncio.wait_for(wakeup.wait(), self.next_wait(name, interval))
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+
+    def went_offline(self):
+        """No route, or suspending: pooled connections won't survive it."""
+        import quota_client
+
+        self.online = False
+        quota_client.close_all()
+
+    def came_online(self):
+        """Re-render every provider together, fetching what fell due."""
+        import quota_client
+
+        self.online = True
+        quota_client.close_all()
+        for wakeup in self.wakeups.values():
+            if wakeup is not None:
+                wakeup.set()
+
+    async def handle_client(self, reader, writer):
+        """Stream lines for the provider named on the client's first line."""
+        import asyncio
+
+        try:
+            name = (await reader.readline()).decode().strip()
+            if name not in self.subscribers:
+                return
+
+            queue = asyncio.Queue(maxsize=1)
+            if name in self.lines:
+                queue.put_nowait(self.lines[name])
+            self.subscribers[name].add(queue)
+            try:
+                while True:
+                    line = await queue.get()
+                    writer.write(line.encode() + b"\n")
+                    await writer.drain()
+            finally:
+                self.subscribers[name].discard(queue)
+        except (ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, socket_path=SOCKET_PATH):
+        import asyncio
+
+        import quota_network
+
+        watcher = quota_network.Watcher(self.came_online, self.went_offline)
+        self.online = watcher.online
+        tasks = [asyncio.create_task(watcher.run())]
+        for name, (filename, interval) in self.providers.items():
+            try:
+                module = load_script(filename)
+            except Exception as exc:
+                print(f"quota-daemon: cannot load {filename}: {exc}", file=sys.stderr)
+                self.publish(name, ERROR_TEXT)
+                continue
+            tasks.append(asyncio.create_task(self.poll(name, module, interval)))
+
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+        server = await asyncio.start_unix_server(self.handle_client, path=socket_path)
+        os.chmod(socket_path, 0o600)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.wait(tasks)
+
+
+def serve(ipc=False):
+    import asyncio
+
+    # The daemon polls on its own schedule; refresh inline instead of forking.
+    import quota_cache
+    quota_cache.BACKGROUND_REFRESH = False
+
+    try:
+        asyncio.run(QuotaDaemon(PROVIDERS, ipc=ipc).run())
+    except KeyboardInterrupt:
+        pass
+
+
+# --------------------------------------------------------------------------- #
+# Client
+# --------------------------------------------------------------------------- #
+def tail(name, socket_path=SOCKET_PATH):
+    """Print every line the daemon publishes for `name`, reconnecting forever."""
+    while True:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+                sock.sendall(name.encode() + b"\n")
+                for line in sock.makefile("r", encoding="utf-8"):
+                    print(line, end="", flush=True)
+        except OSError:
+            pass
+        time.sleep(RECONNECT_DELAY)
+
+
+def main():
+    if sys.argv[1:2] == ["serve"] and sys.argv[2:] in ([], ["--ipc"]):
+        serve(ipc=sys.argv[2:] == ["--ipc"])
+    elif len(sys.argv) == 3 and sys.argv[1] == "tail" and sys.argv[2] in PROVIDERS:
+        try:
+            tail(sys.argv[2])
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(f"usage: quota-daemon.py serve [--ipc] | tail {{{','.join(PROVIDERS)}}}",
+              file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
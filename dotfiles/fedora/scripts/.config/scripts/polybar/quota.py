@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# /// script
+# dependencies = ["browser-cookie3", "requests"]
+# ///
+"""\
+quota.py
+
+One entry point for every polybar monitor.
+
+PROVIDERS maps each provider name to its script. A script is only imported
+when its provider is asked for, so one invocation renders any subset of
+them in a single process and pays the import cost of those alone:
+
+  quota.py zai synthetic     # one line per provider, in the order given
+  quota.py                   # every provider
+
+A provider that fails prints its own error text on its line and makes the
+exit status 1; the others still render. quota-daemon.py loads provider
+scripts through the same loader.
+
+Usage: uv run quota.py [provider ...]
+"""
+
+import importlib.util
+import os
+import sys
+
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+PROVIDERS = {
+    "synthetic": "synthetic-quota.py",
+    "zai": "zai-quota.py",
+    "opencode-go": "opencode-go-usage.py",
+    "openrouter": "openrouter-balance.py",
+    "neuralwatt": "neuralwatt-credits.py",
+    "claude": "claude-credits.py",
+    "weather": "weather.py",
+}
+
+
+def load_script(path):
+    """Import a (possibly hyphen-named) script as a module, once per process."""
+    name = os.path.splitext(os.path.basename(path))[0].replace("-", "_")
+    module = sys.modules.get(name)
+    if module is not None and getattr(module, "__file__", None) == path:
+        return module
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def load(name):
+    """The module behind provider `name`."""
+    return load_script(os.path.join(SCRIPT_DIR, PROVIDERS[name]))
+
+
+def render(name, startup=False):
+    """(line, ok) for provider `name`; its ERROR_TEXT when anything fails."""
+    import quota_format
+    import quota_trace
+
+    error_text = quota_format.ERROR_TEXT
+    try:
+        module = load(name)
+        error_text = getattr(module, "ERROR_TEXT", error_text)
+        return quota_trace.traced(name, module.render, startup=startup), True
+    except Exception:
+        return error_text, False
+
+
+def main(argv=None):
+    names = sys.argv[1:] if argv is None else argv
+    unknown = [name for name in names if name not in PROVIDERS]
+    if unknown:
+        print(f"usage: quota.py [{{{','.join(PROVIDERS)}}} ...]", file=sys.stderr)
+        return 2
+
+    status = 0
+    for index, name in enumerate(names or PROVIDERS):
+        line, ok = render(name, startup=index == 0)
+        print(line, flush=True)
+        if not ok:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,85 @@
+"""\
+quota_accounts.py
+
+Several accounts per quota monitor.
+
+A monitor's credential setting (an API key variable, the org_id file) may
+list several accounts separated by commas, spaces or newlines. They are
+fetched together through quota_cache.cached_many(), concurrently, so a
+render costs about one request however many accounts there are.
+
+The bar shows one aggregate line, built by the provider's combine function
+from the accounts that answered; a red "?" after it means some did not.
+`<script> --accounts` prints the drill-down instead, one numbered line per
+account in the order they are configured, e.g. for a polybar click action:
+
+  click-left = notify-send zai "$(uv run ~/.config/scripts/polybar/zai-quota.py --accounts)"
+"""
+
+import os
+
+import quota_forecast
+from quota_cache import DisplayError, latest_forecast, mark_stale
+
+
+PARTIAL_MARKER = " %{F#dc322f}?%{F-}"
+DETAIL_FLAG = "--accounts"
+
+
+def split(value):
+    """Distinct accounts listed in `value`, in order."""
+    accounts = []
+    for account in (value or "").replace(",", " ").split():
+        if account not in accounts:
+            accounts.append(account)
+    return accounts
+
+
+def from_env(name):
+    """Accounts listed in environment variable `name`."""
+    return split(os.environ.get(name, ""))
+
+
+def wants_detail(argv):
+    """Whether the command line asks for the per-account drill-down."""
+    return DETAIL_FLAG in argv[1:]
+
+
+def render(provider, accounts, outcomes, format_one, combine, mean=False, detail=False,
+           error_text="?"):
+    """The bar line for a provider's accounts, or the drill-down with `detail`.
+
+    `outcomes` come from cached_many(); format_one(data, forecast) formats
+    one account's data, combine(datas) merges several into the same shape,
+    and `mean` averages their forecasts instead of summing them (for
+    percentages). Raises the first failure when no account answered.
+    """
+    if detail:
+        lines = []
+        for number, (account, outcome) in enumerate(zip(accounts, outcomes), 1):
+            if isinstance(outcome, DisplayError):
+                line = outcome.text
+            elif isinstance(outcome, Exception):
+                line = error_text
+            else:
+                data, stale = outcome
+                line = mark_stale(format_one(data, latest_forecast(provider, account)), stale)
+            lines.append(f"{number}: {line}")
+        return "\n".join(lines)
+
+    good = [(account, outcome) for account, outcome in zip(accounts, outcomes)
+            if not isinstance(outcome, Exception)]
+    if not good:
+        raise outcomes[0]
+    if len(good) == 1:
+        account, (data, stale) = good[0]
+        line = format_one(data, latest_forecast(provider, account))
+    else:
+        data = combine([data for _, (data, _) in good])
+        forecast = quota_forecast.combine(
+            [latest_forecast(provider, account) for account, _ in good], mean=mean)
+        line = format_one(data, forecast)
+        stale = any(stale for _, (_, stale) in good)
+    if len(good) < len(accounts):
+        line += PARTIAL_MARKER
+    return mark_stale(line, stale)
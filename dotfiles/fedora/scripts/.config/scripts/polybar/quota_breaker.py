@@ -0,0 +1,148 @@
+"""\
+quota_breaker.py
+
+Per-provider circuit breaker shared by every process running a monitor.
+
+An outage (connection error, timeout, 5xx or 429) opens the breaker for
+BASE_DELAY seconds, doubling with each consecutive outage up to MAX_DELAY,
+and for at least as long as any Retry-After the provider sent. While open,
+quota_cache.single_flight() raises CircuitOpen instead of fetching, so bars
+keep their last good value without stacking up processes waiting on a
+dead endpoint.
+
+Once the delay is over the breaker is half-open: the first process to ask
+claims the probe under an flock and fetches; everyone else stays open until
+the probe succeeds (closing the breaker) or fails (reopening it for longer).
+Other failures, such as an expired login, a body that does not decode or a
+cookie store that cannot be read, are not the provider's fault and count
+as successes here.
+
+State lives next to the quota cache, one small JSON file per provider.
+"""
+
+import errno
+import fcntl
+import os
+import socket
+import time
+from email.utils import parsedate_to_datetime
+
+from quota_cache import entry_path, read_entry, write_entry
+
+
+BASE_DELAY = 120
+MAX_DELAY = 3600
+# How long a claimed half-open probe keeps others out; well above the
+# monitors' 10 s request timeout.
+PROBE_WINDOW = 60
+# OSErrors besides ConnectionError and TimeoutError that mean the host
+# could not be reached.
+UNREACHABLE = {errno.ENETDOWN, errno.ENETUNREACH, errno.EHOSTDOWN, errno.EHOSTUNREACH}
+
+
+class CircuitOpen(Exception):
+    """The provider is failing; no fetch was attempted."""
+
+    def __init__(self, provider, until):
+        super().__init__(f"{provider} circuit open for {max(0, until - time.time()):.0f}s")
+        self.provider = provider
+        self.until = until
+
+
+def _state_path(provider, suffix=".json"):
+    """Breaker state (or lock) file for a provider."""
+    return entry_path("breaker", provider, suffix)
+
+
+def _locked_update(provider, update):
+    """Apply update(state) -> state under the provider's lock; returns the result."""
+    path = _state_path(provider)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    with open(_state_path(provider, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            state = read_entry(path) or {}
+            new = update(dict(state))
+            if new != state:
+                write_entry(path, new)
+            return new
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def open_until(provider):
+    """When the breaker stops blocking fetches (0 when closed)."""
+    return (read_entry(_state_path(provider)) or {}).get("open_until", 0)
+
+
+def check(provider):
+    """Raise CircuitOpen unless this process may fetch from `provider` now."""
+    if not open_until(provider):
+        return
+
+    # The daemon fetches from threads of one process, so the probe is
+    # claimed with a fresh token rather than the pid.
+    token = os.urandom(8).hex()
+
+    def claim(state):
+        now = time.time()
+        if state.get("open_until", 0) > now or state.get("probing_until", 0) > now:
+            return state
+        return dict(state, probing_until=now + PROBE_WINDOW, prober=token)
+
+    state = _locked_update(provider, claim)
+    if state.get("open_until") and state.get("prober") != token:
+        raise CircuitOpen(provider, max(state["open_until"], state.get("probing_until", 0)))
+
+
+def _status_and_headers(exc):
+    """HTTP status and headers from a quota_http or requests error, if any."""
+    response = getattr(exc, "response", None)
+    if response is not None and hasattr(response, "status_code"):
+        return response.status_code, response.headers
+    return getattr(exc, "status", None), getattr(exc, "headers", None) or {}
+
+
+def retry_after(headers, now=None):
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None."""
+    value = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0, when - (time.time() if now is None else now))
+
+
+def is_outage(exc):
+    """Whether `exc` means the provider is down or throttling us."""
+    status, _ = _status_and_headers(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(exc, (ConnectionError, TimeoutError, socket.gaierror)):
+        return True
+    return isinstance(exc, OSError) and exc.errno in UNREACHABLE
+
+
+def record(provider, exc=None):
+    """Record a fetch outcome: `exc` is None on success."""
+    if exc is None or not is_outage(exc):
+        if open_until(provider):
+            _locked_update(provider, lambda state: {})
+        return
+
+    _, headers = _status_and_headers(exc)
+    wait = retry_after(headers)
+
+    def trip(state):
+        failures = state.get("failures", 0) + 1
+        delay = min(BASE_DELAY * 2 ** (failures - 1), MAX_DELAY)
+        if wait is not None:
+            delay = max(delay, wait)
+        return {"failures": failures, "open_until": time.time() + delay}
+
+    _locked_update(provider, trip)
@@ -0,0 +1,435 @@
+"""\
+quota_cache.py
+
+Shared result cache for the polybar quota monitors.
+
+`launch.sh` starts a top and a bottom bar on every monitor, so each quota
+module runs several times per interval. single_flight() makes the first
+caller for a (provider, account) pair do the upstream fetch while concurrent
+callers block on a lock file and reuse its result, so upstream calls per
+interval stay at one regardless of how many bars are running.
+
+cached() layers stale-while-revalidate on top: the last good value is
+returned immediately and refreshed in a detached background process once it
+is older than the provider's TTL, so a slow or failing upstream never blocks
+the bar or replaces a good value with a red "?".
+
+cached_many() does the same for several accounts of one provider: accounts
+that must be fetched are fetched in a small thread pool, and due accounts
+are refreshed together in one detached process.
+
+Providers that pass a `windows` callable get an adaptive refresh time from
+quota_schedule.plan() instead of a fixed TTL: flat usage backs off, a fast
+burn or a known reset pulls the next fetch forward. A `samples` callable
+maps each fetched result to {metric: remaining} for quota_history and for
+the burn-rate estimate quota_forecast keeps in the entry.
+
+Fetches go through the provider's circuit breaker (quota_breaker): while
+it is open, single_flight() raises CircuitOpen without calling fetch(), and
+cached() keeps serving the last good value until the breaker's backoff ends.
+Without a network route (quota_network) they raise Offline instead, and due
+entries are not refreshed at all.
+
+A fetch may raise Unchanged instead of returning data identical to the
+cached value (see quota_http's conditional requests); the cached data is
+then reused as if it had just been fetched. The validators those requests
+compare against are kept in the entry and written together with its data.
+Each upstream fetch is logged as a quota_trace "fetch" run, its outcome
+exported for Prometheus by quota_metrics and published to the
+quota_snapshot file.
+
+Entries live in $XDG_RUNTIME_DIR/quota-monitors and are replaced atomically.
+"""
+
+import contextvars
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import quota_forecast
+import quota_schedule
+import quota_trace
+
+
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), "quota-monitors"
+)
+# Results younger than this are shared with callers that arrive late. Bars
+# on different monitors start a few seconds apart, so their ticks never line
+# up exactly; a minute comfortably covers that skew at 300 s intervals.
+DEDUP_WINDOW = 60
+# Values older than this many TTLs get a staleness marker.
+STALE_INTERVALS = 2
+STALE_MARKER = " %{F#586e75}~%{F-}"
+# Refresh expired entries in a detached child. The resident daemon turns this
+# off: it already polls on a schedule, and forking a threaded process is unsafe.
+BACKGROUND_REFRESH = True
+# Accounts of one provider fetched at the same time by cached_many().
+MAX_WORKERS = 4
+# Provider -> when its next entry is due, and the reset times its countdowns
+# count towards, across the accounts cached() last saw in this process. The
+# resident daemon uses them to wake up for a scheduled fetch or a countdown
+# change.
+due_at = {}
+resets_at = {}
+# Provider -> {account digest: burn-rate state of the entry cached() last
+# returned for that account}.
+forecasts = {}
+# While single_flight() calls fetch(): (validators stored with the entry,
+# validators of this fetch's responses), each keyed by request. The first is
+# empty unless the entry still holds data, so a fetch may raise Unchanged
+# only then; quota_http fills in the second, which is saved with the data.
+validators = contextvars.ContextVar("validators", default=None)
+
+
+class Unchanged(Exception):
+    """Upstream data is the same as what the cache already holds."""
+
+
+class DisplayError(Exception):
+    """A fetch outcome that should be shown as-is (e.g. "Login", "Expired")."""
+
+    def __init__(self, text):
+        super().__init__(text)
+        self.text = text
+
+
+def account_digest(account):
+    """Short hash naming an account (usually an API key) in files and labels."""
+    return hashlib.sha256(str(account).encode()).hexdigest()[:16]
+
+
+def entry_path(provider, account, suffix=".json"):
+    """Path of the cache file for a provider/account pair.
+
+    The account is hashed so it never lands in a filename.
+    """
+    return os.path.join(CACHE_DIR, f"{provider}-{account_digest(account)}{suffix}")
+
+
+def read_entry(path):
+    """Read a cache entry, returning None if it is missing or unreadable."""
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+def write_entry(path, entry):
+    """Write a cache entry atomically (temp file + rename in the same dir)."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def refresh_at(entry, ttl):
+    """When the data in `entry` is due for a refresh."""
+    schedule = entry.get("schedule")
+    if schedule:
+        return schedule["refresh_at"]
+    return entry.get("fetched_at", 0) + ttl
+
+
+def _entry_error(entry):
+    """The exception for the failure an entry recorded."""
+    if entry.get("display"):
+        return DisplayError(entry["error"])
+    return RuntimeError(entry["error"])
+
+
+def _record_failure(path, exc):
+    """Record a failed fetch, keeping the last good data for cached()."""
+    entry = read_entry(path) or {}
+    entry.update(failed_at=time.time(), error=repr(exc), display=False)
+    if isinstance(exc, DisplayError):
+        entry.update(error=exc.text, display=True)
+    write_entry(path, entry)
+
+
+def single_flight(provider, account, fetch, max_age=DEDUP_WINDOW, windows=None,
+                  samples=None):
+    """Call fetch() at most once across processes for concurrent callers.
+
+    fetch() must return JSON-serialisable data. Successful results are reused
+    for `max_age` seconds, or until their scheduled refresh when `windows`
+    is given; failures are only shared with callers that were already
+    waiting while the failing fetch ran. Each fresh result is appended to
+    the provider's history when `samples` is given.
+    """
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    path = entry_path(provider, account)
+    arrived = time.time()
+
+    with open(entry_path(provider, account, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            entry = read_entry(path) or {}
+            if entry.get("failed_at", 0) >= arrived:
+                raise _entry_error(entry)
+            if "data" in entry and time.time() < refresh_at(entry, max_age):
+                return entry["data"]
+
+            import quota_breaker
+            import quota_network
+
+            quota_network.check()
+            quota_breaker.check(provider)
+            known = entry.get("validators", {}) if "data" in entry else {}
+            seen = {}
+            token = validators.set((known, seen))
+            spans = {}
+            try:
+                with quota_trace.run(provider, "fetch") as spans:
+                    data = fetch()
+            except Unchanged:
+                data = entry["data"]
+            except Exception as exc:
+                quota_breaker.record(provider, exc)
+                _record_failure(path, exc)
+                _export_metrics(provider, account, spans, error=exc)
+                _publish_snapshot(provider, error=True)
+                raise
+            finally:
+                validators.reset(token)
+            quota_breaker.record(provider)
+            now = time.time()
+            fresh = {"fetched_at": now, "data": data}
+            if seen:
+                fresh["validators"] = seen
+            levels = values = None
+            if windows is not None:
+                levels = windows(data)
+                fresh["schedule"] = quota_schedule.plan(
+                    levels, entry.get("schedule"), now, base=max_age)
+            if samples is not None:
+                values = samples(data)
+                fresh["forecast"] = quota_forecast.update(entry.get("forecast"), values, now)
+            write_entry(path, fresh)
+            if samples is not None:
+                _record_history(provider, account, values, now)
+            _export_metrics(provider, account, spans, windows=levels, remaining=values,
+                            now=now)
+            _publish_snapshot(provider, windows=levels, samples=values, fetched_at=now)
+            return data
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _record_history(provider, account, values, now):
+    """Append a fetched result to quota_history; never fails the fetch.
+
+    Each account has its own series, named like its cache entry.
+    """
+    import quota_history
+
+    try:
+        quota_history.record(f"{provider}-{account_digest(account)}", values, now)
+    except (OSError, ValueError, TypeError):
+        pass
+
+
+def _export_metrics(provider, account, spans, **outcome):
+    """Update the provider's Prometheus textfile; never fails the fetch."""
+    import quota_metrics
+
+    try:
+        quota_metrics.export(provider, account_digest(account), spans, **outcome)
+    except (OSError, ValueError, TypeError):
+        pass
+
+
+def _publish_snapshot(provider, **outcome):
+    """Update the provider's quota_snapshot record; never fails the fetch."""
+    import quota_snapshot
+
+    try:
+        quota_snapshot.publish(provider, **outcome)
+    except (OSError, ValueError, TypeError):
+        pass
+
+
+def _fetch_all(function, accounts):
+    """{account: function(account), or the Exception it raised}.
+
+    Several accounts run in up to MAX_WORKERS threads, so they take about as
+    long as the slowest one rather than the sum.
+    """
+    def outcome(account):
+        try:
+            return function(account)
+        except Exception as exc:
+            return exc
+
+    if len(accounts) <= 1:
+        return {account: outcome(account) for account in accounts}
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(accounts))) as pool:
+        futures = [pool.submit(outcome, account) for account in accounts]
+    return dict(zip(accounts, (future.result() for future in futures)))
+
+
+def _refresh_detached(provider, accounts, fetch, ttl, windows, samples):
+    """Refresh `accounts` with single_flight() in a grandchild detached from
+    polybar's pipe.
+
+    Polybar waits for EOF on the script's stdout, so the refresher starts a
+    new session and points its stdio at /dev/null before fetching. Callers
+    fork before starting any threads of their own.
+    """
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return
+
+    try:
+        if os.fork():
+            os._exit(0)
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        _fetch_all(lambda account: single_flight(
+            provider, account, lambda: fetch(account), max_age=ttl, windows=windows,
+            samples=samples), accounts)
+    except BaseException:
+        pass
+    finally:
+        os._exit(0)
+
+
+def cached(provider, account, fetch, ttl, stale_intervals=STALE_INTERVALS,
+           windows=None, samples=None):
+    """Stale-while-revalidate wrapper around single_flight().
+
+    Returns (data, stale). With a good value on disk it is returned at once,
+    and refreshed in the background once it is due: after `ttl`, or at the
+    time quota_schedule picked when `windows` maps the data to its quota
+    windows. `stale` is True once a refresh is `stale_intervals - 1` TTLs
+    overdue. A recorded DisplayError newer than the data is re-raised. Only
+    a cold cache makes the caller wait for the upstream fetch.
+    """
+    (outcome,) = cached_many(provider, [account], lambda _: fetch(), ttl,
+                             stale_intervals, windows, samples)
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
+
+
+def cached_many(provider, accounts, fetch, ttl, stale_intervals=STALE_INTERVALS,
+                windows=None, samples=None):
+    """cached() for several accounts of one provider at once.
+
+    `accounts` must be distinct; fetch(account) fetches one of them. Returns
+    one outcome per account, in order: (data, stale), or the exception
+    cached() would have raised for it. Cold accounts (and due ones, when
+    not refreshing in the background) are fetched concurrently; due
+    accounts share one detached refresher.
+    """
+    entries = {account: read_entry(entry_path(provider, account)) or {}
+               for account in accounts}
+    shows_error = {}
+    for account, entry in entries.items():
+        fetched_at = entry.get("fetched_at", 0)
+        failed_at = entry.get("failed_at", 0)
+        shows_error[account] = entry.get("display") and failed_at >= fetched_at
+
+    cold = [account for account in accounts
+            if "data" not in entries[account] and not shows_error[account]]
+    warm = {account: entries[account] for account in accounts if account not in cold}
+    due = []
+    if warm:
+        _note_due(provider, warm, ttl)
+        now = time.time()
+        due = [account for account, entry in warm.items()
+               if now >= _due(provider, entry, ttl)]
+    if due:
+        import quota_network
+
+        if not quota_network.online():
+            # Keep serving the cached values; a refresh could only time out.
+            due = []
+    if due and BACKGROUND_REFRESH:
+        _refresh_detached(provider, due, fetch, ttl, windows, samples)
+        due = []
+
+    fetched = _fetch_all(lambda account: single_flight(
+        provider, account, lambda: fetch(account), max_age=ttl, windows=windows,
+        samples=samples), cold + due)
+    for account in fetched:
+        entries[account] = read_entry(entry_path(provider, account)) or entries[account]
+    _note_due(provider, entries, ttl)
+
+    outcomes = []
+    for account in accounts:
+        entry = entries[account]
+        if account in fetched:
+            result = fetched[account]
+            if not isinstance(result, Exception):
+                outcomes.append((result, False))
+                continue
+            if account in cold or isinstance(result, DisplayError) or "data" not in entry:
+                outcomes.append(result)
+                continue
+        if shows_error[account]:
+            outcomes.append(_entry_error(entry))
+            continue
+        overdue = time.time() - refresh_at(entry, ttl)
+        outcomes.append((entry["data"], overdue > ttl * (stale_intervals - 1)))
+    return outcomes
+
+
+def _due(provider, entry, ttl):
+    """When `entry` next needs fetching.
+
+    A due entry waits out an open circuit breaker rather than spawning a
+    refresh that would only be refused.
+    """
+    due = max(refresh_at(entry, ttl), entry.get("failed_at", 0) + ttl)
+    if due <= time.time():
+        import quota_breaker
+
+        due = max(due, quota_breaker.open_until(provider))
+    return due
+
+
+def _note_due(provider, entries, ttl):
+    """Record when the provider's entries ({account: entry}) next need
+    fetching, and their resets and forecasts, for the daemon's scheduler."""
+    due_at[provider] = min(_due(provider, entry, ttl) for entry in entries.values())
+    resets_at[provider] = sorted({
+        reset for entry in entries.values()
+        for reset in (entry.get("schedule") or {}).get("resets", [])
+    })
+    forecasts[provider] = {account_digest(account): entry.get("forecast")
+                           for account, entry in entries.items()}
+
+
+def latest_forecast(provider, account=None):
+    """Burn-rate state behind the value cached() last returned for `provider`.
+
+    With several accounts, `account` picks one; by default it is the first.
+    """
+    by_account = forecasts.get(provider) or {}
+    if account is None:
+        return next(iter(by_account.values()), None)
+    return by_account.get(account_digest(account))
+
+
+def mark_stale(line, stale):
+    """Append the staleness marker to a rendered line when `stale` is set."""
+    return line + STALE_MARKER if stale else line
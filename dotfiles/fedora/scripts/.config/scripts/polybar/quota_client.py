@@ -0,0 +1,353 @@
+"""\
+quota_client.py
+
+Pooled HTTP/1.1 client shared by the polybar monitors (stdlib only).
+
+Everything a process learns about a host is kept for its next request:
+
+  - idle keep-alive connections are pooled per scheme/host/port and reused
+    for up to IDLE_TIMEOUT; a reused connection the server already dropped
+    is retried once on a fresh one
+  - TLS sessions are kept per host and offered on the next handshake, so a
+    connection opened after the pool expired still resumes instead of doing
+    a full handshake
+  - DNS answers are cached for DNS_TTL
+  - responses are requested gzip/deflate-compressed and decoded on the fly
+
+The savings show in the resident quota daemon and in runs that make more
+than one request; a one-shot cache hit never imports this module at all.
+
+Each request's timings (dns, connect, tls, ttfb and body in seconds, plus
+whether the connection and TLS session were reused) are passed to every
+callable in `observers` once its response is closed. Body time counts only
+receiving and decoding, not what the caller does between chunks.
+
+With $QUOTA_BASE_URL set (e.g. http://127.0.0.1:8765), every request is
+sent to that origin instead, path and query unchanged, while URLs, cookies
+and redirects still behave as for the real host. replay_server.py answers
+such requests from recorded fixtures.
+
+Usage: python3 quota_client.py URL [COUNT]   # print the timings of COUNT GETs
+"""
+
+import http.client
+import os
+import socket
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+
+import quota_trace
+
+IDLE_TIMEOUT = 50  # below the usual 60 s server keep-alive
+DNS_TTL = 300
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# Headers that must not follow a redirect onto another host.
+CREDENTIAL_HEADERS = ("authorization", "cookie")
+# Origin that replaces every request's scheme, host and port, if set.
+BASE_URL = os.environ.get("QUOTA_BASE_URL") or None
+
+# quota_trace adds each request's phases to the monitor run it belongs to.
+observers = [quota_trace.http_timings]
+
+_lock = threading.Lock()
+_idle = {}  # (scheme, host, port) -> [(returned_at, connection)]
+_dns = {}  # (host, port) -> (expires_at, [(family, sockaddr)])
+_tls_sessions = {}  # host -> ssl.SSLSession
+_tls_context = None
+
+
+def _context():
+    """The TLS context shared by every connection (sessions are per context)."""
+    global _tls_context
+    if _tls_context is None:
+        _tls_context = ssl.create_default_context()
+    return _tls_context
+
+
+def resolve(host, port):
+    """Addresses for host:port as [(family, sockaddr)], and whether they were cached."""
+    now = time.monotonic()
+    with _lock:
+        hit = _dns.get((host, port))
+    if hit and hit[0] > now:
+        return hit[1], True
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = [(family, sockaddr) for family, _, _, _, sockaddr in infos]
+    with _lock:
+        _dns[(host, port)] = (now + DNS_TTL, addresses)
+    return addresses, False
+
+
+class _Connection(http.client.HTTPConnection):
+    """HTTPConnection that resolves through the DNS cache, resumes TLS
+    sessions and times each phase of connect()."""
+
+    def __init__(self, host, port, timeout, tls):
+        super().__init__(host, port, timeout=timeout)
+        self.tls = tls
+        self.timings = {}
+
+    def connect(self):
+        started = time.perf_counter()
+        addresses, cached = resolve(self.host, self.port)
+        resolved = time.perf_counter()
+        self.timings.update(dns=resolved - started, dns_cached=cached)
+
+        error = ConnectionError(f"no address for {self.host}")
+        for family, sockaddr in addresses:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(sockaddr)
+                break
+            except OSError as exc:
+                sock.close()
+                error = exc
+        else:
+            raise error
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connected = time.perf_counter()
+        self.timings["connect"] = connected - resolved
+
+        if self.tls:
+            with _lock:
+                session = _tls_sessions.get(self.host)
+            try:
+                sock = _context().wrap_socket(sock, server_hostname=self.host, session=session)
+            except BaseException:
+                sock.close()
+                raise
+            self.timings.update(tls=time.perf_counter() - connected,
+                                tls_resumed=sock.session_reused)
+        self.sock = sock
+
+    def save_session(self):
+        """Remember this connection's TLS session for the next handshake."""
+        session = getattr(self.sock, "session", None)
+        if self.tls and session is not None:
+            with _lock:
+                _tls_sessions[self.host] = session
+
+
+def _checkout(key, timeout):
+    """An idle pooled connection for `key`, or a new one. Returns (conn, reused)."""
+    now = time.monotonic()
+    with _lock:
+        idle = _idle.get(key, [])
+        while idle:
+            returned_at, conn = idle.pop()
+            if now - returned_at < IDLE_TIMEOUT:
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+                return conn, True
+            conn.close()
+    scheme, host, port = key
+    return _Connection(host, port, timeout, tls=scheme == "https"), False
+
+
+def _checkin(key, conn):
+    """Return a connection whose response was fully read to the pool."""
+    conn.save_session()
+    with _lock:
+        _idle.setdefault(key, []).append((time.monotonic(), conn))
+
+
+def close_all():
+    """Close every pooled connection (e.g. after the network changed)."""
+    with _lock:
+        pools = list(_idle.values())
+        _idle.clear()
+    for pool in pools:
+        for _, conn in pool:
+            conn.close()
+
+
+class _CookieResponse:
+    """The slice of a urllib response http.cookiejar reads Set-Cookie from."""
+
+    def __init__(self, headers):
+        self._headers = headers
+
+    def info(self):
+        return self._headers
+
+
+class Response:
+    """A response whose body is streamed, decompressed, from a pooled connection.
+
+    Close it (or use it as a context manager) to hand the connection back;
+    it is only reused when the whole body was read.
+    """
+
+    def __init__(self, url, raw, conn, key, timings):
+        self.url = url
+        self.status = raw.status
+        self.headers = raw.msg
+        self.timings = timings
+        self._raw = raw
+        self._conn = conn
+        self._key = key
+        self._reading = 0.0  # time spent receiving and decoding the body
+        encoding = (raw.getheader("Content-Encoding") or "").strip().lower()
+        if encoding in ("gzip", "x-gzip"):
+            self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._decoder = zlib.decompressobj()
+        else:
+            self._decoder = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def iter_content(self, chunk_size=16384):
+        """Yield the decoded body in chunks of at most about `chunk_size` bytes read."""
+        try:
+            while True:
+                started = time.perf_counter()
+                chunk = self._raw.read(chunk_size)
+                if chunk and self._decoder:
+                    chunk = self._decoder.decompress(chunk)
+                self._reading += time.perf_counter() - started
+                if not chunk:
+                    if self._raw.isclosed():
+                        # read(amt) returns short instead of raising when
+                        # the server hangs up before Content-Length.
+                        if self._raw.length:
+                            raise ConnectionError(
+                                f"{self.url}: body cut short, {self._raw.length} bytes missing")
+                        break
+                    continue  # only a compressed header so far
+                yield chunk
+        except http.client.HTTPException as exc:
+            raise ConnectionError(f"{self.url}: {exc!r}") from exc
+        if self._decoder:
+            tail = self._decoder.flush()
+            if tail:
+                yield tail
+
+    def read(self):
+        """The whole decoded body."""
+        return b"".join(self.iter_content())
+
+    def close(self):
+        if self._conn is None:
+            return
+        self.timings["body"] = self._reading
+        if self._raw.isclosed() and not self._raw.will_close:
+            _checkin(self._key, self._conn)
+        else:
+            self._conn.save_session()
+            self._raw.close()
+            self._conn.close()
+        self._conn = None
+        for observer in observers:
+            observer(self.url, self.timings)
+
+
+def _send(url, headers, timeout, cookie_jar):
+    """Issue one GET (no redirects) and return its Response once headers arrived."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise ValueError(f"unsupported URL: {url}")
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    if BASE_URL:
+        parts = urllib.parse.urlsplit(BASE_URL)
+    tls = parts.scheme == "https"
+    key = (parts.scheme, parts.hostname, parts.port or (443 if tls else 80))
+
+    headers = dict(headers)
+    if cookie_jar is not None:
+        from urllib.request import Request
+
+        cookie_request = Request(url)
+        cookie_jar.add_cookie_header(cookie_request)
+        cookie = cookie_request.get_header("Cookie")
+        if cookie:
+            headers["Cookie"] = cookie
+
+    while True:
+        conn, reused = _checkout(key, timeout)
+        conn.timings = {}
+        started = time.perf_counter()
+        try:
+            conn.request("GET", target, headers=headers)
+            raw = conn.getresponse()
+        except (ConnectionError, http.client.BadStatusLine) as exc:
+            conn.close()
+            if reused:
+                continue  # the server closed it while idle; retry on a fresh one
+            if isinstance(exc, http.client.HTTPException):
+                raise ConnectionError(f"{url}: {exc!r}") from exc
+            raise
+        except http.client.HTTPException as exc:
+            conn.close()
+            raise ConnectionError(f"{url}: {exc!r}") from exc
+        except BaseException:
+            conn.close()
+            raise
+        break
+
+    timings = dict(conn.timings, reused=reused)
+    setup = sum(timings.get(phase, 0) for phase in ("dns", "connect", "tls"))
+    timings["ttfb"] = time.perf_counter() - started - setup
+    if cookie_jar is not None:
+        cookie_jar.extract_cookies(_CookieResponse(raw.msg), cookie_request)
+    return Response(url, raw, conn, key, timings)
+
+
+def request(url, headers=None, timeout=10, cookie_jar=None, follow_redirects=True):
+    """GET `url` over a pooled connection and return a streaming Response.
+
+    Redirects are followed (credentials are dropped when one leaves the
+    host); Response.url is the final URL. When `cookie_jar` (an
+    http.cookiejar.CookieJar) is given, it supplies the Cookie header of
+    each hop and receives every Set-Cookie. Non-2xx statuses are returned,
+    not raised; network failures raise OSError.
+    """
+    headers = {"Accept-Encoding": "gzip, deflate", **(headers or {})}
+    for _ in range(MAX_REDIRECTS + 1):
+        response = _send(url, headers, timeout, cookie_jar)
+        location = response.headers.get("Location")
+        if not follow_redirects or response.status not in REDIRECT_STATUSES or not location:
+            return response
+        response.read()
+        response.close()
+        target = urllib.parse.urljoin(url, location)
+        if urllib.parse.urlsplit(target).netloc != urllib.parse.urlsplit(url).netloc:
+            headers = {name: value for name, value in headers.items()
+                       if name.lower() not in CREDENTIAL_HEADERS}
+        url = target
+    raise ConnectionError(f"{url}: more than {MAX_REDIRECTS} redirects")
+
+
+def _format_timings(url, timings):
+    fields = []
+    for name, value in timings.items():
+        fields.append(f"{name}={value * 1000:.1f}ms" if isinstance(value, float)
+                      else f"{name}={value}")
+    return f"{url} " + " ".join(fields)
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        return 2
+    url = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else 3
+    observers.append(lambda url, timings: print(_format_timings(url, timings)))
+    for _ in range(count):
+        with request(url) as response:
+            response.read()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
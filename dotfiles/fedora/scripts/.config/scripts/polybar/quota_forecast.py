@@ -0,0 +1,93 @@
+"""\
+quota_forecast.py
+
+Burn-rate estimate and time-to-exhaustion warnings for the quota monitors.
+
+The state is one small dict per metric ({"at", "value", "rate"}), kept in
+the provider's cache entry and updated in O(1) per fetched sample: the
+spend rate is an exponentially weighted moving average with time constant
+RATE_TAU, so irregular fetch intervals weigh each sample by how long it
+covers. A rise in the remaining value is a reset or top-up; the level
+restarts from it but the learned rate is kept.
+
+warning() turns the estimate into a short red suffix for the bar when the
+remaining quota will run out before its window resets, or for balances
+without a reset, within BALANCE_HORIZON.
+"""
+
+import math
+import time
+
+from quota_format import RED, format_countdown
+
+WARNING_ICON = "\uf071"  # exclamation-triangle
+# How far back the rate estimate effectively looks.
+RATE_TAU = 3600
+BALANCE_HORIZON = 7 * 86400
+
+
+def update(previous, samples, now=None):
+    """Fold one fetch's {metric: remaining} into the rate state."""
+    now = time.time() if now is None else now
+    previous = previous or {}
+    state = {}
+    for metric, value in samples.items():
+        if value is None:
+            continue
+        rate = 0.0
+        last = previous.get(metric)
+        if last:
+            rate = last["rate"]
+            elapsed = now - last["at"]
+            spent = last["value"] - value
+            if elapsed > 0 and spent >= 0:
+                alpha = 1 - math.exp(-elapsed / RATE_TAU)
+                rate += alpha * (spent / elapsed - rate)
+        state[metric] = {"at": now, "value": value, "rate": rate}
+    return state
+
+
+def combine(states, mean=False):
+    """One state for several accounts' states.
+
+    Each metric's levels are projected to its latest sample and summed, as
+    are the rates; `mean` averages them instead (for percentages).
+    """
+    by_metric = {}
+    for state in states:
+        for metric, estimate in (state or {}).items():
+            by_metric.setdefault(metric, []).append(estimate)
+    combined = {}
+    for metric, estimates in by_metric.items():
+        at = max(estimate["at"] for estimate in estimates)
+        value = sum(e["value"] - e["rate"] * (at - e["at"]) for e in estimates)
+        rate = sum(estimate["rate"] for estimate in estimates)
+        if mean:
+            value /= len(estimates)
+            rate /= len(estimates)
+        combined[metric] = {"at": at, "value": value, "rate": rate}
+    return combined or None
+
+
+def time_to_exhaustion(state, metric, now=None):
+    """Seconds until `metric` runs out at the estimated rate, or None."""
+    estimate = (state or {}).get(metric)
+    if not estimate or estimate["rate"] <= 0:
+        return None
+    now = time.time() if now is None else now
+    remaining = estimate["value"] - estimate["rate"] * (now - estimate["at"])
+    if remaining <= 0:
+        return None
+    return remaining / estimate["rate"]
+
+
+def warning(state, metric, reset_at=None, now=None):
+    """Bar suffix when `metric` will run out before `reset_at`, else ""."""
+    now = time.time() if now is None else now
+    left = time_to_exhaustion(state, metric, now)
+    if left is None:
+        return ""
+    horizon = reset_at - now if reset_at is not None else BALANCE_HORIZON
+    if left >= horizon:
+        return ""
+    return f" %{{F{RED}}}{WARNING_ICON} {format_countdown(left)}%{{F-}}"
@@ -0,0 +1,73 @@
+"""\
+quota_format.py
+
+Formatting shared by the polybar monitors: the solarized colours and the
+percent thresholds they use, reset countdowns, and the print-or-"?" wrapper
+each script's main() runs its render() through.
+"""
+
+import time
+from datetime import datetime
+
+import quota_trace
+
+
+GREEN = "#2aa198"
+YELLOW = "#b58900"
+RED = "#dc322f"
+ERROR_TEXT = f"%{{F{RED}}}?%{{F-}}"
+
+
+def color_for_percent(remaining_percent):
+    """Colour for a quota with `remaining_percent` left."""
+    if remaining_percent > 50:
+        return GREEN
+    elif remaining_percent >= 20:
+        return YELLOW
+    return RED
+
+
+def format_countdown(seconds):
+    """Time until a reset in compact form ('2d 4h', '4h 30m', '45m', 'now')."""
+    if seconds is None or seconds <= 0:
+        return "now"
+
+    minutes = int(seconds // 60)
+    hours = int(minutes // 60)
+    days = int(hours // 24)
+    minutes %= 60
+    hours %= 24
+
+    if days > 0:
+        return f"{days}d {hours}h"
+    elif hours > 0:
+        return f"{hours}h {minutes}m"
+    else:
+        return f"{minutes}m"
+
+
+def countdown_to(timestamp, now=None):
+    """format_countdown() until epoch `timestamp`; '' when it is unknown."""
+    if not timestamp:
+        return ""
+    now = time.time() if now is None else now
+    return format_countdown(timestamp - now)
+
+
+def iso_timestamp(value):
+    """Epoch seconds for an ISO-8601 timestamp, or None."""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def print_line(provider, render, error_text=ERROR_TEXT):
+    """Print render()'s line, traced as `provider`, or `error_text` if it
+    raises. Returns the exit status."""
+    try:
+        print(quota_trace.traced(provider, render, startup=True))
+    except Exception:
+        print(error_text)
+        return 1
+    return 0
@@ -0,0 +1,217 @@
+"""\
+quota_history.py
+
+Append-only time series of the values the quota monitors fetch.
+
+Each (provider, metric) pair has one file per retention tier, made of
+fixed-width little-endian records (timestamp f64, mean f32, min f32, max f32):
+
+  raw   every sample, kept for RAW_RETENTION (48 h)
+  5m    5-minute buckets, kept for FINE_RETENTION (30 d)
+  1h    hourly buckets, kept indefinitely (~170 KB per metric per year)
+
+Samples are appended to the raw tier. Once a tier's oldest record is more
+than COMPACT_SLACK of its retention past it, the expired part is folded into the
+next tier and the file rewritten, under an flock so concurrent monitors
+compact once. Queries memory-map the files and bisect on the timestamps, so
+they only touch the records they return.
+
+quota_cache records each account separately, under the provider name and
+account digest its cache entry uses ("zai-<digest>").
+
+Files live in $XDG_DATA_HOME/quota-monitors/history.
+"""
+
+import bisect
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+
+HISTORY_DIR = os.path.join(
+    os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"),
+    "quota-monitors", "history",
+)
+RECORD = struct.Struct("<dfff")
+RAW_RETENTION = 48 * 3600
+FINE_RETENTION = 30 * 86400
+# (tier name, bucket width in seconds, retention). Each tier's expired
+# records are folded into the next one's buckets.
+TIERS = (
+    ("raw", 0, RAW_RETENTION),
+    ("5m", 300, FINE_RETENTION),
+    ("1h", 3600, None),
+)
+# Let a tier overrun its retention by this fraction of it before rewriting
+# the file, so compaction runs every couple of hours for the raw tier and
+# about daily for the 5-minute one, not on every sample.
+COMPACT_SLACK = 1 / 24
+
+
+def series_path(provider, metric, tier):
+    """Path of one tier of a provider's metric."""
+    return os.path.join(HISTORY_DIR, f"{provider}.{metric}.{tier}")
+
+
+@contextlib.contextmanager
+def _locked(provider, metric, operation):
+    """Hold the metric's lock file: LOCK_SH to append, LOCK_EX to rewrite."""
+    with open(series_path(provider, metric, "lock"), "a") as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class _Timestamps:
+    """Sequence view of the record timestamps in a buffer, for bisect."""
+
+    def __init__(self, buf):
+        self.buf = buf
+
+    def __len__(self):
+        return len(self.buf) // RECORD.size
+
+    def __getitem__(self, i):
+        return struct.unpack_from("<d", self.buf, i * RECORD.size)[0]
+
+
+def _first_timestamp(path):
+    """Timestamp of the oldest record in `path`, or None if it is empty."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(RECORD.size)
+    except FileNotFoundError:
+        return None
+    return RECORD.unpack(head)[0] if len(head) == RECORD.size else None
+
+
+def _last_timestamp(path):
+    """Timestamp of the newest complete record in `path`, or None."""
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            size -= size % RECORD.size
+            if not size:
+                return None
+            f.seek(size - RECORD.size)
+            return RECORD.unpack(f.read(RECORD.size))[0]
+    except FileNotFoundError:
+        return None
+
+
+def _read_range(path, start, end):
+    """Records in `path` with start <= timestamp < end."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return []
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        size -= size % RECORD.size  # ignore a torn trailing append
+        if not size:
+            return []
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            stamps = _Timestamps(mm)
+            lo = bisect.bisect_left(stamps, start)
+            hi = bisect.bisect_left(stamps, end, lo)
+            return [RECORD.unpack_from(mm, i * RECORD.size) for i in range(lo, hi)]
+
+
+def _replace(path, data):
+    """Replace the contents of `path` with `data` atomically."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _buckets(records, width):
+    """Fold records into (start, mean, min, max) buckets `width` seconds wide."""
+    out = []
+    for t, mean, low, high in records:
+        start = t - t % width
+        if out and out[-1][0] == start:
+            _, total, count, lo, hi = out[-1]
+            out[-1] = (start, total + mean, count + 1, min(lo, low), max(hi, high))
+        else:
+            out.append((start, mean, 1, low, high))
+    return [(start, total / count, lo, hi) for start, total, count, lo, hi in out]
+
+
+def compact(provider, metric, now=None):
+    """Fold every tier's expired records into the next tier."""
+    now = time.time() if now is None else now
+    with _locked(provider, metric, fcntl.LOCK_EX):
+        for (tier, _, retention), (next_tier, width, _) in zip(TIERS, TIERS[1:]):
+            path = series_path(provider, metric, tier)
+            cutoff = now - retention
+            cutoff -= cutoff % width
+            first = _first_timestamp(path)
+            if first is None or first >= cutoff:
+                continue
+
+            with open(path, "rb") as f:
+                data = f.read()
+            data = data[:len(data) - len(data) % RECORD.size]
+            split = bisect.bisect_left(_Timestamps(data), cutoff)
+            expired = [RECORD.unpack_from(data, i * RECORD.size) for i in range(split)]
+            next_path = series_path(provider, metric, next_tier)
+            last = _last_timestamp(next_path)
+            # A crash between the append and the rewrite below leaves
+            # buckets already folded; skip them instead of duplicating.
+            new = [b for b in _buckets(expired, width) if last is None or b[0] > last]
+            with open(next_path, "ab") as f:
+                f.write(b"".join(RECORD.pack(*b) for b in new))
+            # The records kept are copied as bytes, never decoded.
+            _replace(path, data[split * RECORD.size:])
+
+
+def record(provider, samples, now=None):
+    """Append one sample per metric ({metric: value}) at time `now`."""
+    now = time.time() if now is None else now
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    for metric, value in samples.items():
+        if value is None:
+            continue
+        value = float(value)
+        with _locked(provider, metric, fcntl.LOCK_SH):
+            with open(series_path(provider, metric, "raw"), "ab") as f:
+                f.write(RECORD.pack(now, value, value, value))
+
+        for tier, _, retention in TIERS[:-1]:
+            first = _first_timestamp(series_path(provider, metric, tier))
+            if first is not None and first < now - retention * (1 + COMPACT_SLACK):
+                compact(provider, metric, now)
+                break
+
+
+def query(provider, metric, start, end=None):
+    """Records (timestamp, mean, min, max) with start <= timestamp < end.
+
+    Each part of the range comes from the finest tier still holding it:
+    raw samples for recent history, then 5-minute and hourly buckets.
+    """
+    end = time.time() if end is None else end
+    parts = []
+    for tier, _, _ in TIERS:
+        path = series_path(provider, metric, tier)
+        first = _first_timestamp(path)
+        if first is None:
+            continue
+        if end > start:
+            parts.append(_read_range(path, max(start, first), end))
+        end = min(end, first)
+    return [r for part in reversed(parts) for r in part]
@@ -0,0 +1,82 @@
+"""\
+quota_http.py
+
+Stdlib-only HTTP helpers for the polybar quota monitors.
+
+Importing requests costs more than the rest of a monitor put together, and
+the monitors only ever issue simple authenticated JSON GETs. Those go through
+quota_client's connection pool, which is imported on first use so a cache hit
+never loads http.client or ssl at all.
+
+Inside quota_cache.single_flight(), get_json() remembers each request's
+ETag, Last-Modified and body hash in the cache entry, keyed by URL and
+credential. When the entry still holds data the request is made
+conditional, and a 304 or a body identical to last time raises
+quota_cache.Unchanged instead of being parsed again.
+"""
+
+import hashlib
+import json
+
+import quota_trace
+from quota_cache import Unchanged, account_digest, validators
+
+
+class HTTPError(Exception):
+    """Non-2xx response from get_json()."""
+
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.headers = headers or {}
+
+
+def cookie_header(cookies):
+    """Build a Cookie header value from a name -> value mapping."""
+    return "; ".join(f"{name}={value}" for name, value in cookies.items())
+
+
+def _validators_key(url, headers):
+    """A request's key among an entry's validators: a digest of its URL and
+    the API key it was made with (cookies rotate, so they don't count)."""
+    return account_digest(url + "\n" + headers.get("Authorization", ""))
+
+
+def get_json(url, headers=None, timeout=10):
+    """GET `url` and decode its JSON body. Raises HTTPError on non-2xx.
+
+    Raises quota_cache.Unchanged when revalidating and the response carries
+    nothing new.
+    """
+    import quota_client
+
+    headers = dict(headers or {})
+    key = _validators_key(url, headers)
+    stored, seen = validators.get() or ({}, None)
+    known = stored.get(key, {})
+    revalidate = bool(known)
+    if revalidate:
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
+
+    # Reading error bodies too lets the connection go back to the pool.
+    with quota_client.request(url, headers=headers, timeout=timeout) as response:
+        body = response.read()
+    if response.status == 304 and revalidate:
+        seen[key] = known
+        raise Unchanged()
+    if not 200 <= response.status < 300:
+        raise HTTPError(response.status, dict(response.headers))
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+
+    fresh = {"etag": etag, "last_modified": last_modified,
+             "hash": hashlib.sha256(body).hexdigest()}
+    if seen is not None:
+        seen[key] = fresh
+    if revalidate and fresh["hash"] == known.get("hash"):
+        raise Unchanged()
+    with quota_trace.span("parse"):
+        return json.loads(body)
@@ -0,0 +1,170 @@
+"""\
+quota_metrics.py
+
+Prometheus textfile export of what the polybar quota monitors fetch.
+
+quota_cache.single_flight() calls export() after every upstream fetch, so
+the bar and the exporter share one fetch and Prometheus never calls a
+provider itself. Each provider gets its own `<provider>.prom` file in
+METRICS_DIR, replaced atomically, for node_exporter's textfile collector
+(--collector.textfile.directory) to pick up:
+
+  quota_remaining{metric}                 history samples (credits, percent left, ...)
+  quota_fraction_remaining{window}        per quota window, 0..1
+  quota_reset_timestamp_seconds{window}   when that window resets
+  quota_last_success_timestamp_seconds
+  quota_fetch_duration_seconds            last fetch, as a whole
+  quota_fetch_phase_seconds{phase}        last fetch, per quota_trace span
+  quota_fetches_total
+  quota_fetch_errors_total
+
+Every sample is also labelled with `provider` and `account` (the account
+digest quota_cache names its entries with). `window` is the window's
+position in the provider's schedule_windows(). Gauges keep their last good
+values through failed fetches; the counters and the values behind each
+file are kept in a small JSON state file per account next to it.
+
+METRICS_DIR is $QUOTA_METRICS_DIR, or $XDG_STATE_HOME/quota-monitors/metrics.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import time
+
+METRICS_DIR = os.environ.get("QUOTA_METRICS_DIR") or os.path.join(
+    os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"),
+    "quota-monitors", "metrics",
+)
+
+HELP = {
+    "quota_remaining": ("gauge", "Remaining quota or balance, in the provider's unit."),
+    "quota_fraction_remaining": ("gauge", "Fraction of a quota window left, 0 to 1."),
+    "quota_reset_timestamp_seconds": ("gauge", "Unix time a quota window resets."),
+    "quota_last_success_timestamp_seconds": ("gauge", "Unix time of the last good fetch."),
+    "quota_fetch_duration_seconds": ("gauge", "Duration of the last upstream fetch."),
+    "quota_fetch_phase_seconds": ("gauge", "Time the last fetch spent in each phase."),
+    "quota_fetches_total": ("counter", "Upstream fetches attempted."),
+    "quota_fetch_errors_total": ("counter", "Upstream fetches that failed."),
+}
+
+
+def _escape(value):
+    """A label value escaped for the text exposition format."""
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _sample(name, labels, value):
+    pairs = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+    return f"{name}{{{pairs}}} {float(value)!r}"
+
+
+def _add_samples(samples, provider, account, state):
+    """Append one account's samples from its saved state."""
+    base = {"provider": provider, "account": account}
+    for metric, value in sorted((state.get("remaining") or {}).items()):
+        if value is not None:
+            samples["quota_remaining"].append((dict(base, metric=metric), value))
+    for window in state.get("windows") or []:
+        labels = dict(base, window=window["window"])
+        if window.get("fraction") is not None:
+            samples["quota_fraction_remaining"].append((labels, window["fraction"]))
+        if window.get("reset_at"):
+            samples["quota_reset_timestamp_seconds"].append((labels, window["reset_at"]))
+    if state.get("last_success"):
+        samples["quota_last_success_timestamp_seconds"].append((base, state["last_success"]))
+    if state.get("duration") is not None:
+        samples["quota_fetch_duration_seconds"].append((base, state["duration"]))
+    for phase, seconds in sorted((state.get("phases") or {}).items()):
+        samples["quota_fetch_phase_seconds"].append((dict(base, phase=phase), seconds))
+    samples["quota_fetches_total"].append((base, state.get("fetches", 0)))
+    samples["quota_fetch_errors_total"].append((base, state.get("errors", 0)))
+
+
+def render(provider, states):
+    """The textfile for `provider` from its accounts' saved states."""
+    samples = {name: [] for name in HELP}
+    for account, state in sorted(states.items()):
+        _add_samples(samples, provider, account, state)
+
+    lines = []
+    for name, (kind, text) in HELP.items():
+        if not samples[name]:
+            continue
+        lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+        lines += [_sample(name, labels, value) for labels, value in samples[name]]
+    return "\n".join(lines) + "\n"
+
+
+def _replace(path, text):
+    """Write `text` to `path` atomically (temp file + rename in the same dir)."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.chmod(tmp, 0o644)  # node_exporter usually runs as its own user
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _states(provider):
+    """{account: saved state} for every account of `provider`."""
+    prefix = f".{provider}-"
+    states = {}
+    for name in os.listdir(METRICS_DIR):
+        account = name[len(prefix):-len(".json")]
+        # Account digests are plain hex, so "a-b" belongs to another provider.
+        if name.startswith(prefix) and name.endswith(".json") and "-" not in account:
+            try:
+                with open(os.path.join(METRICS_DIR, name)) as f:
+                    states[account] = json.load(f)
+            except (OSError, ValueError):
+                continue
+    return states
+
+
+def export(provider, account, spans, windows=None, remaining=None, error=None, now=None):
+    """Fold one fetch of `provider`'s `account` into its state and rewrite
+    the provider's textfile.
+
+    `spans` are the fetch's quota_trace spans; `windows` the provider's
+    (level, fraction, reset_at) tuples and `remaining` its history samples
+    on success, `error` the exception on failure.
+    """
+    now = time.time() if now is None else now
+    os.makedirs(METRICS_DIR, mode=0o755, exist_ok=True)
+    state_path = os.path.join(METRICS_DIR, f".{provider}-{account}.json")
+    with open(os.path.join(METRICS_DIR, f".{provider}.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(state_path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+            state["fetches"] = state.get("fetches", 0) + 1
+            spans = dict(spans or {})
+            state["duration"] = spans.pop("fetch", None)
+            state["phases"] = spans
+            if error is not None:
+                state["errors"] = state.get("errors", 0) + 1
+            else:
+                state["last_success"] = now
+                if remaining is not None:
+                    state["remaining"] = remaining
+                if windows is not None:
+                    state["windows"] = [
+                        {"window": str(index), "fraction": fraction, "reset_at": reset_at}
+                        for index, (_, fraction, reset_at) in enumerate(windows)
+                    ]
+            _replace(state_path, json.dumps(state))
+            _replace(os.path.join(METRICS_DIR, f"{provider}.prom"),
+                     render(provider, _states(provider)))
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,224 @@
+"""\
+quota_network.py
+
+Connectivity and suspend awareness for the polybar monitors.
+
+online() is a cheap check for a default route in /proc/net; while there is
+none, quota_cache.single_flight() raises Offline instead of calling fetch(),
+so a bar shows its cached value (or a red "?") at once rather than after a
+10 s timeout. Being offline does not count against a provider's circuit
+breaker.
+
+The resident daemon runs a Watcher, which follows route and link changes on
+an rtnetlink socket and logind's PrepareForSleep signal through
+`dbus-monitor --system`. On suspend and on losing the route it reports the
+machine offline (pooled connections are dead by then); once the route is
+back and has stayed up for SETTLE seconds it reports it online, once, so the
+daemon can refresh every provider together.
+"""
+
+import socket
+
+ROUTE_FILES = ("/proc/net/route", "/proc/net/ipv6_route")
+# Link and route events come in bursts while an interface comes up; wait for
+# them to settle before deciding.
+SETTLE = 2.0
+# Without rtnetlink, poll the route table this often.
+POLL_INTERVAL = 10
+DBUS_MONITOR = [
+    "dbus-monitor", "--system",
+    "type='signal',interface='org.freedesktop.login1.Manager',member='PrepareForSleep'",
+]
+
+# rtnetlink multicast groups (linux/rtnetlink.h).
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_ROUTE = 0x400
+
+
+class Offline(ConnectionError):
+    """There is no network route; no fetch was attempted."""
+
+
+def _has_default_route(path):
+    """Whether a /proc/net route table lists a default route."""
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return False
+    if path.endswith("ipv6_route"):
+        # dest, prefix length, src, src prefix length, next hop, metric,
+        # refcount, use, flags, device; loopback holds the reject routes.
+        return any(fields[0] == "0" * 32 and fields[1] == "00" and int(fields[8], 16) & 0x1
+                   and fields[9] != "lo"
+                   for fields in map(str.split, lines) if len(fields) >= 10)
+    # Iface, Destination, Gateway, Flags, ... with a header line first.
+    return any(fields[1] == "00000000" and int(fields[3], 16) & 0x1
+               for fields in map(str.split, lines[1:]) if len(fields) >= 8)
+
+
+def online():
+    """Whether any IPv4 or IPv6 default route is up."""
+    return any(_has_default_route(path) for path in ROUTE_FILES)
+
+
+def check():
+    """Raise Offline unless there is a route to fetch over, or every request
+    goes to this machine anyway."""
+    if not online() and not _loopback_base_url():
+        raise Offline("no default route")
+
+
+def _loopback_base_url():
+    """Whether quota_client.BASE_URL sends requests to a loopback origin,
+    such as replay_server.py."""
+    import ipaddress
+    import urllib.parse
+
+    import quota_client
+
+    if not quota_client.BASE_URL:
+        return False
+    host = urllib.parse.urlsplit(quota_client.BASE_URL).hostname
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _netlink_socket():
+    """A non-blocking rtnetlink socket subscribed to link and route changes."""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+    sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_ROUTE))
+    sock.setblocking(False)
+    return sock
+
+
+class SleepSignals:
+    """Picks logind's PrepareForSleep arguments out of dbus-monitor output."""
+
+    def __init__(self):
+        self.in_signal = False
+
+    def feed(self, line):
+        """True going to sleep, False on resume, None for any other line."""
+        fields = line.split()
+        if "member=PrepareForSleep" in line:
+            self.in_signal = True
+        elif self.in_signal and fields[:1] == ["boolean"]:
+            self.in_signal = False
+            return fields[1] == "true"
+        return None
+
+
+class Watcher:
+    """Reports connectivity changes to the daemon.
+
+    on_offline() is called on suspend or when the last default route goes,
+    on_online() when a route is back after either; each once per change.
+    """
+
+    def __init__(self, on_online, on_offline):
+        self.on_online = on_online
+        self.on_offline = on_offline
+        self.online = online()
+        self.sleeping = False
+        self._settle = None
+
+    def _update(self):
+        """Re-evaluate connectivity and report a change."""
+        now_online = not self.sleeping and online()
+        if now_online == self.online:
+            return
+        self.online = now_online
+        (self.on_online if now_online else self.on_offline)()
+
+    def _changed(self):
+        """Routes may have changed: going offline counts at once, coming back
+        once the route has been up for SETTLE seconds."""
+        import asyncio
+
+        up = not self.sleeping and online()
+        if self.online and not up:
+            self._update()
+        elif not self.online and up and self._settle is None:
+            self._settle = asyncio.get_running_loop().call_later(SETTLE, self._settled)
+        elif not up and self._settle is not None:
+            self._settle.cancel()
+            self._settle = None
+
+    def _settled(self):
+        self._settle = None
+        self._update()
+
+    async def _links(self):
+        """Follow rtnetlink events, or poll the route table without them."""
+        import asyncio
+
+        try:
+            sock = _netlink_socket()
+        except OSError:
+            while True:
+                await asyncio.sleep(POLL_INTERVAL)
+                self._changed()
+
+        loop = asyncio.get_running_loop()
+        with sock:
+            while True:
+                await loop.sock_recv(sock, 65536)
+                self._changed()
+
+    async def _sleep_signals(self):
+        """Follow logind's PrepareForSleep; gives up if dbus-monitor can't run."""
+        import asyncio
+
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *DBUS_MONITOR, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL)
+        except OSError:
+            return
+        signals = SleepSignals()
+        try:
+            async for raw in proc.stdout:
+                sleeping = signals.feed(raw.decode(errors="replace"))
+                if sleeping is None:
+                    continue
+                self.sleeping = sleeping
+                if sleeping:
+                    self._update()
+                else:
+                    # Interfaces come back a moment after resume.
+                    self._changed()
+        finally:
+            if proc.returncode is None:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+            await proc.communicate()  # reap it and drain the pipe
+
+    async def run(self):
+        import asyncio
+
+        tasks = [asyncio.create_task(self._links()), asyncio.create_task(self._sleep_signals())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # Cancel each once, so dbus-monitor is reaped before the loop goes.
+            for task in tasks:
+                task.cancel()
+            await asyncio.wait(tasks)
+
+
+def main():
+    up = online()
+    print("online" if up else "offline")
+    return 0 if up else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+"""\
+quota_schedule.py
+
+Adaptive refresh schedule for the polybar quota monitors.
+
+Each provider describes a fetched result as a list of windows
+(level, fraction, reset_at):
+
+  level     the value that moves as quota is spent (percent, credits, $)
+  fraction  share of the window still available, 0..1, or None if unbounded
+  reset_at  epoch seconds when the window resets, or None
+
+plan() turns that, plus the state it returned last time, into the next
+refresh time. Unchanged levels double the interval up to MAX_INTERVAL;
+any movement drops back to the base interval, and a fast burn or a nearly
+empty window polls faster still. A known reset before the next poll moves
+the poll to just after the reset.
+"""
+
+import time
+
+
+MIN_INTERVAL = 60
+MAX_INTERVAL = 3600
+# At or below this share remaining, a window that is still moving is polled
+# at MIN_INTERVAL.
+LOW_FRACTION = 0.2
+# Poll at least this many times before a window is projected to run out.
+POLLS_BEFORE_EXHAUSTION = 4
+# Providers report a reset slightly before they have applied it.
+RESET_GRACE = 5
+
+
+def _time_to_exhaustion(fraction, previous_fraction, elapsed):
+    """Seconds until `fraction` reaches zero at the rate since the last sample."""
+    if fraction is None or previous_fraction is None or elapsed <= 0:
+        return None
+    spent = previous_fraction - fraction
+    if spent <= 0:
+        return None
+    return fraction * elapsed / spent
+
+
+def plan(windows, previous=None, now=None, base=300):
+    """Schedule the next refresh. Returns a JSON-serialisable state dict.
+
+    `previous` is the dict this function returned after the last fetch;
+    `refresh_at` in the result is when the next fetch is due. `backoff` is
+    the interval before reset and burn-rate adjustments, so a poll pulled
+    forward for a reset does not restart the back-off from a few seconds.
+    """
+    now = time.time() if now is None else now
+    windows = [list(w) for w in windows]
+    levels = [w[0] for w in windows]
+    previous = previous or {}
+
+    if previous.get("levels") == levels:
+        backoff = min(previous.get("backoff", base) * 2, MAX_INTERVAL)
+        moving = False
+    else:
+        backoff = base
+        moving = bool(previous)
+
+    interval = backoff
+    previous_fractions = previous.get("fractions") or []
+    elapsed = now - previous.get("at", now)
+    for i, (_, fraction, reset_at) in enumerate(windows):
+        if moving and fraction is not None:
+            if fraction <= LOW_FRACTION:
+                interval = min(interval, MIN_INTERVAL)
+            if i < len(previous_fractions):
+                left = _time_to_exhaustion(fraction, previous_fractions[i], elapsed)
+                if left is not None:
+                    interval = min(interval, max(MIN_INTERVAL, left / POLLS_BEFORE_EXHAUSTION))
+        if reset_at is not None and now < reset_at < now + interval:
+            interval = reset_at - now + RESET_GRACE
+
+    interval = max(interval, RESET_GRACE)
+    return {
+        "at": now,
+        "levels": levels,
+        "fractions": [w[1] for w in windows],
+        "backoff": backoff,
+        "interval": interval,
+        "refresh_at": now + interval,
+        "resets": [w[2] for w in windows if w[2] is not None],
+    }
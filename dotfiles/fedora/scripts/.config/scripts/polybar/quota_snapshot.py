@@ -0,0 +1,155 @@
+"""\
+quota_snapshot.py
+
+The latest quota of every provider in one small file, for tools that want
+it without touching the network: dotfiles/shared/claude/statusline.sh
+reads it on every prompt refresh.
+
+quota_cache.single_flight() calls publish() after each upstream fetch. The
+file ($XDG_RUNTIME_DIR/quota-monitors/snapshot) is fixed-width ASCII,
+RECORD bytes per line: a header line, then one record per provider in
+SLOTS order, so provider i is always at byte RECORD * (i + 1) and the file
+can be mmap'ed and indexed directly. Fields are separated by spaces, so a
+shell reads it with `read` and no forks:
+
+  quota-snapshot <version> <slots>
+  <provider> <percent> <reset_at> <balance> <fetched_at> <status>
+
+`percent` is the whole percent left in the provider's tightest window and
+`reset_at` when that window resets (epoch seconds, 0 if unknown); balance
+providers have "-" there and their balance in dollars instead. `status` is
+"ok", or "error" while fetches fail (the values are then the last good
+ones). A provider that was never fetched has "-" everywhere. With several
+accounts the record follows the most recent fetch. The file is replaced
+atomically; VERSION changes whenever the layout does, and new providers
+are only ever appended to SLOTS.
+"""
+
+import fcntl
+import mmap
+import os
+import sys
+import tempfile
+
+SNAPSHOT_PATH = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), "quota-monitors", "snapshot"
+)
+MAGIC = "quota-snapshot"
+VERSION = 1
+RECORD = 64
+SLOTS = ("zai", "synthetic", "opencode-go", "openrouter", "neuralwatt", "claude")
+FIELDS = ("provider", "percent", "reset_at", "balance", "fetched_at", "status")
+
+
+def _line(*fields):
+    """One fixed-width line of `fields`."""
+    text = " ".join(str(field) for field in fields)
+    if len(text) >= RECORD:
+        raise ValueError(f"snapshot record too long: {text!r}")
+    return text.ljust(RECORD - 1) + "\n"
+
+
+def _empty(provider):
+    return _line(provider, "-", "-", "-", "-", "-")
+
+
+def record(provider, windows=None, samples=None, fetched_at=0, error=False, previous=None):
+    """The record line for a fetch of `provider`.
+
+    `windows` are the provider's (level, fraction, reset_at) tuples and
+    `samples` its history samples; on `error` the values of `previous`
+    (a dict from parse()) are kept.
+    """
+    if error:
+        if not previous or previous["status"] == "-":
+            return _line(provider, "-", "-", "-", "-", "error")
+        return _line(provider, previous["percent"], previous["reset_at"], previous["balance"],
+                     previous["fetched_at"], "error")
+
+    fractions = [(fraction, reset_at) for _, fraction, reset_at in windows or []
+                 if fraction is not None]
+    percent, reset_at = "-", 0
+    if fractions:
+        fraction, reset = min(fractions, key=lambda item: item[0])
+        percent = int(max(0.0, min(1.0, fraction)) * 100)
+        reset_at = int(reset or 0)
+    balance = (samples or {}).get("balance")
+    balance = "-" if balance is None else f"{balance:.2f}"
+    return _line(provider, percent, reset_at, balance, int(fetched_at), "ok")
+
+
+def parse(line):
+    """A record line as a dict of FIELDS."""
+    return dict(zip(FIELDS, line.split()))
+
+
+def _read_all(path):
+    """{provider: record line} from an existing snapshot of this VERSION."""
+    try:
+        with open(path) as f:
+            header, *lines = f.read().splitlines(keepends=True)
+    except (OSError, ValueError):
+        return {}
+    if header.split()[:2] != [MAGIC, str(VERSION)]:
+        return {}
+    return {line.split()[0]: line for line in lines if len(line) == RECORD and line.strip()}
+
+
+def publish(provider, windows=None, samples=None, fetched_at=0, error=False):
+    """Replace `provider`'s record in the snapshot (a no-op for providers
+    without a slot)."""
+    if provider not in SLOTS:
+        return
+    directory = os.path.dirname(SNAPSHOT_PATH)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    with open(SNAPSHOT_PATH + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            records = _read_all(SNAPSHOT_PATH)
+            previous = parse(records[provider]) if provider in records else None
+            records[provider] = record(provider, windows, samples, fetched_at, error, previous)
+            text = _line(MAGIC, VERSION, len(SLOTS)) + "".join(
+                records.get(slot) or _empty(slot) for slot in SLOTS)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(text)
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, SNAPSHOT_PATH)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read(provider, path=None):
+    """`provider`'s record as a dict, or None; mmaps the file and reads only
+    the header and that provider's slot."""
+    try:
+        slot = SLOTS.index(provider)
+        with open(path or SNAPSHOT_PATH, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if view[:RECORD].split()[:2] != [MAGIC.encode(), str(VERSION).encode()]:
+                return None
+            line = view[RECORD * (slot + 1):RECORD * (slot + 2)].decode("ascii")
+    except (OSError, ValueError):
+        return None
+    fields = parse(line)
+    return fields if fields.get("provider") == provider and fields["status"] != "-" else None
+
+
+def main(argv):
+    """Print the records of the providers named in `argv` (all by default)."""
+    status = 0
+    for provider in argv[1:] or SLOTS:
+        fields = read(provider)
+        if fields is None:
+            status = 1
+            continue
+        print(" ".join(fields[field] for field in FIELDS))
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,262 @@
+"""\
+quota_trace.py
+
+Per-run timing spans for the polybar monitors, kept in a rotating JSONL log.
+
+Every monitor run is traced as one record: a "render" run covers a bar
+update (process startup, formatting, the render as a whole) and a "fetch"
+run covers one upstream refresh, which may happen in a detached background
+process (credential resolution, dns/connect/tls/ttfb/body as reported by
+quota_client, parsing, the fetch as a whole). A record looks like
+
+  {"at": 1760000000.0, "provider": "zai", "kind": "fetch", "error": null,
+   "spans": {"credentials": 0.0004, "dns": 0.012, ..., "fetch": 0.31}}
+
+with span durations in seconds and `error` naming the exception a failed
+run raised (Unchanged for a revalidation that found nothing new). Startup
+is measured from the start of the `uv run` launcher when there is one, so
+it includes uv's own overhead.
+
+Records go to $XDG_STATE_HOME/quota-monitors/trace.jsonl, rotated at
+MAX_BYTES with BACKUPS older files kept. Set QUOTA_TRACE=0 to turn it off.
+
+Usage: python3 quota_trace.py [--since 24h] [--until 0s] [--provider NAME]
+Prints p50/p95/p99 per provider and phase for runs in the window.
+"""
+
+import contextlib
+import contextvars
+import fcntl
+import json
+import os
+import sys
+import time
+
+TRACE_DIR = os.path.join(
+    os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"),
+    "quota-monitors",
+)
+TRACE_LOG = os.path.join(TRACE_DIR, "trace.jsonl")
+MAX_BYTES = 1024 * 1024
+BACKUPS = 3
+ENABLED = os.environ.get("QUOTA_TRACE", "1") != "0"
+# quota_client timings that are recorded as spans.
+HTTP_PHASES = ("dns", "connect", "tls", "ttfb", "body")
+PERCENTILES = (50, 95, 99)
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Spans of the run in progress in this thread/task, or None outside a run.
+_spans = contextvars.ContextVar("quota_trace_spans", default=None)
+
+
+def _started_at(pid):
+    """Seconds since boot at which process `pid` started (Linux /proc)."""
+    with open(f"/proc/{pid}/stat") as f:
+        stat = f.read()
+    # Fields after the parenthesised command name start at field 3;
+    # starttime is field 22, in clock ticks since boot.
+    ticks = int(stat[stat.rindex(")") + 2:].split()[19])
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def startup_time():
+    """Seconds since this process (or the uv launcher that ran it) started.
+
+    None where /proc is unavailable.
+    """
+    try:
+        started = _started_at(os.getpid())
+        with open(f"/proc/{os.getppid()}/comm") as f:
+            if f.read().strip() == "uv":
+                started = _started_at(os.getppid())
+        return max(0.0, time.clock_gettime(time.CLOCK_BOOTTIME) - started)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def add(phase, seconds):
+    """Add `seconds` to `phase` of the current run, if any."""
+    spans = _spans.get()
+    if spans is not None and seconds is not None:
+        spans[phase] = spans.get(phase, 0.0) + seconds
+
+
+@contextlib.contextmanager
+def span(phase):
+    """Time the block as `phase` of the current run."""
+    if _spans.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(phase, time.perf_counter() - started)
+
+
+@contextlib.contextmanager
+def run(provider, kind="render", startup=False):
+    """Trace the block as one `kind` run of `provider` and log it on exit.
+
+    The run's own duration is recorded as the span named `kind`; `startup`
+    adds the process startup time (for a monitor's main()).
+    """
+    spans = {}
+    if startup:
+        seconds = startup_time()
+        if seconds is not None:
+            spans["startup"] = seconds
+    at = time.time()
+    started = time.perf_counter()
+    token = _spans.set(spans)
+    error = None
+    try:
+        yield spans
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        _spans.reset(token)
+        spans[kind] = time.perf_counter() - started
+        write({"at": at, "provider": provider, "kind": kind, "error": error,
+               "spans": spans})
+
+
+def traced(provider, render, startup=False):
+    """Call render() inside a render run of `provider` and return its line."""
+    with run(provider, startup=startup):
+        return render()
+
+
+def http_timings(url, timings):
+    """quota_client observer: add a request's network phases to the current run."""
+    for phase in HTTP_PHASES:
+        add(phase, timings.get(phase))
+
+
+def _rotate():
+    """Shift trace.jsonl -> .1 -> .2 ... dropping the oldest."""
+    for index in range(BACKUPS, 0, -1):
+        source = TRACE_LOG if index == 1 else f"{TRACE_LOG}.{index - 1}"
+        try:
+            os.replace(source, f"{TRACE_LOG}.{index}")
+        except FileNotFoundError:
+            pass
+
+
+def write(record):
+    """Append `record` to the trace log; never fails the monitor."""
+    if not ENABLED:
+        return
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    try:
+        os.makedirs(TRACE_DIR, mode=0o700, exist_ok=True)
+        with open(TRACE_LOG + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    size = os.path.getsize(TRACE_LOG)
+                except FileNotFoundError:
+                    size = 0
+                if size and size + len(line) > MAX_BYTES:
+                    _rotate()
+                with open(TRACE_LOG, "a") as f:
+                    f.write(line)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    except OSError:
+        pass
+
+
+def read_records(start=0.0, end=float("inf"), provider=None):
+    """Yield logged records with start <= at < end, oldest file first."""
+    paths = [f"{TRACE_LOG}.{index}" for index in range(BACKUPS, 0, -1)] + [TRACE_LOG]
+    for path in paths:
+        try:
+            f = open(path)
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                if not start <= record.get("at", 0) < end:
+                    continue
+                if provider is None or record.get("provider") == provider:
+                    yield record
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    rank = max(1, -(-pct * len(values) // 100))
+    return values[int(rank) - 1]
+
+
+def summarize(records):
+    """{(provider, phase): {"n": count, "p50": s, "p95": s, "p99": s}}."""
+    durations = {}
+    for record in records:
+        for phase, seconds in record.get("spans", {}).items():
+            durations.setdefault((record.get("provider"), phase), []).append(seconds)
+    summary = {}
+    for key, values in durations.items():
+        values.sort()
+        stats = {"n": len(values)}
+        for pct in PERCENTILES:
+            stats[f"p{pct}"] = percentile(values, pct)
+        summary[key] = stats
+    return summary
+
+
+def parse_duration(text):
+    """Seconds in a duration like "90s", "15m", "6h" or "7d"."""
+    text = text.strip()
+    if text[-1:] in DURATION_UNITS:
+        return float(text[:-1]) * DURATION_UNITS[text[-1]]
+    return float(text)
+
+
+def format_summary(summary):
+    """The summary as an aligned table in milliseconds."""
+    header = ["provider", "phase", "n"] + [f"p{pct} ms" for pct in PERCENTILES]
+    rows = [header]
+    for (provider, phase), stats in sorted(summary.items(), key=lambda item: (
+            str(item[0][0]), item[0][1])):
+        rows.append([str(provider), phase, str(stats["n"])]
+                    + [f"{stats[f'p{pct}'] * 1000:.1f}" for pct in PERCENTILES])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = []
+    for row in rows:
+        cells = [row[0].ljust(widths[0]), row[1].ljust(widths[1])]
+        cells += [cell.rjust(width) for cell, width in zip(row[2:], widths[2:])]
+        lines.append("  ".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize monitor timing spans.")
+    parser.add_argument("--since", default="24h", help="window start, ago (default 24h)")
+    parser.add_argument("--until", default="0s", help="window end, ago (default now)")
+    parser.add_argument("--provider", help="only this provider")
+    args = parser.parse_args(argv)
+
+    now = time.time()
+    try:
+        start = now - parse_duration(args.since)
+        end = now - parse_duration(args.until)
+    except ValueError:
+        parser.error("durations look like 90s, 15m, 6h or 7d")
+    summary = summarize(read_records(start, end, args.provider))
+    if not summary:
+        print("no runs recorded in that window", file=sys.stderr)
+        return 1
+    print(format_summary(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
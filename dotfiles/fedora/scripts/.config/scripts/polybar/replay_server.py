@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""\
+replay_server.py
+
+Local stand-in for every upstream the polybar monitors call. It answers
+from the recorded responses in fixtures/, so monitors can be exercised
+and timed over real HTTP without touching the network or any account.
+
+Point the monitors at it with QUOTA_BASE_URL (see quota_client.py):
+
+  python3 replay_server.py --port 8765 --latency 80 --jitter 40 &
+  QUOTA_BASE_URL=http://127.0.0.1:8765 ZAI_API_KEY=x uv run quota.py zai
+
+Requests are matched by path against ROUTES. Like the real APIs, bodies are
+gzip-compressed when the client accepts it and carry an ETag, and a
+matching If-None-Match gets a 304. Faults are drawn per request:
+
+  --latency/--jitter  delay each response by latency +/- uniform jitter (ms)
+  --rate-limit P      answer 429 with a Retry-After, with probability P
+  --truncate P        send half the promised body, then drop the connection,
+                      with probability P
+
+Usage: python3 replay_server.py [--port N] [--latency MS] [--jitter MS]
+                                [--rate-limit P] [--truncate P] [--seed N]
+"""
+
+import collections
+import gzip
+import hashlib
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "fixtures")
+RETRY_AFTER = 30
+
+# Upstream path -> recorded response, one per provider.
+ROUTES = (
+    (r"/v2/quotas", "synthetic.json"),                                # api.synthetic.new
+    (r"/api/monitor/usage/quota/limit", "zai.json"),                  # api.z.ai
+    (r"/api/v1/credits", "openrouter.json"),                          # openrouter.ai
+    (r"/v1/quota", "neuralwatt.json"),                                # api.neuralwatt.com
+    (r"/api/organizations/[^/]+/prepaid/credits", "claude.json"),     # platform.claude.com
+    (r"/workspace/[^/]+/go", "opencode-go.html"),                     # opencode.ai
+    (r"/data/2\.5/weather", "weather.json"),                          # api.openweathermap.org
+)
+CONTENT_TYPES = {
+    ".json": "application/json",
+    ".html": "text/html; charset=utf-8",
+}
+
+
+def load_fixtures(directory=FIXTURE_DIR):
+    """[(path pattern, fixture name, content type, body)] for ROUTES."""
+    routes = []
+    for pattern, name in ROUTES:
+        with open(os.path.join(directory, name), "rb") as f:
+            body = f.read()
+        routes.append((re.compile(pattern), name,
+                       CONTENT_TYPES[os.path.splitext(name)[1]], body))
+    return routes
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as the pooled client expects
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?", 1)[0]
+        for pattern, name, content_type, body in server.routes:
+            if pattern.fullmatch(path):
+                break
+        else:
+            server.count("404")
+            return self._send(404, "application/json", b'{"error": "no fixture"}')
+
+        delay = server.delay()
+        if delay:
+            time.sleep(delay)
+        if server.draw(server.rate_limit):
+            server.count("429")
+            return self._send(429, "application/json", b'{"error": "rate limited"}',
+                              {"Retry-After": str(RETRY_AFTER)})
+        server.count(name)
+
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, None, b"", {"ETag": etag})
+        headers = {"ETag": etag}
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body, mtime=0)
+            headers["Content-Encoding"] = "gzip"
+        truncate = server.draw(server.truncate)
+        if truncate:
+            server.count("truncated")
+        self._send(200, content_type, body, headers, truncate=truncate)
+
+    def _send(self, status, content_type, body, headers=None, truncate=False):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        if truncate:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+            body = body[:len(body) // 2]
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Replays fixtures on host:port (port 0 picks a free one).
+
+    `latency` and `jitter` are in seconds; `rate_limit` and `truncate` are
+    per-request probabilities. `hits` counts the requests served per
+    fixture, plus "404", "429" and "truncated".
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, rate_limit=0.0,
+                 truncate=0.0, seed=None, fixtures=FIXTURE_DIR, verbose=False):
+        super().__init__((host, port), _Handler)
+        self.routes = load_fixtures(fixtures)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.truncate = truncate
+        self.verbose = verbose
+        self.hits = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def delay(self):
+        """Seconds to hold the next response back."""
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def draw(self, probability):
+        """True with `probability`."""
+        if probability <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < probability
+
+    def count(self, key):
+        with self._lock:
+            self.hits[key] += 1
+
+    def start(self):
+        """Serve from a background thread; returns the base URL."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def close(self):
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay recorded upstream responses.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0, help="response delay (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="+/- delay spread (ms)")
+    parser.add_argument("--rate-limit", type=float, default=0, metavar="P",
+                        help="probability of a 429")
+    parser.add_argument("--truncate", type=float, default=0, metavar="P",
+                        help="probability of a truncated body")
+    parser.add_argument("--seed", type=int, help="seed for jitter and faults")
+    args = parser.parse_args(argv)
+
+    server = ReplayServer(args.host, args.port, args.latency / 1000, args.jitter / 1000,
+                          args.rate_limit, args.truncate, args.seed, verbose=True)
+    print(f"replaying {FIXTURE_DIR} on {server.base_url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # /// script
-# dependencies = ["requests"]
+# dependencies = []
 # ///
 
 """\
@@ -11,53 +11,29 @@ Shows 5-hour rolling, weekly token, and search hourly quotas.
 Each shows: remaining count/$ / percentage / time to reset
 Intended for use in polybar.
 
-Usage: synthetic-quota.py
+SYNTHETIC_API_KEY may list several keys separated by commas; the bar then
+shows their combined quotas (see quota_accounts.py).
+
+Usage: synthetic-quota.py [--accounts]
 """
 
-import requests
-import os
 import sys
-from datetime import datetime, timezone
-
 
-def format_time_remaining_iso(renews_at_str):
-    """Format time remaining until renewal in compact form."""
-    if not renews_at_str:
-        return ""
-    try:
-        renews_at = datetime.fromisoformat(renews_at_str.replace('Z', '+00:00'))
-        now = datetime.now(timezone.utc)
-
-        diff = renews_at - now
-        if diff.total_seconds() <= 0:
-            return "now"
-
-        days = diff.days
-        hours = diff.seconds // 3600
-        minutes = (diff.seconds % 3600) // 60
-
-        if days > 0:
-            return f"{days}d"
-        elif hours > 0:
-            return f"{hours}h {minutes}m"
-        else:
-            return f"{minutes}m"
-    except (ValueError, TypeError):
-        return ""
+import quota_accounts
+import quota_forecast
+import quota_trace
+from quota_cache import cached_many
+from quota_format import RED, color_for_percent, countdown_to, iso_timestamp, print_line
+from quota_http import get_json
 
 
-def get_color(percentage):
-    """Return color based on percentage remaining."""
-    if percentage > 50:
-        return "#2aa198"  # Green
-    elif percentage >= 20:
-        return "#b58900"  # Yellow
-    else:
-        return "#dc322f"  # Red
+API_URL = "https://api.synthetic.new/v2/quotas"
+ERROR_TEXT = f"%{{F{RED}}}syn:?%{{F-}}"
+CACHE_TTL = 300
 
 
-def format_rolling_quota(data, icon=""):
-    """Format 5-hour rolling limit: remaining / percentage / time."""
+def format_rolling_quota(data, icon="", warning=""):
+    """Format 5-hour rolling limit: remaining / percentage / time [/ warning]."""
     if not data:
         return ""
 
@@ -68,17 +44,17 @@ def format_rolling_quota(data, icon=""):
         return ""
 
     percentage = (remaining / max_limit) * 100
-    color = get_color(percentage)
+    color = color_for_percent(percentage)
 
     next_tick = data.get("nextTickAt")
-    time_str = format_time_remaining_iso(next_tick)
+    time_str = countdown_to(iso_timestamp(next_tick))
 
     prefix = f"{icon} " if icon else ""
-    return f"{prefix}%{{F{color}}}{remaining:.2f}/{int(percentage)}%%{{F-}} [{time_str}]"
+    return f"{prefix}%{{F{color}}}{remaining:.2f}/{int(percentage)}%%{{F-}} [{time_str}]{warning}"
 
 
-def format_weekly_token(data, icon=""):
-    """Format weekly token limit: $ remaining / percentage / time."""
+def format_weekly_token(data, icon="", warning=""):
+    """Format weekly token limit: $ remaining / percentage / time [/ warning]."""
     if not data:
         return ""
 
@@ -89,17 +65,17 @@ def format_weekly_token(data, icon=""):
         remaining = 0
 
     percent_remaining = data.get("percentRemaining", 0)
-    color = get_color(percent_remaining)
+    color = color_for_percent(percent_remaining)
 
     next_regen = data.get("nextRegenAt")
-    time_str = format_time_remaining_iso(next_regen)
+    time_str = countdown_to(iso_timestamp(next_regen))
 
     prefix = f"{icon} " if icon else ""
-    return f"{prefix}%{{F{color}}}${remaining:.2f}/{int(percent_remaining)}%%{{F-}} [{time_str}]"
+    return f"{prefix}%{{F{color}}}${remaining:.2f}/{int(percent_remaining)}%%{{F-}} [{time_str}]{warning}"
 
 
-def format_search_quota(data, icon=""):
-    """Format search hourly limit: remaining / percentage / time."""
+def format_search_quota(data, icon="", warning=""):
+    """Format search hourly limit: remaining / percentage / time [/ warning]."""
     if not data:
         return ""
 
@@ -111,63 +87,167 @@ def format_search_quota(data, icon=""):
 
     remaining = limit - used
     percentage = (remaining / limit) * 100
-    color = get_color(percentage)
+    color = color_for_percent(percentage)
 
     renews_at = data.get("renewsAt")
-    time_str = format_time_remaining_iso(renews_at)
+    time_str = countdown_to(iso_timestamp(renews_at))
 
     prefix = f"{icon} " if icon else ""
-    return f"{prefix}%{{F{color}}}{remaining:.2f}/{int(percentage)}%%{{F-}} [{time_str}]"
+    return f"{prefix}%{{F{color}}}{remaining:.2f}/{int(percentage)}%%{{F-}} [{time_str}]{warning}"
 
 
-# Synthetic API Key
-api_key = os.environ.get('SYNTHETIC_API_KEY', '')
+def fetch_quotas(api_key):
+    """Fetch quota data from the synthetic.new API."""
+    headers = {"Authorization": f"Bearer {api_key}"}
+    return get_json(API_URL, headers=headers, timeout=10)
 
-if not api_key:
-    print("%{{F#dc322f}}syn:?%{{F-}}")
-    sys.exit(1)
 
-# Get quota data from synthetic.new API
-try:
-    headers = {"Authorization": f"Bearer {api_key}"}
-    response = requests.get("https://api.synthetic.new/v2/quotas", headers=headers, timeout=10)
-    response.raise_for_status()
-    data = response.json()
-except Exception:
-    print("%{{F#dc322f}}syn:?%{{F-}}")
-    sys.exit(1)
-
-# Build output with exactly 3 items: 5-hour, weekly, search
-try:
+def format_quotas(data, forecast=None):
+    """Build output with up to 3 items: 5-hour, weekly, search.
+
+    `forecast` is the quota_forecast state; a window projected to run out
+    before it resets gets a warning with the time left.
+    """
     parts = []
 
     # 5-hour rolling - clock icon
     rolling = data.get("rollingFiveHourLimit", {})
     if rolling:
-        rolling_str = format_rolling_quota(rolling, icon="\uf017")
+        warning = quota_forecast.warning(forecast, "rolling", iso_timestamp(rolling.get("nextTickAt")))
+        rolling_str = format_rolling_quota(rolling, icon="\uf017", warning=warning)
         if rolling_str:
             parts.append(rolling_str)
 
     # Weekly token - dollar icon
     weekly = data.get("weeklyTokenLimit", {})
     if weekly:
-        weekly_str = format_weekly_token(weekly, icon="\uf155")
+        warning = quota_forecast.warning(forecast, "weekly", iso_timestamp(weekly.get("nextRegenAt")))
+        weekly_str = format_weekly_token(weekly, icon="\uf155", warning=warning)
         if weekly_str:
             parts.append(weekly_str)
 
     # Search hourly - magnifying glass icon
     search = data.get("search", {}).get("hourly", {})
     if search.get("limit", 0) > 0:
-        search_str = format_search_quota(search, icon="\uf002")
+        warning = quota_forecast.warning(forecast, "search", iso_timestamp(search.get("renewsAt")))
+        search_str = format_search_quota(search, icon="\uf002", warning=warning)
         if search_str:
             parts.append(search_str)
 
     # Output with dot separator
     if parts:
-        print(f"{' · '.join(parts)}")
-    else:
-        print("%{{F#dc322f}}syn:?%{{F-}}")
+        return f"{' · '.join(parts)}"
+    return ERROR_TEXT
+
+
+def _earliest(values):
+    """The earliest of some ISO-8601 timestamps, or None."""
+    values = [value for value in values if iso_timestamp(value) is not None]
+    return min(values, key=iso_timestamp) if values else None
+
+
+def combine_quotas(datas):
+    """Several keys' quotas as one response: counts and credits add up,
+    each window resets when the first of them does."""
+    combined = {}
+
+    rollings = [data["rollingFiveHourLimit"] for data in datas if data.get("rollingFiveHourLimit")]
+    if rollings:
+        combined["rollingFiveHourLimit"] = {
+            "remaining": sum(r.get("remaining", 0) for r in rollings),
+            "max": sum(r.get("max", 0) for r in rollings),
+            "nextTickAt": _earliest(r.get("nextTickAt") for r in rollings),
+        }
+
+    weeklies = [data["weeklyTokenLimit"] for data in datas if data.get("weeklyTokenLimit")]
+    if weeklies:
+        credits = 0.0
+        for weekly in weeklies:
+            try:
+                credits += float(weekly.get("remainingCredits", "$0.00").replace("$", ""))
+            except ValueError:
+                pass
+        combined["weeklyTokenLimit"] = {
+            "remainingCredits": f"${credits:.2f}",
+            "percentRemaining": sum(w.get("percentRemaining", 0) for w in weeklies) / len(weeklies),
+            "nextRegenAt": _earliest(w.get("nextRegenAt") for w in weeklies),
+        }
+
+    searches = [data.get("search", {}).get("hourly", {}) for data in datas]
+    searches = [search for search in searches if search.get("limit", 0) > 0]
+    if searches:
+        combined["search"] = {"hourly": {
+            "limit": sum(s["limit"] for s in searches),
+            "requests": sum(s.get("requests", 0) for s in searches),
+            "renewsAt": _earliest(s.get("renewsAt") for s in searches),
+        }}
+
+    return combined
+
+
+def schedule_windows(data):
+    """Quota windows as (level, fraction remaining, reset time) for quota_schedule."""
+    windows = []
+
+    rolling = data.get("rollingFiveHourLimit") or {}
+    if rolling.get("max"):
+        remaining = rolling.get("remaining", 0)
+        windows.append((remaining, remaining / rolling["max"],
+                        iso_timestamp(rolling.get("nextTickAt"))))
+
+    weekly = data.get("weeklyTokenLimit") or {}
+    if weekly:
+        windows.append((weekly.get("remainingCredits"),
+                        weekly.get("percentRemaining", 0) / 100,
+                        iso_timestamp(weekly.get("nextRegenAt"))))
+
+    search = data.get("search", {}).get("hourly", {})
+    limit = search.get("limit", 0)
+    if limit > 0:
+        used = search.get("requests", 0)
+        windows.append((used, (limit - used) / limit,
+                        iso_timestamp(search.get("renewsAt"))))
+
+    return windows
+
+
+def history_samples(data):
+    """Remaining rolling requests, weekly credits and searches for quota_history."""
+    samples = {}
+    rolling = data.get("rollingFiveHourLimit") or {}
+    if rolling.get("max"):
+        samples["rolling"] = rolling.get("remaining", 0)
+    weekly = data.get("weeklyTokenLimit") or {}
+    if weekly:
+        try:
+            samples["weekly"] = float(weekly.get("remainingCredits", "$0.00").replace("$", ""))
+        except ValueError:
+            pass
+    search = data.get("search", {}).get("hourly", {})
+    if search.get("limit", 0) > 0:
+        samples["search"] = search["limit"] - search.get("requests", 0)
+    return samples
+
+
+def render(detail=False):
+    """Fetch and format the quota line (per-key lines with `detail`).
+    Raises on any failure."""
+    # Synthetic API Keys
+    api_keys = quota_accounts.from_env('SYNTHETIC_API_KEY')
+    if not api_keys:
+        raise RuntimeError("SYNTHETIC_API_KEY is not set")
+
+    outcomes = cached_many("synthetic", api_keys, fetch_quotas, CACHE_TTL,
+                           windows=schedule_windows, samples=history_samples)
+    with quota_trace.span("format"):
+        return quota_accounts.render("synthetic", api_keys, outcomes, format_quotas,
+                                     combine_quotas, detail=detail, error_text=ERROR_TEXT)
+
+
+def main():
+    detail = quota_accounts.wants_detail(sys.argv)
+    sys.exit(print_line("synthetic", lambda: render(detail), ERROR_TEXT))
+
 
-except (KeyError, TypeError, ZeroDivisionError):
-    print("%{{F#dc322f}}syn:?%{{F-}}")
-    sys.exit(1)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Tests for bench_monitors.py (stdlib only, no external deps)."""
+import re
+
+import pytest
+
+import bench_monitors
+from replay_server import ReplayServer
+
+
+def _static(line):
+    """`line` without its reset countdowns, which move with the wall clock
+    between runs."""
+    return re.sub(r"\[[^\]]*\]", "[]", line)
+
+
+def test_cold_runs_fetch_and_warm_runs_hit_the_cache():
+    with ReplayServer(seed=1) as server:
+        samples = bench_monitors.bench(["zai", "claude"], 1, server)
+    assert server.hits == {"zai.json": 2, "claude.json": 2}
+    for provider in ("zai", "claude"):
+        cold, = samples[provider, "cold"]
+        warm, = samples[provider, "warm"]
+        assert (cold["status"], cold["requests"]) == (0, 1)
+        assert (warm["status"], warm["requests"]) == (0, 0)
+        assert _static(warm["line"]) == _static(cold["line"]) != "Login"
+        assert cold["wall"] > 0 and cold["cpu"] > 0 and cold["rss"] > 2**20
+        assert cold["parse"] > 0
+
+
+def test_unchanged_data_is_revalidated_without_parsing():
+    with ReplayServer(seed=1) as server:
+        samples = bench_monitors.bench(["openrouter"], 1, server)
+    unchanged, = samples["openrouter", "unchanged"]
+    assert (unchanged["status"], unchanged["requests"]) == (0, 1)
+    assert unchanged["parse"] == 0
+    assert _static(unchanged["line"]) == _static(samples["openrouter", "cold"][0]["line"])
+
+
+def test_failures_are_counted():
+    with ReplayServer(rate_limit=1) as server:
+        samples = bench_monitors.bench(["openrouter"], 2, server)
+    rows = {row["mode"]: row for row in bench_monitors.summarize(samples)}
+    assert rows["cold"]["failed"] == 2 and rows["cold"]["runs"] == 2
+    assert "openrouter" in bench_monitors.format_rows(rows.values())
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
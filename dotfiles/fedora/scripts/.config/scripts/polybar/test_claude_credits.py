@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Tests for claude-credits.py (stdlib only, no external deps)."""
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+SCRIPT = Path(__file__).with_name("claude-credits.py")
+
+spec = importlib.util.spec_from_file_location("claude_credits", SCRIPT)
+cc = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cc)
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(cc, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cc, "COOKIE_CACHE_PATH", str(tmp_path / "cookies.json"))
+    monkeypatch.setattr(cc, "_keyring_read", lambda: None)
+    monkeypatch.setattr(cc, "_keyring_write", lambda state: None)
+    return tmp_path
+
+
+def _jar(value):
+    """What a browser_cookie3 loader returns: an iterable of cookie objects."""
+    return [SimpleNamespace(name="sessionKey", value=value)]
+
+
+def _fake_firefox(monkeypatch, db, values):
+    """Stand-in browser_cookie3 whose Firefox yields the next value per load."""
+    loads = []
+
+    class Firefox:
+        def __init__(self, domain_name):
+            self.cookie_file = str(db)
+
+        def load(self):
+            loads.append(1)
+            return _jar(values[len(loads) - 1])
+
+    monkeypatch.setattr(cc, "browser_cookie3", SimpleNamespace(Firefox=Firefox))
+    return loads
+
+
+def _http_error(status):
+    return cc.HTTPError(status)
+
+
+def test_warm_run_reuses_cached_cookies(isolated, monkeypatch):
+    db = isolated / "cookies.sqlite"
+    db.write_bytes(b"v1")
+    loads = _fake_firefox(monkeypatch, db, ["a", "b"])
+    monkeypatch.setattr(cc, "fetch_balance", lambda org, jar: {"amount": jar.get("sessionKey")})
+    assert cc.fetch_credits("org") == {"amount": "a"}
+    assert cc.fetch_credits("org") == {"amount": "a"}
+    assert loads == [1]
+
+
+def test_cookie_db_change_invalidates_cache(isolated, monkeypatch):
+    db = isolated / "cookies.sqlite"
+    db.write_bytes(b"v1")
+    cc.save_cached_cookies(str(db), {"sessionKey": "a"})
+    assert cc.load_cached_cookies().get("sessionKey") == "a"
+    db.write_bytes(b"v2-longer")
+    assert cc.load_cached_cookies() is None
+
+
+def test_rejected_cached_cookies_are_reread_once(isolated, monkeypatch):
+    db = isolated / "cookies.sqlite"
+    db.write_bytes(b"v1")
+    cc.save_cached_cookies(str(db), {"sessionKey": "stale"})
+    loads = _fake_firefox(monkeypatch, db, ["fresh"])
+
+    def fetch(org, jar):
+        if jar.get("sessionKey") == "stale":
+            raise _http_error(401)
+        return {"amount": 500}
+
+    monkeypatch.setattr(cc, "fetch_balance", fetch)
+    assert cc.fetch_credits("org") == {"amount": 500}
+    assert loads == [1]
+    assert cc.load_cached_cookies().get("sessionKey") == "fresh"
+
+
+def test_rejected_fresh_cookies_report_expired(isolated, monkeypatch):
+    db = isolated / "cookies.sqlite"
+    db.write_bytes(b"v1")
+    _fake_firefox(monkeypatch, db, ["fresh"])
+    monkeypatch.setattr(cc, "fetch_balance", MagicMock(side_effect=_http_error(403)))
+    with pytest.raises(cc.DisplayError) as exc:
+        cc.fetch_credits("org")
+    assert exc.value.text == cc.EXPIRED_TEXT
+    assert cc.load_cached_cookies() is None
+
+
+def test_chrome_keys_round_trip_without_keyring(monkeypatch):
+    class Chrome:
+        def load(self):
+            return _jar(self.v11_key.hex())
+
+    chrome = Chrome()
+    chrome.v11_key, chrome.cookie_file, chrome.length = b"\x01\x02", "/c/Cookies", 16
+    monkeypatch.setattr(cc, "browser_cookie3", SimpleNamespace(Chrome=Chrome))
+    state = cc._dump_chrome_state(chrome)
+    monkeypatch.setattr(cc, "_keyring_read", lambda: state)
+    jar, cookie_file = cc._load_chrome_cookies()
+    assert (jar[0].value, cookie_file) == ("0102", "/c/Cookies")
+
+
+def test_format_balance_red_below_five_dollars():
+    assert cc.format_balance({"amount": 499}) == f"%{{F{cc.RED}}}$4.99%{{F-}}"
+    assert cc.format_balance({"amount": 1250}) == "$12.50"
+
+
+def test_fetch_balance_sends_cookie_header(monkeypatch):
+    seen = {}
+    monkeypatch.setattr(cc, "get_json", lambda url, headers, timeout: seen.update(
+        url=url, cookie=headers["Cookie"]) or {"amount": 1})
+    assert cc.fetch_balance("org-1", {"sessionKey": "s", "lastActiveOrg": "o"}) == {"amount": 1}
+    assert seen["url"].endswith("/organizations/org-1/prepaid/credits")
+    assert seen["cookie"] == "sessionKey=s; lastActiveOrg=o"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""\
+Import-time budget for the polybar monitors (stdlib only, no external deps).
+
+Each monitor is rendered from a warm cache entry in a fresh interpreter
+running with -X importtime. The cached path must not pull in the HTTP or
+browser-cookie stacks, and the imports it does make must fit the budget.
+The fetch path runs against replay_server.py with the stdlib HTTP client
+(quota_client) imported before timing starts, since every fetch needs it:
+what the monitor loads on top must fit the same budget, and must never
+include requests or browser_cookie3.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import quota_cache
+from replay_server import ReplayServer
+
+HERE = Path(__file__).resolve().parent
+# Cumulative microseconds for the imports a warm render triggers. The cached
+# path is json/datetime/fcntl/hashlib; importing requests alone costs ~130 ms.
+IMPORT_BUDGET_US = 50_000
+HEAVY_MODULES = ("requests", "browser_cookie3", "urllib.request", "ssl", "http.client")
+# Still off limits when a monitor fetches with credentials from the env.
+THIRD_PARTY = ("requests", "browser_cookie3")
+MARKER = "--- render ---"
+
+# (script, provider, account, env, cached data)
+MONITORS = [
+    ("synthetic-quota.py", "synthetic", "syn-key", {"SYNTHETIC_API_KEY": "syn-key"},
+     {"rollingFiveHourLimit": {"remaining": 80, "max": 100}}),
+    ("zai-quota.py", "zai", "zai-key", {"ZAI_API_KEY": "zai-key"},
+     {"data": {"limits": [{"type": "TOKENS_LIMIT", "percentage": 25},
+                         {"type": "TIME_LIMIT", "percentage": 10}]}}),
+    ("openrouter-balance.py", "openrouter", "or-key", {"OPENROUTER_API_KEY": "or-key"},
+     {"data": {"total_credits": 20, "total_usage": 5}}),
+    ("neuralwatt-credits.py", "neuralwatt", "nw-key", {"NEURALWATT_API_KEY": "nw-key"},
+     12.5),
+    ("claude-credits.py", "claude", "org-123", {},
+     {"amount": 1500}),
+    ("opencode-go-usage.py", "opencode-go", "wrk_1", {"OPENCODE_GO_WORKSPACE_ID": "wrk_1"},
+     {"rollingUsage": {"usagePercent": 40, "resetInSec": 600, "status": "ok"}}),
+]
+
+# (script, env) for monitors fetching from an empty cache, with credentials
+# from the env so no browser is read.
+FETCHES = [
+    ("zai-quota.py", {"ZAI_API_KEY": "zai-key"}),
+    ("opencode-go-usage.py", {"OPENCODE_GO_WORKSPACE_ID": "wrk_1",
+                              "OPENCODE_GO_AUTH_COOKIE": "session"}),
+]
+
+# argv: script, then modules to import before MARKER (left out of the cost).
+CHILD = f"""
+import importlib, importlib.util, json, sys
+for name in sys.argv[2:]:
+    importlib.import_module(name)
+sys.stderr.write({MARKER!r} + "\\n")
+sys.stderr.flush()
+spec = importlib.util.spec_from_file_location("monitor", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+line = module.render()
+print(json.dumps({{"line": line, "loaded": sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)}}))
+"""
+
+
+def _import_cost(stderr):
+    """Sum the cumulative time of top-level imports logged after MARKER."""
+    _, _, log = stderr.partition(MARKER)
+    total = 0
+    for line in log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        if name.startswith("  "):
+            continue  # nested import, already counted by its parent
+        total += int(cumulative)
+    return total
+
+
+def _render(tmp_path, script, env, preload=()):
+    """Render `script` in a fresh interpreter: (stdout result, importtime log)."""
+    home = tmp_path / "home"
+    (home / ".config/anthropic").mkdir(parents=True, exist_ok=True)
+    (home / ".config/anthropic/org_id").write_text("org-123\n")
+    child_env = {
+        "PATH": os.environ.get("PATH", ""),
+        "HOME": str(home),
+        "XDG_RUNTIME_DIR": str(tmp_path),
+        "XDG_STATE_HOME": str(tmp_path / "state"),
+        **env,
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, str(HERE / script), *preload],
+        cwd=HERE, env=child_env, capture_output=True, text=True, timeout=30,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    return json.loads(proc.stdout), proc.stderr
+
+
+@pytest.mark.parametrize("script,provider,account,env,data", MONITORS,
+                         ids=[m[0] for m in MONITORS])
+def test_warm_render_stays_light(tmp_path, monkeypatch, script, provider, account, env, data):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path / "quota-monitors"))
+    os.makedirs(quota_cache.CACHE_DIR)
+    quota_cache.write_entry(quota_cache.entry_path(provider, account),
+                            {"fetched_at": 1e12, "data": data})
+
+    result, log = _render(tmp_path, script, env)
+
+    assert result["line"] and "?" not in result["line"]
+    assert result["loaded"] == []
+    assert _import_cost(log) < IMPORT_BUDGET_US
+
+
+@pytest.mark.parametrize("script,env", FETCHES, ids=[f[0] for f in FETCHES])
+def test_fetch_skips_third_party_stacks(tmp_path, script, env):
+    with ReplayServer() as server:
+        result, log = _render(tmp_path, script, {"QUOTA_BASE_URL": server.base_url, **env},
+                              preload=["quota_client"])
+    assert sum(server.hits.values()) == 1
+
+    assert result["line"] and "?" not in result["line"]
+    assert not set(result["loaded"]) & set(THIRD_PARTY)
+    assert _import_cost(log) < IMPORT_BUDGET_US
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -2,7 +2,7 @@
 """Tests for neuralwatt-credits.py (stdlib only, no external deps)."""
 import importlib.util
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 SCRIPT = Path(__file__).with_name("neuralwatt-credits.py")
 
@@ -42,16 +42,14 @@ def test_format_balance_exactly_three_not_yellow():
 
 
 def test_fetch_balance_extracts_credits_remaining():
-    fake = MagicMock()
-    fake.json.return_value = {
+    payload = {
         "balance": {
             "credits_remaining_usd": 32.6774,
             "total_credits_usd": 52.34,
             "credits_used_usd": 19.6626,
         }
     }
-    fake.raise_for_status = MagicMock()
-    with patch("requests.get", return_value=fake) as mock_get:
+    with patch.object(nw, "get_json", return_value=payload) as mock_get:
         result = nw.fetch_balance("sk-test")
         assert result == 32.6774
         # Authorization bearer header sent
@@ -61,10 +59,7 @@ def test_fetch_balance_extracts_credits_remaining():
 
 
 def test_fetch_balance_missing_balance_defaults_to_zero():
-    fake = MagicMock()
-    fake.json.return_value = {"usage": {}}
-    fake.raise_for_status = MagicMock()
-    with patch("requests.get", return_value=fake):
+    with patch.object(nw, "get_json", return_value={"usage": {}}):
         assert nw.fetch_balance("sk-test") == 0
 
 
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Fuzz and time-budget tests for the opencode-go-usage.py dashboard parser.
+
+Mutates real-world dashboard payloads and checks that the linear-time
+extractor (a) agrees with the original regex implementation wherever that
+one is well-defined and (b) never exceeds a hard per-input time budget, even
+on inputs built to make a backtracking regex crawl.
+"""
+import importlib.util
+import random
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).with_name("opencode-go-usage.py")
+
+spec = importlib.util.spec_from_file_location("opencode_go_usage", SCRIPT)
+ocg = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(ocg)
+
+# Per-input budget for parsing up to ~1 MiB of hostile text.
+TIME_BUDGET = 0.5
+
+SEEDS = [
+    # Solid resource refs, as served by the live dashboard.
+    '<script>$R[31]={rollingUsage:$R[32]={status:"ok",resetInSec:3600,usagePercent:25},'
+    'weeklyUsage:$R[33]={status:"ok",resetInSec:86400,usagePercent:60},'
+    'monthlyUsage:$R[34]={status:"rate-limited",resetInSec:0,usagePercent:100},'
+    'useBalance:!0}</script>',
+    # Escaped JSON inside a Next.js flight payload.
+    '<script>self.__next_f.push([1,"{\\"rollingUsage\\":{\\"status\\":\\"ok\\",'
+    '\\"resetInSec\\":120,\\"usagePercent\\":10.5},\\"weeklyUsage\\":{\\"resetInSec\\":'
+    '\\"7200\\",\\"usagePercent\\":\\"55\\"},\\"useBalance\\":false}"])</script>',
+    # HTML-entity encoded attribute payload.
+    '<div data-props="{&quot;monthlyUsage&quot;:{&quot;status&quot;:&quot;ok&quot;,'
+    '&quot;resetInSec&quot;:99,&quot;usagePercent&quot;:-1}}"></div>',
+]
+
+TOKENS = [
+    "{", "}", '"', "'", ":", " ", "\n", "$R[", "$R[7]=", "]", "=", "&quot;", "&amp;",
+    "\\", '\\"', "\\u0022", "rollingUsage", "weeklyUsage", "monthlyUsage", "usagePercent",
+    "resetInSec", "status", "useBalance", "!0", "true", "-", ".", "1", "99.5",
+]
+
+
+def _reference_body(text, field_name):
+    """The original regex-based _capture_object_body, kept as an oracle."""
+    pattern = (
+        r'''["']?''' + re.escape(field_name)
+        + r'''["']?\s*:\s*(?:\$R\[\d+\]\s*=\s*)?\{([^{}]*)\}'''
+    )
+    match = re.search(pattern, text, re.DOTALL)
+    return match.group(1) if match else None
+
+
+def _reference_window(text, field_name):
+    body = _reference_body(text, field_name)
+    if body is None:
+        return None
+
+    def number(name):
+        m = re.search(r'''["']?''' + name + r'''["']?\s*:\s*"?(-?\d+(?:\.\d+)?)"?''', body)
+        return float(m.group(1)) if m else None
+
+    usage_percent, reset_in_sec = number("usagePercent"), number("resetInSec")
+    if usage_percent is None or reset_in_sec is None:
+        return None
+    status = re.search(r'''["']?status["']?\s*:\s*"([^"]*)"''', body)
+    return {
+        "usagePercent": usage_percent,
+        "resetInSec": max(0, int(reset_in_sec)),
+        "status": status.group(1) if status else None,
+    }
+
+
+def _mutate(rng, text):
+    for _ in range(rng.randint(1, 6)):
+        op = rng.randrange(4)
+        i = rng.randrange(len(text) + 1)
+        j = min(len(text), i + rng.randint(0, 40))
+        if op == 0:
+            text = text[:i] + text[j:]
+        elif op == 1:
+            text = text[:i] + text[i:j] * rng.randint(2, 4) + text[j:]
+        elif op == 2:
+            text = text[:i] + rng.choice(TOKENS) + text[i:]
+        else:
+            text = text[:j]
+    return text
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    assert elapsed < TIME_BUDGET, f"{func.__name__} took {elapsed:.3f}s"
+    return result
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_mutated_payloads_match_reference_parser(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        text = ocg.normalize_html(_mutate(rng, rng.choice(SEEDS)))
+        for field_name in ocg.USAGE_FIELDS:
+            body = _reference_body(text, field_name)
+            if body is not None and len(body) >= ocg.MAX_OBJECT_LEN:
+                continue
+            assert _timed(ocg.parse_window, text, field_name) == \
+                _reference_window(text, field_name), text
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_mutated_payloads_stream_like_whole_pages(seed):
+    rng = random.Random(1000 + seed)
+    for _ in range(200):
+        page = _mutate(rng, rng.choice(SEEDS))
+        size = rng.randint(1, 64)
+        scanner = ocg.DashboardScanner()
+        for i in range(0, len(page), size):
+            scanner.feed(page[i:i + size])
+        assert scanner.close() == ocg.parse_dashboard(page)
+
+
+PATHOLOGICAL = {
+    "unterminated objects": "rollingUsage:{" * 80_000,
+    "unterminated refs": "weeklyUsage:$R[" + "1" * 500_000,
+    "whitespace before colon": "monthlyUsage" + " " * 1_000_000,
+    "whitespace after colon": "rollingUsage:" + " " * 1_000_000 + "x",
+    "open braces": "{" * 1_000_000,
+    "keys only": "usagePercent:" * 80_000,
+    "huge flat body": "rollingUsage:{" + "usagePercent:1," * 60_000 + "}",
+    "entity soup": "&quot;&amp;\\" * 100_000,
+    "quoted keys": '"useBalance"' * 80_000,
+    "nested objects": "rollingUsage:{a:{" * 60_000 + "}" * 120_000,
+}
+
+
+@pytest.mark.parametrize("name", sorted(PATHOLOGICAL))
+def test_pathological_page_parses_within_budget(name):
+    page = PATHOLOGICAL[name]
+    usage = _timed(ocg.parse_dashboard, page)
+    assert set(usage) == set(ocg.USAGE_FIELDS) | {"useBalance"}
+
+
+@pytest.mark.parametrize("name", sorted(PATHOLOGICAL))
+def test_pathological_page_streams_within_budget(name):
+    page = PATHOLOGICAL[name]
+
+    def stream():
+        scanner = ocg.DashboardScanner()
+        for i in range(0, len(page), ocg.STREAM_CHUNK_SIZE):
+            scanner.feed(page[i:i + ocg.STREAM_CHUNK_SIZE])
+        return scanner.close()
+
+    _timed(stream)
+
+
+def test_real_window_after_hostile_prefix_is_still_found():
+    page = "rollingUsage:{" * 50_000 + SEEDS[0]
+    usage = _timed(ocg.parse_dashboard, page)
+    assert usage["weeklyUsage"]["usagePercent"] == 60.0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""Tests for opencode-go-usage.py."""
+import http.client
+import importlib.util
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import quota_client
+
+SCRIPT = Path(__file__).with_name("opencode-go-usage.py")
+
+spec = importlib.util.spec_from_file_location("opencode_go_usage", SCRIPT)
+ocg = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(ocg)
+
+DASHBOARD = (
+    '<script>$R[31]={rollingUsage:$R[32]={status:"ok",resetInSec:3600,usagePercent:25},'
+    'weeklyUsage:$R[33]={status:"ok",resetInSec:86400,usagePercent:60},'
+    'monthlyUsage:$R[34]={status:"rate-limited",resetInSec:0,usagePercent:100},'
+    'useBalance:!0}</script>'
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocg, "COOKIE_JAR_PATH", str(tmp_path / "state" / "cookies.json"))
+    monkeypatch.delenv("OPENCODE_GO_AUTH_COOKIE", raising=False)
+    monkeypatch.setattr(ocg, "_read_opencode_bar_config", lambda: None)
+    monkeypatch.setattr(ocg, "_browser_cookie3", lambda: None)
+    firefox = tmp_path / "firefox"
+    monkeypatch.setattr(ocg, "FIREFOX_DIR", str(firefox))
+    monkeypatch.setattr(ocg, "FIREFOX_PROFILE_GLOB", str(firefox / "*"))
+    monkeypatch.setattr(ocg, "FIREFOX_INDEX_PATH", str(tmp_path / "run" / "index.json"))
+    return tmp_path
+
+
+def _jar(value):
+    return ocg._new_jar([ocg._cookie(ocg.COOKIE_NAME, value)])
+
+
+def _auth(jar):
+    return next((c.value for c in jar if c.name == ocg.COOKIE_NAME), None)
+
+
+def test_parse_dashboard_reads_every_window():
+    usage = ocg.parse_dashboard(DASHBOARD)
+    assert usage["rollingUsage"] == {"usagePercent": 25.0, "resetInSec": 3600, "status": "ok"}
+    assert usage["weeklyUsage"]["usagePercent"] == 60.0
+    assert usage["monthlyUsage"]["status"] == "rate-limited"
+    assert usage["useBalance"] is True
+
+
+def test_saved_jar_round_trip_drops_expired_cookies():
+    jar = _jar("fresh")
+    jar.set_cookie(ocg._cookie("old", "x", expires=int(time.time()) - 60))
+    jar.set_cookie(ocg._cookie("other", "y", "example.com"))
+    ocg.save_jar(jar)
+    loaded = ocg.load_saved_jar()
+    assert {c.name: c.value for c in loaded} == {"auth": "fresh"}
+
+
+def test_rotated_cookie_is_persisted_and_browser_not_read_again(monkeypatch):
+    reads = []
+    monkeypatch.setattr(ocg, "_read_firefox_cookies_live",
+                        lambda: reads.append(1) or _jar("from-firefox"))
+
+    def fake_fetch(workspace_id, jar):
+        jar.set_cookie(ocg._cookie(ocg.COOKIE_NAME, "rotated-%d" % len(reads)))
+        return ocg.parse_dashboard(DASHBOARD)
+
+    monkeypatch.setattr(ocg, "fetch_dashboard", fake_fetch)
+    ocg.fetch_usage("wrk_1")
+    ocg.fetch_usage("wrk_1")
+    assert reads == [1]
+    assert {c.value for c in ocg.load_saved_jar()} == {"rotated-1"}
+
+
+def test_rejected_saved_jar_falls_back_to_firefox_once(monkeypatch):
+    ocg.save_jar(_jar("stale"))
+    monkeypatch.setattr(ocg, "_read_firefox_cookies_live", lambda: _jar("live"))
+    seen = []
+
+    def fake_fetch(workspace_id, jar):
+        value = _auth(jar)
+        seen.append(value)
+        if value == "stale":
+            raise ocg.DisplayError(ocg.EXPIRED_TEXT)
+        return ocg.parse_dashboard(DASHBOARD)
+
+    monkeypatch.setattr(ocg, "fetch_dashboard", fake_fetch)
+    assert ocg.fetch_usage("wrk_1")["rollingUsage"]["usagePercent"] == 25.0
+    assert seen == ["stale", "live"]
+    assert {c.value for c in ocg.load_saved_jar()} == {"live"}
+
+
+def test_countdown_runs_from_fetch_time_not_render_time(monkeypatch):
+    monkeypatch.setenv("OPENCODE_GO_AUTH_COOKIE", "from-env")
+    monkeypatch.setattr(ocg, "fetch_dashboard", lambda workspace_id, jar: ocg.parse_dashboard(DASHBOARD))
+    fetched = time.time()
+    usage = ocg.fetch_usage("wrk_1")
+    assert fetched <= usage["rollingUsage"]["resetAt"] - 3600 <= time.time()
+
+    # Fifteen minutes later the cached window renders 45m, with no refetch.
+    monkeypatch.setattr(ocg.time, "time", lambda: usage["rollingUsage"]["resetAt"] - 2700)
+    assert "[45m]" in ocg.format_window(usage["rollingUsage"])
+
+def test_env_cookie_is_never_persisted(monkeypatch):
+    monkeypatch.setenv("OPENCODE_GO_AUTH_COOKIE", "from-env")
+    monkeypatch.setattr(ocg, "fetch_dashboard", lambda workspace_id, jar: ocg.parse_dashboard(DASHBOARD))
+    ocg.fetch_usage("wrk_1")
+    assert ocg.load_saved_jar() is None
+
+
+ESCAPED_DASHBOARD = (
+    '<html><head>' + "x" * 5000 + '</head><script>self.__next_f.push([1,"'
+    '\\"rollingUsage\\":{\\"status\\":\\"ok\\",\\"resetInSec\\":120,\\"usagePercent\\":10},'
+    '&quot;weeklyUsage&quot;:{&quot;status&quot;:&quot;ok&quot;,&quot;resetInSec&quot;:7200,'
+    '&quot;usagePercent&quot;:&quot;55.5&quot;},'
+    '\\u0022monthlyUsage\\u0022:{\\u0022resetInSec\\u0022:99,\\u0022usagePercent\\u0022:5},'
+    '&#34;useBalance&#34;:false"])</script>' + "y" * 5000
+)
+
+
+def test_parse_dashboard_handles_escaped_json_forms():
+    usage = ocg.parse_dashboard(ESCAPED_DASHBOARD)
+    assert usage["rollingUsage"]["resetInSec"] == 120
+    assert usage["weeklyUsage"]["usagePercent"] == 55.5
+    assert usage["monthlyUsage"] == {"usagePercent": 5.0, "resetInSec": 99, "status": None}
+    assert usage["useBalance"] is False
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 11, 64, 1000])
+def test_scanner_gives_same_result_for_any_chunking(size):
+    for page in (DASHBOARD, ESCAPED_DASHBOARD):
+        scanner = ocg.DashboardScanner()
+        for i in range(0, len(page), size):
+            scanner.feed(page[i:i + size])
+        assert scanner.close() == ocg.parse_dashboard(page)
+
+
+def test_scanner_stops_once_every_field_is_found():
+    scanner = ocg.DashboardScanner()
+    assert scanner.feed(DASHBOARD) is True
+    assert scanner.close()["useBalance"] is True
+
+
+class _StreamingResponse:
+    def __init__(self, chunks):
+        self.url = "https://opencode.ai/workspace/wrk_1/go"
+        self.status = 200
+        self.headers = http.client.HTTPMessage()
+        self.headers["Content-Type"] = "text/html; charset=utf-8"
+        self.served = 0
+        self.closed = False
+        self._chunks = chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def iter_content(self, chunk_size):
+        for chunk in self._chunks:
+            self.served += 1
+            yield chunk.encode()
+
+
+def test_fetch_dashboard_closes_connection_after_last_field(monkeypatch):
+    response = _StreamingResponse([DASHBOARD] + ["<div>filler</div>" * 1000] * 50)
+    monkeypatch.setattr(quota_client, "request", lambda url, **kw: response)
+    usage = ocg.fetch_dashboard("wrk_1", ocg._new_jar())
+    assert usage["rollingUsage"]["usagePercent"] == 25.0
+    assert response.served == 1
+    assert response.closed
+
+
+def test_fetch_dashboard_decodes_characters_split_across_chunks(monkeypatch):
+    html = "<title>Go \u2014 \u20ac5</title>" + DASHBOARD
+    page = html.encode()
+    response = _StreamingResponse([])
+    response.iter_content = lambda chunk_size: (page[i:i + 1] for i in range(len(page)))
+    monkeypatch.setattr(quota_client, "request", lambda url, **kw: response)
+    assert ocg.fetch_dashboard("wrk_1", ocg._new_jar()) == \
+        ocg.parse_dashboard(html)
+
+
+def test_fetch_dashboard_auth_redirect_is_expired(monkeypatch):
+    response = _StreamingResponse([])
+    response.url = "https://auth.opencode.ai/authorize?x=1"
+    monkeypatch.setattr(quota_client, "request", lambda url, **kw: response)
+    with pytest.raises(ocg.DisplayError):
+        ocg.fetch_dashboard("wrk_1", ocg._new_jar())
+    assert response.closed
+
+
+def _firefox_profile(root, name, auth_value):
+    """Create a WAL-mode cookies.sqlite whose latest write is only in the WAL."""
+    profile = root / "firefox" / name
+    profile.mkdir(parents=True)
+    con = sqlite3.connect(profile / "cookies.sqlite")
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA wal_autocheckpoint=0")
+    con.execute("CREATE TABLE moz_cookies (name, value, host, path, isSecure)")
+    con.commit()
+    con.execute("INSERT INTO moz_cookies VALUES (?, ?, '.opencode.ai', '/', 1)",
+                (ocg.COOKIE_NAME, auth_value))
+    con.execute("INSERT INTO moz_cookies VALUES ('sid', 'x', 'example.com', '/', 0)")
+    con.commit()
+    return profile, con
+
+
+def test_firefox_reader_prefers_default_profile_and_sees_wal(isolated):
+    _, other = _firefox_profile(isolated, "aaa.other", "other-value")
+    _, default = _firefox_profile(isolated, "zzz.default-release", "live-value")
+    (isolated / "firefox" / "profiles.ini").write_text(
+        "[Profile0]\nPath=aaa.other\nIsRelative=1\n\n"
+        "[Install4F96D1932A9F858E]\nDefault=zzz.default-release\n"
+    )
+    jar = ocg._read_firefox_cookies_live()
+    assert {c.name: c.value for c in jar} == {"auth": "live-value"}
+    other.close()
+    default.close()
+
+
+def test_firefox_reader_skips_sqlite_for_unchanged_profile(isolated, monkeypatch):
+    _, con = _firefox_profile(isolated, "p.default", "v1")
+    opened = []
+    real = ocg._read_cookie_rows
+    monkeypatch.setattr(ocg, "_read_cookie_rows", lambda src: opened.append(src) or real(src))
+    monkeypatch.setattr(ocg.shutil, "copy2", lambda *a: pytest.fail("copied cookie DB"))
+
+    assert _auth(ocg._read_firefox_cookies_live()) == "v1"
+    assert _auth(ocg._read_firefox_cookies_live()) == "v1"
+    assert len(opened) == 1
+
+    con.execute("UPDATE moz_cookies SET value = 'v2' WHERE name = 'auth'")
+    con.commit()
+    assert _auth(ocg._read_firefox_cookies_live()) == "v2"
+    assert len(opened) == 2
+    con.close()
+
+
+def _fake_browsers(monkeypatch, tmp_path, loaders):
+    """Install a stand-in browser_cookie3 with only `loaders` present on disk."""
+    dirs = {}
+    for name in ocg.BROWSER_LOADERS:
+        dirs[name] = str(tmp_path / "browsers" / name)
+        if name in loaders:
+            (tmp_path / "browsers" / name).mkdir(parents=True)
+    monkeypatch.setattr(ocg, "BROWSER_DATA_DIRS", dirs)
+    fake = SimpleNamespace(**loaders)
+    monkeypatch.setattr(ocg, "_browser_cookie3", lambda: fake)
+    ocg._installed_browsers.cache_clear()
+    return fake
+
+
+def _loader(value, delay=0.0, calls=None):
+    def load(domain_name):
+        if calls is not None:
+            calls.append(domain_name)
+        time.sleep(delay)
+        if value is None or domain_name != "opencode.ai":
+            return []
+        return [SimpleNamespace(name=ocg.COOKIE_NAME, value=value,
+                                domain=domain_name, path="/")]
+    return load
+
+
+def _sweep(names=None):
+    cookies = ocg._sweep_loaders(ocg._installed_browsers() if names is None else names)
+    return {c.name: c.value for c in cookies or []}
+
+
+def test_browser_sweep_returns_first_hit_without_waiting(isolated, monkeypatch):
+    _fake_browsers(monkeypatch, isolated, {
+        "chrome": _loader("slow", delay=2),
+        "brave": _loader("fast"),
+    })
+    started = time.monotonic()
+    assert _sweep() == {ocg.COOKIE_NAME: "fast"}
+    assert time.monotonic() - started < 1
+
+
+def test_browser_sweep_skips_browsers_not_installed(isolated, monkeypatch):
+    calls = []
+    fake = _fake_browsers(monkeypatch, isolated, {"edge": _loader("edge-value")})
+    fake.chrome = _loader("x", calls=calls)
+    assert _sweep() == {ocg.COOKIE_NAME: "edge-value"}
+    assert calls == []
+
+
+def test_browser_sweep_gives_up_at_deadline(isolated, monkeypatch):
+    monkeypatch.setattr(ocg, "BROWSER_SWEEP_DEADLINE", 0.2)
+    _fake_browsers(monkeypatch, isolated, {
+        "chrome": _loader("late", delay=2),
+        "firefox": _loader(None),
+    })
+    started = time.monotonic()
+    assert _sweep() == {}
+    assert time.monotonic() - started < 1
+
+
+def _sweep_process(monkeypatch, isolated, code):
+    _fake_browsers(monkeypatch, isolated, {"chrome": _loader(None)})
+    monkeypatch.setattr(ocg, "_sweep_command", lambda: [sys.executable, "-c", code])
+
+
+def test_browser_sweep_runs_in_a_child_process(isolated, monkeypatch):
+    cookie = {"name": ocg.COOKIE_NAME, "value": "child", "domain": "opencode.ai", "path": "/"}
+    _sweep_process(monkeypatch, isolated, f"print({json.dumps([cookie])!r})")
+    threads = threading.active_count()
+    jar, source = ocg.get_cookie_jar(use_saved=False)
+    assert (_auth(jar), source) == ("child", "browser")
+    assert threading.active_count() == threads
+
+
+def test_overrunning_sweep_process_is_killed(isolated, monkeypatch):
+    monkeypatch.setattr(ocg, "BROWSER_SWEEP_DEADLINE", 0.1)
+    monkeypatch.setattr(ocg, "BROWSER_SWEEP_GRACE", 0.1)
+    _sweep_process(monkeypatch, isolated, "import time; time.sleep(5)")
+    started = time.monotonic()
+    assert ocg.get_cookie_jar(use_saved=False) == (None, None)
+    assert time.monotonic() - started < 2
+
+
+def test_sweep_process_reports_json(tmp_path):
+    env = {"PATH": os.environ.get("PATH", ""), "HOME": str(tmp_path)}
+    proc = subprocess.run(ocg._sweep_command(), env=env, capture_output=True, text=True,
+                          timeout=30)
+    assert json.loads(proc.stdout) == []
+
+
+def test_schedule_windows_turn_relative_resets_absolute():
+    usage = {
+        "rollingUsage": {"status": "ok", "resetInSec": 600, "usagePercent": 25},
+        "weeklyUsage": None,
+        "monthlyUsage": {"status": "ok", "resetInSec": 86400, "usagePercent": 100},
+    }
+    before = time.time()
+    windows = ocg.schedule_windows(usage)
+    assert [(level, fraction) for level, fraction, _ in windows] == [(25, 0.75), (100, 0.0)]
+    assert before + 600 <= windows[0][2] <= time.time() + 600
+
+
+def test_format_usage_warns_when_window_runs_out_before_reset(monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(ocg.time, "time", lambda: now)
+    usage = {"rollingUsage": {"status": "ok", "resetAt": now + 3 * 3600, "usagePercent": 70},
+             "weeklyUsage": {"status": "ok", "resetAt": now + 86400, "usagePercent": 10}}
+    # 30% left, spending 1% per 5 minutes: empty in 2.5 h, before the 3 h reset.
+    forecast = {"rolling": {"at": now, "value": 30.0, "rate": 1 / 300},
+                "weekly": {"at": now, "value": 90.0, "rate": 0.0}}
+    rolling, weekly = ocg.format_usage(usage, forecast).split(" \u00b7 ")
+    assert rolling.endswith("%{F#dc322f}\uf071 2h 30m%{F-}")
+    assert "\uf071" not in weekly
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Tests for quota.py (stdlib only, no external deps)."""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import quota
+import quota_cache
+
+HERE = Path(__file__).resolve().parent
+
+CHILD = """
+import json, sys
+import quota
+status = quota.main(sys.argv[1:])
+scripts = {name.replace("-", "_")[:-3] for name in quota.PROVIDERS.values()}
+print(json.dumps({"status": status, "loaded": sorted(scripts & set(sys.modules))}))
+"""
+
+
+@pytest.fixture
+def scripts(tmp_path, monkeypatch):
+    (tmp_path / "ok.py").write_text("def render():\n    return 'ok-line'\n")
+    (tmp_path / "bad.py").write_text(
+        "ERROR_TEXT = 'bad-line'\n"
+        "def render():\n    raise RuntimeError('boom')\n"
+    )
+    (tmp_path / "never.py").write_text("raise SystemExit('imported')\n")
+    monkeypatch.setattr(quota, "SCRIPT_DIR", str(tmp_path))
+    monkeypatch.setattr(quota, "PROVIDERS", {"ok": "ok.py", "bad": "bad.py", "never": "never.py"})
+    yield
+    for name in ("ok", "bad", "never"):
+        sys.modules.pop(name, None)
+
+
+def test_renders_requested_providers_in_order(scripts, capsys):
+    assert quota.main(["bad", "ok"]) == 1
+    assert capsys.readouterr().out.splitlines() == ["bad-line", "ok-line"]
+
+
+def test_only_requested_providers_are_imported(scripts, capsys):
+    assert quota.main(["ok"]) == 0
+    assert "ok" in sys.modules and "never" not in sys.modules
+
+
+def test_modules_are_loaded_once(scripts):
+    assert quota.load("ok") is quota.load("ok")
+
+
+def test_unknown_provider_is_a_usage_error(scripts, capsys):
+    assert quota.main(["ok", "nope"]) == 2
+    assert capsys.readouterr().out == ""
+
+
+def test_one_process_renders_a_subset_from_the_cache(tmp_path):
+    cache_dir = tmp_path / "quota-monitors"
+    os.makedirs(cache_dir)
+    entries = {
+        ("zai", "zai-key"): {"data": {"limits": [{"type": "TOKENS_LIMIT", "percentage": 25}]}},
+        ("openrouter", "or-key"): {"data": {"total_credits": 20, "total_usage": 5}},
+    }
+    for (provider, account), data in entries.items():
+        name = f"{provider}-{quota_cache.account_digest(account)}.json"
+        (cache_dir / name).write_text(json.dumps({"fetched_at": 1e12, "data": data}))
+
+    env = {
+        "PATH": os.environ.get("PATH", ""),
+        "HOME": str(tmp_path),
+        "XDG_RUNTIME_DIR": str(tmp_path),
+        "XDG_STATE_HOME": str(tmp_path / "state"),
+        "ZAI_API_KEY": "zai-key",
+        "OPENROUTER_API_KEY": "or-key",
+    }
+    proc = subprocess.run([sys.executable, "-c", CHILD, "zai", "openrouter"], cwd=HERE,
+                          env=env, capture_output=True, text=True, timeout=30)
+    *lines, result = proc.stdout.splitlines()
+    assert json.loads(result) == {"status": 0, "loaded": ["openrouter_balance", "zai_quota"]}
+    assert lines[0].startswith("%{F#2aa198}75%%{F-}") and lines[1] == "$15.00"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
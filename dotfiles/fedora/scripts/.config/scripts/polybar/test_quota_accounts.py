@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Tests for quota_accounts.py (stdlib only, no external deps)."""
+import pytest
+
+import quota_accounts as qa
+from quota_cache import DisplayError
+
+
+def _render(outcomes, detail=False):
+    return qa.render("demo", [f"k{i}" for i in range(len(outcomes))], outcomes,
+                     lambda data, forecast: f"${data:.2f}", sum, detail=detail)
+
+
+def test_split_accepts_commas_and_whitespace():
+    assert qa.split(" a,b\nc, a ") == ["a", "b", "c"]
+    assert qa.split(None) == []
+
+
+def test_single_account_is_formatted_as_before():
+    assert _render([(5.0, False)]) == "$5.00"
+
+
+def test_accounts_are_combined():
+    assert _render([(5.0, False), (2.5, False)]) == "$7.50"
+
+
+def test_failed_accounts_mark_the_line_partial():
+    line = _render([(5.0, False), TimeoutError()])
+    assert line == "$5.00" + qa.PARTIAL_MARKER
+
+
+def test_all_failed_raises_the_first_failure():
+    with pytest.raises(TimeoutError):
+        _render([TimeoutError(), KeyError("x")])
+
+
+def test_detail_lists_each_account():
+    outcomes = [(5.0, False), DisplayError("Login"), TimeoutError()]
+    assert _render(outcomes, detail=True) == "1: $5.00\n2: Login\n3: ?"
+
+
+def test_detail_flag():
+    assert qa.wants_detail(["zai-quota.py", "--accounts"])
+    assert not qa.wants_detail(["--accounts"])
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Tests for quota_breaker.py (stdlib only, no external deps)."""
+import errno
+import gzip
+import json
+import multiprocessing
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import quota_breaker as qb
+import quota_cache
+from quota_http import HTTPError
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _expire(provider="demo"):
+    """Jump to the end of the current open period."""
+    qb._locked_update(provider, lambda state: dict(state, open_until=time.time() - 1))
+
+
+def _open_for(provider="demo"):
+    return qb.open_until(provider) - time.time()
+
+
+def test_outages_open_with_exponential_backoff():
+    delays = []
+    for _ in range(7):
+        qb.record("demo", ConnectionRefusedError())
+        delays.append(round(_open_for()))
+    assert delays == [120, 240, 480, 960, 1920, 3600, 3600]
+
+
+def test_success_closes_and_resets_backoff():
+    qb.record("demo", TimeoutError())
+    qb.record("demo", TimeoutError())
+    qb.record("demo")
+    assert qb.open_until("demo") == 0
+    qb.record("demo", TimeoutError())
+    assert round(_open_for()) == qb.BASE_DELAY
+
+
+def test_only_outages_trip_the_breaker():
+    assert qb.is_outage(HTTPError(503))
+    assert qb.is_outage(HTTPError(429))
+    assert qb.is_outage(ConnectionResetError())
+    assert qb.is_outage(TimeoutError())
+    assert qb.is_outage(socket.gaierror(socket.EAI_AGAIN, "Temporary failure"))
+    assert qb.is_outage(OSError(errno.EHOSTUNREACH, "No route to host"))
+    assert qb.is_outage(SimpleNamespace(response=SimpleNamespace(status_code=502, headers={})))
+    assert not qb.is_outage(HTTPError(401))
+    assert not qb.is_outage(quota_cache.DisplayError("Expired"))
+    assert not qb.is_outage(KeyError("limits"))
+
+
+def test_bad_bodies_and_local_errors_are_not_outages():
+    with pytest.raises(ValueError) as garbage:
+        json.loads('{"data": {"limits": [')
+    with pytest.raises(OSError) as bad_gzip:
+        gzip.decompress(b"not gzip")
+    assert not qb.is_outage(garbage.value)
+    assert not qb.is_outage(bad_gzip.value)
+    assert not qb.is_outage(FileNotFoundError(errno.ENOENT, "cookies.sqlite"))
+    assert not qb.is_outage(PermissionError(errno.EACCES, "Cookies"))
+    qb.record("demo", garbage.value)
+    assert qb.open_until("demo") == 0
+
+
+def test_retry_after_extends_the_open_period():
+    qb.record("demo", HTTPError(429, {"retry-after": "900"}))
+    assert round(_open_for()) == 900
+    assert qb.retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"},
+                          now=1445412480 - 60) == 60
+    assert qb.retry_after({"Retry-After": "soon"}) is None
+
+
+def test_open_breaker_refuses_and_half_open_admits_one_probe():
+    qb.record("demo", TimeoutError())
+    with pytest.raises(qb.CircuitOpen):
+        qb.check("demo")
+
+    _expire()
+    qb.check("demo")  # this caller is the probe
+    with pytest.raises(qb.CircuitOpen):
+        qb.check("demo")
+
+    qb.record("demo", TimeoutError())  # probe failed: reopen, longer
+    assert round(_open_for()) == 2 * qb.BASE_DELAY
+
+
+def _probe(cache_dir, results):
+    quota_cache.CACHE_DIR = cache_dir
+    try:
+        qb.check("demo")
+        results.put("probe")
+    except qb.CircuitOpen:
+        results.put("refused")
+
+
+def test_half_open_probe_is_claimed_by_one_process(cache_dir):
+    qb.record("demo", TimeoutError())
+    _expire()
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_probe, args=(str(cache_dir), results)) for _ in range(6)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    outcomes = sorted(results.get() for _ in procs)
+    assert outcomes == ["probe"] + ["refused"] * 5
+
+
+def test_single_flight_does_not_fetch_while_open():
+    qb.record("demo", TimeoutError())
+    with pytest.raises(qb.CircuitOpen):
+        quota_cache.single_flight("demo", "key", lambda: pytest.fail("fetched"), max_age=0)
+
+
+def test_cached_keeps_last_value_and_defers_refresh_while_open(monkeypatch):
+    monkeypatch.setattr(quota_cache, "BACKGROUND_REFRESH", False)
+    quota_cache.write_entry(quota_cache.entry_path("demo", "key"),
+                            {"fetched_at": time.time() - 100, "data": "good"})
+
+    def down():
+        raise TimeoutError("no route")
+
+    assert quota_cache.cached("demo", "key", down, ttl=60) == ("good", False)
+    # The failure is cached for a TTL; past that, the open breaker still holds.
+    entry_path = quota_cache.entry_path("demo", "key")
+    entry = quota_cache.read_entry(entry_path)
+    quota_cache.write_entry(entry_path, dict(entry, failed_at=time.time() - 61))
+    assert quota_cache.cached("demo", "key", lambda: pytest.fail("fetched"), ttl=60)[0] == "good"
+    assert quota_cache.due_at["demo"] == pytest.approx(qb.open_until("demo"))
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Tests for quota_cache.py (stdlib only, no external deps)."""
+import json
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import quota_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _slow_fetch(counter_path):
+    with open(counter_path, "a") as f:
+        f.write("x")
+    time.sleep(0.3)
+    return {"remaining": 42}
+
+
+def _worker(counter_path, results):
+    data = quota_cache.single_flight("demo", "key", lambda: _slow_fetch(counter_path))
+    results.put(data)
+
+
+def test_concurrent_processes_share_one_fetch(tmp_path):
+    counter = tmp_path / "calls"
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(str(counter), results)) for _ in range(6)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(10)
+    assert counter.read_text() == "x"
+    assert [results.get(timeout=1) for _ in procs] == [{"remaining": 42}] * 6
+
+
+def test_fresh_result_is_reused_and_stale_one_refetched(cache_dir):
+    calls = []
+    fetch = lambda: calls.append(1) or len(calls)
+    assert quota_cache.single_flight("demo", "key", fetch, max_age=60) == 1
+    assert quota_cache.single_flight("demo", "key", fetch, max_age=60) == 1
+    assert quota_cache.single_flight("demo", "key", fetch, max_age=0) == 2
+
+
+def test_accounts_are_isolated_and_not_in_filenames(cache_dir):
+    quota_cache.single_flight("demo", "sk-secret-a", lambda: "a")
+    assert quota_cache.single_flight("demo", "sk-secret-b", lambda: "b") == "b"
+    assert not any("secret" in name for name in os.listdir(cache_dir))
+
+
+def test_failure_is_not_reused_by_later_callers(cache_dir):
+    def boom():
+        raise ValueError("down")
+
+    with pytest.raises(ValueError):
+        quota_cache.single_flight("demo", "key", boom)
+    assert quota_cache.single_flight("demo", "key", lambda: "ok") == "ok"
+
+
+def test_display_error_is_replayed_for_waiters(cache_dir):
+    path = quota_cache.entry_path("demo", "key")
+    quota_cache.write_entry(path, {"failed_at": time.time() + 5,
+                                   "error": "Login", "display": True})
+    with pytest.raises(quota_cache.DisplayError) as exc:
+        quota_cache.single_flight("demo", "key", lambda: "unused")
+    assert exc.value.text == "Login"
+
+
+def test_write_entry_leaves_no_temp_files(cache_dir):
+    path = quota_cache.entry_path("demo", "key")
+    quota_cache.write_entry(path, {"data": 1})
+    assert json.loads(open(path).read()) == {"data": 1}
+    assert os.listdir(cache_dir) == [os.path.basename(path)]
+
+
+def _seed(data, age, **extra):
+    path = quota_cache.entry_path("demo", "key")
+    os.makedirs(quota_cache.CACHE_DIR, exist_ok=True)
+    quota_cache.write_entry(path, {"fetched_at": time.time() - age, "data": data, **extra})
+    return path
+
+
+def test_cached_cold_cache_fetches_in_foreground(cache_dir):
+    assert quota_cache.cached("demo", "key", lambda: 7, ttl=300) == (7, False)
+
+
+def test_cached_fresh_value_does_not_fetch(cache_dir):
+    _seed("old", age=10)
+    assert quota_cache.cached("demo", "key", lambda: pytest.fail("fetched"), ttl=300) == ("old", False)
+
+
+def test_cached_expired_value_returned_at_once_and_refreshed_in_background(cache_dir):
+    path = _seed("old", age=400)
+    assert quota_cache.cached("demo", "key", lambda: "new", ttl=300) == ("old", False)
+    deadline = time.time() + 5
+    while quota_cache.read_entry(path).get("data") != "new":
+        assert time.time() < deadline, "background refresh never landed"
+        time.sleep(0.05)
+
+
+def test_cached_marks_value_stale_after_n_intervals(cache_dir, monkeypatch):
+    monkeypatch.setattr(quota_cache, "BACKGROUND_REFRESH", False)
+    _seed("old", age=700)
+
+    def boom():
+        raise ValueError("down")
+
+    assert quota_cache.cached("demo", "key", boom, ttl=300) == ("old", True)
+    assert quota_cache.mark_stale("$1.00", True) == "$1.00" + quota_cache.STALE_MARKER
+    assert quota_cache.mark_stale("$1.00", False) == "$1.00"
+
+
+def test_cached_failure_keeps_last_good_value(cache_dir, monkeypatch):
+    monkeypatch.setattr(quota_cache, "BACKGROUND_REFRESH", False)
+    path = _seed("good", age=400)
+
+    def boom():
+        raise ValueError("down")
+
+    assert quota_cache.cached("demo", "key", boom, ttl=300) == ("good", False)
+    entry = quota_cache.read_entry(path)
+    assert entry["data"] == "good" and "ValueError" in entry["error"]
+
+
+def test_cached_replays_newer_display_error(cache_dir):
+    _seed("good", age=100, failed_at=time.time() - 5, error="Expired", display=True)
+    with pytest.raises(quota_cache.DisplayError):
+        quota_cache.cached("demo", "key", lambda: "unused", ttl=300)
+
+
+
+def test_cached_stores_schedule_from_windows(cache_dir):
+    data, _ = quota_cache.cached("demo", "key", lambda: 5, ttl=300,
+                                 windows=lambda d: [(d, None, None)])
+    entry = quota_cache.read_entry(quota_cache.entry_path("demo", "key"))
+    assert entry["schedule"]["levels"] == [5]
+    assert quota_cache.due_at["demo"] == entry["schedule"]["refresh_at"]
+
+
+def test_cached_follows_schedule_instead_of_ttl(cache_dir, monkeypatch):
+    monkeypatch.setattr(quota_cache, "BACKGROUND_REFRESH", False)
+    windows = lambda d: [(d, None, None)]
+    # Older than the TTL, but the schedule backed off to an hour: no fetch, not stale.
+    _seed("flat", age=900, schedule={"refresh_at": time.time() + 2700})
+    assert quota_cache.cached("demo", "key", lambda: pytest.fail("fetched"), ttl=300,
+                              windows=windows) == ("flat", False)
+    # Younger than the TTL, but a reset was scheduled a moment ago: refetch.
+    _seed("old", age=30, schedule={"refresh_at": time.time() - 1})
+    assert quota_cache.cached("demo", "key", lambda: "new", ttl=300,
+                              windows=windows) == ("new", False)
+
+
+def test_cached_many_fetches_accounts_concurrently(cache_dir):
+    def fetch(account):
+        time.sleep(0.3)
+        return account.upper()
+
+    started = time.monotonic()
+    outcomes = quota_cache.cached_many("demo", ["a", "b", "c"], fetch, ttl=300)
+    assert time.monotonic() - started < 0.6
+    assert outcomes == [("A", False), ("B", False), ("C", False)]
+
+
+def test_cached_many_keeps_failures_per_account(cache_dir):
+    def fetch(account):
+        if account == "bad":
+            raise TimeoutError()
+        return 1
+
+    good, bad = quota_cache.cached_many("demo", ["good", "bad"], fetch, ttl=300)
+    assert good == (1, False)
+    assert isinstance(bad, TimeoutError)
+
+
+def test_cached_many_registers_the_earliest_due_account(cache_dir):
+    now = time.time()
+    reset = {"a": now + 600, "b": now + 60}
+    quota_cache.cached_many("demo", ["a", "b"], lambda account: reset[account], ttl=300,
+                            windows=lambda d: [(d, 0.5, d)])
+    schedules = [quota_cache.read_entry(quota_cache.entry_path("demo", account))["schedule"]
+                 for account in "ab"]
+    assert quota_cache.due_at["demo"] == min(s["refresh_at"] for s in schedules)
+    assert list(quota_cache.resets_at["demo"]) == sorted(reset.values())
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Tests for quota_client.py against a local HTTP/1.1 http.server (stdlib only)."""
+import gzip
+import http.cookiejar
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import quota_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.seen.append((self.client_address, self.path, dict(self.headers)))
+        status, headers, body = server.reply(self)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.path == "/short":
+            body = body[:len(body) // 2]
+            self.close_connection = True
+        self.wfile.write(body)
+        if self.path == "/hangup":
+            self.close_connection = True  # without telling the client
+
+
+class _Server(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # clients abandoning a body reset the connection
+
+
+def _serve(tls_context=None):
+    httpd = _Server(("127.0.0.1", 0), _Handler)
+    if tls_context:
+        httpd.socket = tls_context.wrap_socket(httpd.socket, server_side=True)
+    httpd.seen = []
+    httpd.reply = lambda handler: (200, {}, b"ok")
+    scheme = "https" if tls_context else "http"
+    httpd.base = f"{scheme}://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    return httpd
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    monkeypatch.setattr(quota_client, "_dns", {})
+    monkeypatch.setattr(quota_client, "_tls_sessions", {})
+    monkeypatch.setattr(quota_client, "observers", [])
+    yield
+    quota_client.close_all()
+
+
+@pytest.fixture
+def server():
+    httpd = _serve()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url, **kwargs):
+    with quota_client.request(url, **kwargs) as response:
+        return response, response.read()
+
+
+def test_connections_are_kept_alive_and_reused(server):
+    first, body = _get(server.base + "/a")
+    second, _ = _get(server.base + "/b")
+    assert body == b"ok"
+    assert (first.timings["reused"], second.timings["reused"]) == (False, True)
+    assert server.seen[0][0] == server.seen[1][0]  # same client port
+
+
+def test_partly_read_response_is_not_pooled(server):
+    server.reply = lambda handler: (200, {}, b"x" * 100_000)
+    with quota_client.request(server.base) as response:
+        next(response.iter_content(1024))
+    again, _ = _get(server.base)
+    assert again.timings["reused"] is False
+
+
+def test_dropped_keep_alive_connection_is_retried(server):
+    _get(server.base + "/hangup")
+    response, body = _get(server.base + "/after")
+    assert body == b"ok" and response.timings["reused"] is False
+    assert server.seen[-1][1] == "/after"
+
+
+def test_gzip_bodies_are_decoded(server):
+    payload = b'{"left": 7}' * 200
+    server.reply = lambda handler: (200, {"Content-Encoding": "gzip"}, gzip.compress(payload))
+    response, body = _get(server.base)
+    assert body == payload
+    assert "gzip" in server.seen[0][2]["Accept-Encoding"]
+
+
+def test_body_cut_short_raises(server):
+    server.reply = lambda handler: (200, {}, b"x" * 1000)
+    with pytest.raises(ConnectionError, match="500 bytes missing"):
+        _get(server.base + "/short")
+
+
+def test_base_url_redirects_requests_but_not_urls(server, monkeypatch):
+    monkeypatch.setattr(quota_client, "BASE_URL", server.base)
+    jar = http.cookiejar.CookieJar()
+    jar.set_cookie(http.cookiejar.Cookie(
+        0, "auth", "s", None, False, "api.example.com", False, False, "/", True,
+        False, None, False, None, None, {}))
+    response, body = _get("https://api.example.com/v1/quota?x=1", cookie_jar=jar)
+    assert body == b"ok" and response.url == "https://api.example.com/v1/quota?x=1"
+    assert server.seen[0][1] == "/v1/quota?x=1"
+    assert server.seen[0][2]["Cookie"] == "auth=s"
+
+
+def test_redirects_carry_cookies_and_drop_credentials_off_host(server):
+    port = server.server_address[1]
+
+    def reply(handler):
+        if handler.path == "/login":
+            return 302, {"Location": "/home", "Set-Cookie": "sid=abc; Path=/"}, b""
+        if handler.path == "/home":
+            return 302, {"Location": f"http://localhost:{port}/elsewhere"}, b""
+        return 200, {}, b"done"
+
+    server.reply = reply
+    jar = http.cookiejar.CookieJar()
+    response, body = _get(server.base + "/login", cookie_jar=jar,
+                          headers={"Authorization": "Bearer k"})
+    assert body == b"done" and response.url == f"http://localhost:{port}/elsewhere"
+    assert [c.name for c in jar] == ["sid"]
+    home, elsewhere = server.seen[1][2], server.seen[2][2]
+    assert home["Cookie"] == "sid=abc" and home["Authorization"] == "Bearer k"
+    assert "Authorization" not in elsewhere
+
+
+def test_dns_answers_are_cached(server, monkeypatch):
+    lookups = []
+    real = socket.getaddrinfo
+    monkeypatch.setattr(socket, "getaddrinfo", lambda *a, **kw: lookups.append(a) or real(*a, **kw))
+    url = f"http://localhost:{server.server_address[1]}/"
+    first, _ = _get(url)
+    quota_client.close_all()
+    second, _ = _get(url)
+    assert len(lookups) == 1
+    assert (first.timings["dns_cached"], second.timings["dns_cached"]) == (False, True)
+
+
+def test_observers_receive_timings(server):
+    seen = []
+    quota_client.observers.append(lambda url, timings: seen.append((url, timings)))
+    _get(server.base + "/t")
+    url, timings = seen[0]
+    assert url == server.base + "/t"
+    assert {"dns", "connect", "ttfb", "body", "reused"} <= timings.keys()
+
+
+@pytest.mark.skipif(not shutil.which("openssl"), reason="needs openssl to make a certificate")
+def test_tls_sessions_are_resumed(tmp_path, monkeypatch):
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", str(key), "-out", str(cert)], check=True, capture_output=True)
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(cert, key)
+    monkeypatch.setattr(quota_client, "_tls_context", ssl.create_default_context(cafile=cert))
+    httpd = _serve(server_context)
+    try:
+        first, _ = _get(httpd.base)
+        quota_client.close_all()
+        second, _ = _get(httpd.base)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert (first.timings["tls_resumed"], second.timings["tls_resumed"]) == (False, True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
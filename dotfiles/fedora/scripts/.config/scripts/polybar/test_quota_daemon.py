@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Tests for quota-daemon.py (stdlib only, no external deps)."""
+import asyncio
+import importlib.util
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).with_name("quota-daemon.py")
+
+spec = importlib.util.spec_from_file_location("quota_daemon", SCRIPT)
+qd = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(qd)
+
+
+@pytest.fixture(autouse=True)
+def no_dbus(monkeypatch):
+    """The watcher's dbus-monitor stand-in: no sleep signals at all."""
+    import quota_network
+
+    monkeypatch.setattr(quota_network, "DBUS_MONITOR", ["true"])
+
+
+def test_publish_keeps_only_newest_line_per_subscriber():
+    daemon = qd.QuotaDaemon({"demo": ("demo.py", 60)})
+    queue = asyncio.Queue(maxsize=1)
+    daemon.subscribers["demo"].add(queue)
+    daemon.publish("demo", "one")
+    daemon.publish("demo", "two")
+    assert queue.get_nowait() == "two"
+    assert daemon.lines["demo"] == "two"
+
+
+def test_publish_skips_unchanged_line():
+    daemon = qd.QuotaDaemon({"demo": ("demo.py", 60)})
+    daemon.publish("demo", "same")
+    queue = asyncio.Queue(maxsize=1)
+    daemon.subscribers["demo"].add(queue)
+    daemon.publish("demo", "same")
+    assert queue.empty()
+
+
+def test_next_wait_wakes_early_for_scheduled_fetch(monkeypatch):
+    import quota_cache
+
+    daemon = qd.QuotaDaemon({"demo": ("demo.py", 60)})
+    monkeypatch.setattr(quota_cache, "due_at", {})
+    monkeypatch.setattr(quota_cache, "resets_at", {})
+    assert daemon.next_wait("demo", 60) == 60
+    quota_cache.due_at["demo"] = qd.time.time() + 20
+    assert 19 < daemon.next_wait("demo", 60) <= 20
+    quota_cache.due_at["demo"] = qd.time.time() - 5
+    assert daemon.next_wait("demo", 60) == qd.MIN_WAIT
+
+
+def test_next_wait_renders_just_after_countdown_ticks_over(monkeypatch):
+    import quota_cache
+
+    daemon = qd.QuotaDaemon({"demo": ("demo.py", 60)})
+    now = qd.time.time()
+    monkeypatch.setattr(qd.time, "time", lambda: now)
+    monkeypatch.setattr(quota_cache, "due_at", {"demo": now + 900})
+    # 4h 12m 25s left: "4h 12m" becomes "4h 11m" in 25 s.
+    monkeypatch.setattr(quota_cache, "resets_at", {"demo": [now - 30, now + 4 * 3600 + 12 * 60 + 25]})
+    assert daemon.next_wait("demo", 60) == pytest.approx(25 + qd.COUNTDOWN_SLACK)
+
+
+def test_serves_rendered_line_and_error_text_over_socket(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        Path(tmp, "ok.py").write_text("def render():\n    return 'ok-line'\n")
+        Path(tmp, "bad.py").write_text(
+            "ERROR_TEXT = 'bad-line'\n"
+            "def render():\n    raise RuntimeError('boom')\n"
+        )
+        monkeypatch.setattr(qd, "SCRIPT_DIR", tmp)
+        sock_path = os.path.join(tmp, "d.sock")
+        daemon = qd.QuotaDaemon({"ok": ("ok.py", 60), "bad": ("bad.py", 60)})
+
+        async def scenario():
+            server = asyncio.create_task(daemon.run(sock_path))
+            while not os.path.exists(sock_path):
+                await asyncio.sleep(0.01)
+            lines = {}
+            for name in ("ok", "bad"):
+                reader, writer = await asyncio.open_unix_connection(sock_path)
+                writer.write(name.encode() + b"\n")
+                lines[name] = (await reader.readline()).decode().strip()
+                writer.close()
+            server.cancel()
+            return lines
+
+        assert asyncio.run(scenario()) == {"ok": "ok-line", "bad": "bad-line"}
+
+
+def test_unknown_provider_connection_is_closed(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        sock_path = os.path.join(tmp, "d.sock")
+        daemon = qd.QuotaDaemon({})
+
+        async def scenario():
+            server = asyncio.create_task(daemon.run(sock_path))
+            while not os.path.exists(sock_path):
+                await asyncio.sleep(0.01)
+            reader, writer = await asyncio.open_unix_connection(sock_path)
+            writer.write(b"nope\n")
+            data = await reader.read()
+            server.cancel()
+            return data
+
+        assert asyncio.run(scenario()) == b""
+
+
+def test_ipc_pushes_only_changes_and_coalesces(tmp_path, monkeypatch):
+    log = tmp_path / "sent"
+    fake = tmp_path / "polybar-msg"
+    fake.write_text(f'#!/bin/sh\nsleep 0.1\necho "$2" >> {log}\n')
+    fake.chmod(0o755)
+    monkeypatch.setattr(qd, "POLYBAR_MSG", str(fake))
+    monkeypatch.setattr(qd, "IPC_DIR", str(tmp_path / "ipc"))
+    daemon = qd.QuotaDaemon({"demo": ("demo.py", 60)}, ipc=True)
+
+    async def scenario():
+        daemon.publish("demo", "one")
+        await asyncio.sleep(0)
+        for line in ("two", "three", "three"):
+            daemon.publish("demo", line)
+        while daemon.pushers:
+            await asyncio.sleep(0.01)
+        daemon.publish("demo", "three")
+        assert not daemon.pushers
+
+    asyncio.run(scenario())
+    assert log.read_text().split() == ["#quota-demo.send.one", "#quota-demo.send.three"]
+    assert (tmp_path / "ipc" / "demo.line").read_text() == "three\n"
+
+
+def test_ipc_turns_off_without_polybar_msg(tmp_path, monkeypatch):
+    monkeypatch.setattr(qd, "POLYBAR_MSG", str(tmp_path / "missing"))
+    monkeypatch.setattr(qd, "IPC_DIR", str(tmp_path / "ipc"))
+    daemon = qd.QuotaDaemon({"demo": ("demo.py", 60)}, ipc=True)
+
+    async def scenario():
+        daemon.publish("demo", "one")
+        while daemon.pushers:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert not daemon.ipc
+    assert (tmp_path / "ipc" / "demo.line").read_text() == "one\n"
+
+
+def test_coming_online_rerenders_every_provider_at_once(tmp_path, monkeypatch):
+    import quota_client
+
+    monkeypatch.setattr(quota_client, "close_all", lambda: None)
+    renders = []
+    module = type("Module", (), {"render": staticmethod(lambda: renders.append(1) or "x")})
+    daemon = qd.QuotaDaemon({"a": ("a.py", 60), "b": ("b.py", 60)})
+
+    async def scenario():
+        polls = [asyncio.create_task(daemon.poll(name, module, 60)) for name in "ab"]
+        while len(renders) < 2:
+            await asyncio.sleep(0.01)
+        daemon.went_offline()
+        assert not daemon.online
+        daemon.came_online()
+        while len(renders) < 4:
+            await asyncio.sleep(0.01)
+        for poll in polls:
+            poll.cancel()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert daemon.online and len(renders) == 4
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Tests for quota_forecast.py (stdlib only, no external deps)."""
+import pytest
+
+import quota_cache
+import quota_forecast as qf
+
+NOW = 1_000_000.0
+
+
+def _run(values, step=300, start=NOW):
+    state = None
+    for i, value in enumerate(values):
+        state = qf.update(state, {"left": value}, start + i * step)
+    return state
+
+
+def test_first_sample_has_no_rate():
+    state = qf.update(None, {"left": 80, "skip": None}, NOW)
+    assert state == {"left": {"at": NOW, "value": 80, "rate": 0.0}}
+    assert qf.time_to_exhaustion(state, "left", NOW) is None
+
+
+def test_steady_spend_converges_to_true_rate():
+    # 1 unit per 300 s for ten hours.
+    state = _run([1000 - i for i in range(120)])
+    assert state["left"]["rate"] == pytest.approx(1 / 300, rel=0.01)
+
+
+def test_reset_keeps_learned_rate():
+    state = _run([100, 90, 80, 70, 100])
+    before = _run([100, 90, 80, 70])["left"]["rate"]
+    assert state["left"]["value"] == 100
+    assert state["left"]["rate"] == before
+
+
+def test_idle_periods_decay_the_rate():
+    busy = _run([100, 90, 80])["left"]["rate"]
+    idle = _run([100, 90, 80, 80, 80, 80])["left"]["rate"]
+    assert 0 < idle < busy
+
+
+def test_time_to_exhaustion_projects_from_last_sample():
+    state = {"left": {"at": NOW, "value": 60.0, "rate": 0.01}}
+    assert qf.time_to_exhaustion(state, "left", NOW) == pytest.approx(6000)
+    assert qf.time_to_exhaustion(state, "left", NOW + 1000) == pytest.approx(5000)
+    assert qf.time_to_exhaustion(state, "left", NOW + 7000) is None
+
+
+def test_warning_only_when_running_out_before_reset():
+    state = {"left": {"at": NOW, "value": 60.0, "rate": 0.01}}  # empty in 100 min
+    assert qf.warning(state, "left", reset_at=NOW + 7200, now=NOW) == \
+        f" %{{F{qf.RED}}}{qf.WARNING_ICON} 1h 40m%{{F-}}"
+    assert qf.warning(state, "left", reset_at=NOW + 3600, now=NOW) == ""
+    assert qf.warning(None, "left", reset_at=NOW + 7200, now=NOW) == ""
+
+
+def test_balance_warning_within_horizon():
+    slow = {"balance": {"at": NOW, "value": 50.0, "rate": 50.0 / (30 * 86400)}}
+    fast = {"balance": {"at": NOW, "value": 5.0, "rate": 5.0 / (3 * 86400)}}
+    assert qf.warning(slow, "balance", now=NOW) == ""
+    assert "3d" in qf.warning(fast, "balance", now=NOW)
+
+
+def test_warning_uses_the_reset_countdown_format():
+    state = {"balance": {"at": NOW, "value": 93600.0, "rate": 0.5}}  # empty in 2d 4h
+    assert qf.warning(state, "balance", now=NOW).endswith(" 2d 4h%{F-}")
+
+
+def test_combine_projects_and_sums_accounts():
+    a = {"left": {"at": NOW, "value": 60.0, "rate": 0.01}}
+    b = {"left": {"at": NOW + 100, "value": 40.0, "rate": 0.03},
+         "other": {"at": NOW, "value": 1.0, "rate": 0.0}}
+    total = qf.combine([a, None, b])
+    assert total["left"] == {"at": NOW + 100, "value": pytest.approx(99.0), "rate": 0.04}
+    assert total["other"]["value"] == 1.0
+    assert qf.combine([a, b], mean=True)["left"]["value"] == pytest.approx(49.5)
+    assert qf.combine([None]) is None
+
+
+def test_cache_keeps_forecast_across_fetches(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(quota_cache, "BACKGROUND_REFRESH", False)
+    monkeypatch.setattr(quota_cache, "_record_history", lambda *args: None)
+    values = iter([100, 90])
+    for _ in range(2):
+        quota_cache.cached("demo", "key", lambda: next(values), ttl=0,
+                           samples=lambda d: {"left": d})
+    forecast = quota_cache.latest_forecast("demo")
+    assert forecast["left"]["value"] == 90 and forecast["left"]["rate"] > 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Tests for quota_format.py (stdlib only, no external deps)."""
+import pytest
+
+import quota_format as qf
+
+
+@pytest.mark.parametrize("seconds,text", [
+    (None, "now"), (-5, "now"), (59, "0m"), (45 * 60, "45m"),
+    (4 * 3600 + 30 * 60, "4h 30m"), (2 * 86400 + 4 * 3600 + 59, "2d 4h"),
+])
+def test_format_countdown(seconds, text):
+    assert qf.format_countdown(seconds) == text
+
+
+def test_countdown_to_unknown_reset_is_blank():
+    assert qf.countdown_to(None) == ""
+    assert qf.countdown_to(1000 + 3600, now=1000) == "1h 0m"
+
+
+def test_color_thresholds():
+    assert [qf.color_for_percent(p) for p in (51, 50, 20, 19)] == \
+        [qf.GREEN, qf.YELLOW, qf.YELLOW, qf.RED]
+
+
+def test_iso_timestamp():
+    assert qf.iso_timestamp("1970-01-01T00:01:00Z") == 60
+    assert qf.iso_timestamp(None) is None and qf.iso_timestamp("soon") is None
+
+
+def test_print_line_prints_error_text_on_failure(capsys):
+    assert qf.print_line("demo", lambda: "fine") == 0
+    assert qf.print_line("demo", lambda: {}["x"], "bad") == 1
+    assert capsys.readouterr().out == "fine\nbad\n"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Tests for quota_history.py (stdlib only, no external deps)."""
+import os
+import time
+
+import pytest
+
+import quota_cache
+import quota_history as qh
+
+DAY = 86400
+START = 1_700_000_000 - 1_700_000_000 % 3600
+
+
+@pytest.fixture(autouse=True)
+def history_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(qh, "HISTORY_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _feed(span, step, start=START, value=lambda t: 50.0):
+    t = start
+    while t < start + span:
+        qh.record("demo", {"left": value(t)}, now=t)
+        t += step
+    return t
+
+
+def test_recent_samples_round_trip_raw():
+    qh.record("demo", {"left": 10, "other": 3.5}, now=START)
+    qh.record("demo", {"left": 9}, now=START + 60)
+    assert qh.query("demo", "left", START, START + 120) == [
+        (START, 10.0, 10.0, 10.0), (START + 60, 9.0, 9.0, 9.0)]
+    assert qh.query("demo", "other", 0, START + 1) == [(START, 3.5, 3.5, 3.5)]
+    assert qh.query("demo", "missing", 0, START + 1) == []
+
+
+def test_query_range_is_half_open():
+    for i in range(5):
+        qh.record("demo", {"left": i}, now=START + i)
+    assert [r[1] for r in qh.query("demo", "left", START + 1, START + 3)] == [1.0, 2.0]
+
+
+def test_old_samples_fold_into_buckets():
+    now = _feed(3 * DAY, 60, value=lambda t: (t - START) % 600 / 60)
+    raw = qh.query("demo", "left", now - qh.RAW_RETENTION + 3600, now)
+    assert all(r[2] == r[3] for r in raw)
+
+    first = qh.query("demo", "left", START, START + 600)
+    # Two 5-minute buckets of samples 0..4 and 5..9.
+    assert first == [(START, 2.0, 0.0, 4.0), (START + 300, 7.0, 5.0, 9.0)]
+
+
+def test_month_old_buckets_fold_into_hours():
+    now = _feed(32 * DAY, 300)
+    assert os.path.getsize(qh.series_path("demo", "left", "1h")) > 0
+    rows = qh.query("demo", "left", START, now)
+    stamps = [r[0] for r in rows]
+    assert stamps == sorted(stamps) and len(stamps) == len(set(stamps))
+    assert stamps[1] - stamps[0] == 3600
+    assert stamps[-1] - stamps[-2] == 300
+
+
+def test_compaction_does_not_duplicate_buckets_after_interrupted_rewrite(monkeypatch):
+    _feed(2 * DAY, 300)
+    now = START + 2 * DAY + 3600
+    replace = qh._replace
+    monkeypatch.setattr(qh, "_replace", lambda path, data: None)
+    qh.compact("demo", "left", now)
+    monkeypatch.setattr(qh, "_replace", replace)
+    qh.compact("demo", "left", now)
+    stamps = [r[0] for r in qh.query("demo", "left", START, now)]
+    assert len(stamps) == len(set(stamps))
+
+
+def test_year_of_samples_stays_small_and_queries_fast(history_dir):
+    # A sample every 5 minutes, written a day at a time to keep the test fast.
+    raw, now = qh.series_path("demo", "left", "raw"), START
+    for _ in range(365):
+        with open(raw, "ab") as f:
+            f.write(b"".join(qh.RECORD.pack(now + i, 50, 50, 50) for i in range(0, DAY, 300)))
+        now += DAY
+        qh.compact("demo", "left", now)
+    size = sum(os.path.getsize(p) for p in history_dir.iterdir())
+    assert size < 512 * 1024
+
+    started = time.perf_counter()
+    week = qh.query("demo", "left", now - 200 * DAY, now - 193 * DAY)
+    assert (time.perf_counter() - started) < 0.05
+    assert len(week) == 7 * 24
+
+
+def test_cache_records_each_fresh_fetch(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    quota_cache.cached("demo", "key", lambda: 42, ttl=300, samples=lambda d: {"left": d})
+    quota_cache.cached("demo", "key", lambda: pytest.fail("fetched"), ttl=300,
+                       samples=lambda d: {"left": d})
+    series = "demo-" + quota_cache.account_digest("key")
+    assert [r[1] for r in qh.query(series, "left", 0)] == [42.0]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
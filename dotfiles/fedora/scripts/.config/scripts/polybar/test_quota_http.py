@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Tests for quota_http.py against a local http.server (stdlib only)."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import quota_cache
+import quota_http
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.seen.append(dict(self.headers))
+        status, headers, body = server.reply(self)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.seen = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/quota"
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _json(data, **headers):
+    return lambda handler: (200, headers, json.dumps(data).encode())
+
+
+def _fetch(server, headers=None):
+    return quota_cache.single_flight(
+        "demo", "key", lambda: quota_http.get_json(server.url, headers=headers), max_age=0)
+
+
+def _count_parses(monkeypatch):
+    parses = []
+    monkeypatch.setattr(quota_http, "json", SimpleNamespace(
+        dumps=json.dumps, loads=lambda body: parses.append(1) or json.loads(body)))
+    return parses
+
+
+def test_plain_get_sends_no_validators(server):
+    server.reply = _json({"balance": 3}, ETag='"v1"')
+    assert quota_http.get_json(server.url, headers={"Authorization": "k"}) == {"balance": 3}
+    assert quota_http.get_json(server.url, headers={"Authorization": "k"}) == {"balance": 3}
+    assert all("If-None-Match" not in h for h in server.seen)
+
+
+def test_etag_revalidation_reuses_cached_data(server, monkeypatch):
+    def reply(handler):
+        if handler.headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, b""
+        return 200, {"ETag": '"v1"', "Last-Modified": "Sat, 17 Oct 2026 10:00:00 GMT"}, b'{"left": 7}'
+
+    server.reply = reply
+    assert _fetch(server) == {"left": 7}
+    parses = _count_parses(monkeypatch)
+    assert _fetch(server) == {"left": 7}
+    assert parses == []
+    assert server.seen[-1]["If-None-Match"] == '"v1"'
+    assert server.seen[-1]["If-Modified-Since"] == "Sat, 17 Oct 2026 10:00:00 GMT"
+
+
+def test_identical_body_is_not_parsed_again(server, monkeypatch):
+    server.reply = _json({"left": 7})
+    _fetch(server)
+    parses = _count_parses(monkeypatch)
+    assert _fetch(server) == {"left": 7}
+    assert parses == []
+
+    server.reply = _json({"left": 6})
+    assert _fetch(server) == {"left": 6}
+    assert parses == [1]
+
+
+def test_validators_are_ignored_without_cached_data(server, tmp_path):
+    server.reply = _json({"left": 7}, ETag='"v1"')
+    _fetch(server)
+    (tmp_path / [p.name for p in tmp_path.iterdir() if p.name.startswith("demo-")
+                 and p.suffix == ".json"][0]).unlink()
+    assert _fetch(server) == {"left": 7}
+    assert "If-None-Match" not in server.seen[-1]
+
+
+def test_validators_are_per_credential(server):
+    server.reply = _json({"left": 7}, ETag='"v1"')
+    _fetch(server, headers={"Authorization": "a"})
+    _fetch(server, headers={"Authorization": "b"})
+    assert "If-None-Match" not in server.seen[-1]
+
+
+def test_validators_live_in_the_cache_entry(server, tmp_path):
+    server.reply = _json({"left": 7}, ETag='"v1"')
+    quota_http.get_json(server.url)
+    assert not [p for p in tmp_path.iterdir() if p.is_file()]
+    for cookie in ("session=1", "session=2"):
+        _fetch(server, headers={"Cookie": cookie})
+    assert "If-None-Match" in server.seen[-1]
+    assert sorted(p.suffix for p in tmp_path.iterdir() if p.is_file()) == [".json", ".lock"]
+
+
+def test_failed_commit_does_not_keep_new_validators(server):
+    server.reply = _json({"left": 7})
+    _fetch(server)
+    server.reply = _json({"left": 6})
+
+    def windows(data):
+        raise ValueError("bad data")
+
+    with pytest.raises(ValueError):
+        quota_cache.single_flight("demo", "key", lambda: quota_http.get_json(server.url),
+                                  max_age=0, windows=windows)
+    assert _fetch(server) == {"left": 6}
+
+
+def test_error_status_raises_http_error(server):
+    server.reply = lambda handler: (429, {"Retry-After": "30"}, b"slow down")
+    with pytest.raises(quota_http.HTTPError) as exc:
+        quota_http.get_json(server.url)
+    assert exc.value.status == 429 and exc.value.headers["Retry-After"] == "30"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
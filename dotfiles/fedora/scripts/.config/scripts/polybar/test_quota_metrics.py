@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Tests for quota_metrics.py (stdlib only, no external deps)."""
+import os
+import re
+
+import pytest
+
+import quota_cache
+import quota_metrics as qm
+
+SAMPLE_LINE = re.compile(r'^[a-z_]+\{([a-z]+="(?:[^"\\]|\\.)*",?)+\} -?[0-9.e+-]+$')
+
+
+def _prom(metrics_dir, provider="demo"):
+    return (metrics_dir / f"{provider}.prom").read_text()
+
+
+def test_success_exports_values_windows_and_timings(metrics_dir):
+    qm.export("demo", "a1", {"dns": 0.01, "ttfb": 0.2, "fetch": 0.3},
+              windows=[(25, 0.75, 2000.0), (5.0, None, None)],
+              remaining={"tokens": 75, "balance": 5.0}, now=1000.0)
+    text = _prom(metrics_dir)
+    for line in [
+        'quota_remaining{provider="demo",account="a1",metric="tokens"} 75.0',
+        'quota_fraction_remaining{provider="demo",account="a1",window="0"} 0.75',
+        'quota_reset_timestamp_seconds{provider="demo",account="a1",window="0"} 2000.0',
+        'quota_last_success_timestamp_seconds{provider="demo",account="a1"} 1000.0',
+        'quota_fetch_duration_seconds{provider="demo",account="a1"} 0.3',
+        'quota_fetch_phase_seconds{provider="demo",account="a1",phase="ttfb"} 0.2',
+        'quota_fetches_total{provider="demo",account="a1"} 1.0',
+        'quota_fetch_errors_total{provider="demo",account="a1"} 0.0',
+    ]:
+        assert line in text.splitlines()
+    assert 'window="1"' not in text  # a balance has no fraction or reset
+    for line in text.splitlines():
+        assert line.startswith("# ") or SAMPLE_LINE.match(line), line
+
+
+def test_failure_counts_and_keeps_last_values(metrics_dir):
+    qm.export("demo", "a1", {"fetch": 0.1}, remaining={"balance": 5.0}, now=1000.0)
+    qm.export("demo", "a1", {"connect": 10.0, "fetch": 10.0}, error=TimeoutError(), now=1300.0)
+    text = _prom(metrics_dir)
+    assert 'quota_remaining{provider="demo",account="a1",metric="balance"} 5.0' in text
+    assert 'quota_last_success_timestamp_seconds{provider="demo",account="a1"} 1000.0' in text
+    assert 'quota_fetches_total{provider="demo",account="a1"} 2.0' in text
+    assert 'quota_fetch_errors_total{provider="demo",account="a1"} 1.0' in text
+    assert 'quota_fetch_duration_seconds{provider="demo",account="a1"} 10.0' in text
+
+
+def test_each_metric_has_help_and_type_once(metrics_dir):
+    qm.export("demo", "a1", {"fetch": 0.1}, remaining={"a": 1, "b": 2})
+    text = _prom(metrics_dir)
+    assert text.count("# TYPE quota_remaining gauge") == 1
+    assert "# TYPE quota_fetches_total counter" in text
+
+
+def test_accounts_share_the_provider_file(metrics_dir):
+    qm.export("demo", "a1", {"fetch": 0.1}, remaining={"balance": 5.0})
+    qm.export("demo", "b2", {"fetch": 0.2}, remaining={"balance": 7.0})
+    qm.export("demo-go", "c3", {"fetch": 0.3}, remaining={"balance": 9.0})
+    text = _prom(metrics_dir)
+    assert 'quota_remaining{provider="demo",account="a1",metric="balance"} 5.0' in text
+    assert 'quota_remaining{provider="demo",account="b2",metric="balance"} 7.0' in text
+    assert "demo-go" not in text
+
+
+def test_label_values_are_escaped():
+    assert qm._sample("m", {"metric": 'a"b\\c\nd'}, 1) == r'm{metric="a\"b\\c\nd"} 1.0'
+
+
+def test_files_are_replaced_atomically(metrics_dir):
+    qm.export("demo", "a1", {"fetch": 0.1})
+    qm.export("demo", "a1", {"fetch": 0.1})
+    assert sorted(os.listdir(metrics_dir)) == [".demo-a1.json", ".demo.lock", "demo.prom"]
+    assert oct(os.stat(metrics_dir / "demo.prom").st_mode & 0o777) == "0o644"
+
+
+def test_one_fetch_feeds_bar_and_exporter(tmp_path, monkeypatch, metrics_dir):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(quota_cache, "_record_history", lambda *args: None)
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return {"left": 40, "max": 100}
+
+    for _ in range(2):
+        quota_cache.single_flight(
+            "demo", "key", fetch, windows=lambda d: [(d["left"], d["left"] / d["max"], None)],
+            samples=lambda d: {"left": d["left"]})
+    assert fetches == [1]
+    text = _prom(metrics_dir)
+    labels = f'provider="demo",account="{quota_cache.account_digest("key")}"'
+    assert f'quota_remaining{{{labels},metric="left"}} 40.0' in text
+    assert f'quota_fetches_total{{{labels}}} 1.0' in text
+
+
+def test_failed_single_flight_is_exported(tmp_path, monkeypatch, metrics_dir):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path / "cache"))
+
+    def fail():
+        raise KeyError("limits")
+
+    with pytest.raises(KeyError):
+        quota_cache.single_flight("demo", "key", fail, max_age=0)
+    labels = f'provider="demo",account="{quota_cache.account_digest("key")}"'
+    assert f'quota_fetch_errors_total{{{labels}}} 1.0' in _prom(metrics_dir)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
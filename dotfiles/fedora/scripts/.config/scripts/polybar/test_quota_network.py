@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Tests for quota_network.py (stdlib only, no external deps)."""
+import asyncio
+
+import pytest
+
+import quota_breaker
+import quota_cache
+import quota_network as qn
+from conftest import DEFAULT_ROUTE
+
+LAN_ONLY = DEFAULT_ROUTE.splitlines()[0] + "\neth0\t0002A8C0\t00000000\t0001\t0\t0\t100\t00FFFFFF\t0\t0\t0\n"
+IPV6_DEFAULT = (
+    "00000000000000000000000000000000 00 00000000000000000000000000000000 00 "
+    "fe800000000000000000000000000001 00000400 00000001 00000000 00000003 wlan0\n"
+    "00000000000000000000000000000000 00 00000000000000000000000000000000 00 "
+    "00000000000000000000000000000000 ffffffff 00000001 00000000 00200200 lo\n"
+)
+
+# What `dbus-monitor --system` prints for logind's PrepareForSleep.
+SLEEP_SIGNAL = """\
+signal time=1760000000.1 sender=:1.4 -> destination=(null destination) serial=812 path=/org/freedesktop/login1; interface=org.freedesktop.login1.Manager; member=PrepareForSleep
+   boolean {}
+"""
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+def test_default_route_means_online(route_table):
+    assert qn.online()
+    route_table.write_text(LAN_ONLY)
+    assert not qn.online()
+    with pytest.raises(qn.Offline):
+        qn.check()
+
+
+def test_ipv6_default_route_counts_but_not_loopback_rejects(tmp_path, monkeypatch):
+    path = tmp_path / "ipv6_route"
+    monkeypatch.setattr(qn, "ROUTE_FILES", (str(path),))
+    path.write_text(IPV6_DEFAULT)
+    assert qn.online()
+    path.write_text(IPV6_DEFAULT.splitlines()[1] + "\n")
+    assert not qn.online()
+
+
+def test_sleep_signals_are_parsed():
+    signals = qn.SleepSignals()
+    lines = (SLEEP_SIGNAL.format("true") + "   string \"x\"\n" + SLEEP_SIGNAL.format("false"))
+    assert [signals.feed(line) for line in lines.splitlines()] == [None, True, None, None, False]
+
+
+def test_offline_fetch_is_skipped_without_tripping_the_breaker(cache_dir, route_table):
+    route_table.write_text(LAN_ONLY)
+    with pytest.raises(qn.Offline):
+        quota_cache.single_flight("demo", "key", lambda: pytest.fail("fetched"))
+    assert quota_breaker.open_until("demo") == 0
+
+
+@pytest.mark.parametrize("base_url, allowed", [
+    (None, False),
+    ("http://127.0.0.1:8765", True),
+    ("http://localhost:8765", True),
+    ("http://[::1]:8765", True),
+    ("http://192.168.1.5:8765", False),
+    ("https://replay.example.com", False),
+])
+def test_offline_check_only_passes_for_a_loopback_base_url(route_table, monkeypatch,
+                                                           base_url, allowed):
+    import quota_client
+
+    route_table.write_text(LAN_ONLY)
+    monkeypatch.setattr(quota_client, "BASE_URL", base_url)
+    if allowed:
+        qn.check()
+    else:
+        with pytest.raises(qn.Offline):
+            qn.check()
+
+
+def test_offline_serves_cached_data_without_refreshing(cache_dir, route_table, monkeypatch):
+    quota_cache.cached("demo", "key", lambda: 7, ttl=300)
+    entry_path = quota_cache.entry_path("demo", "key")
+    entry = quota_cache.read_entry(entry_path)
+    quota_cache.write_entry(entry_path, dict(entry, fetched_at=entry["fetched_at"] - 900))
+    route_table.write_text(LAN_ONLY)
+    monkeypatch.setattr(quota_cache, "_refresh_detached", lambda *a: pytest.fail("refreshed"))
+    assert quota_cache.cached("demo", "key", lambda: pytest.fail("fetched"), ttl=300) == (7, True)
+
+
+def _no_netlink():
+    raise OSError("no rtnetlink here")
+
+
+def _watch(monkeypatch, script, scenario):
+    """Run a Watcher with `script` standing in for dbus-monitor."""
+    monkeypatch.setattr(qn, "_netlink_socket", _no_netlink)
+    monkeypatch.setattr(qn, "POLL_INTERVAL", 0.02)
+    monkeypatch.setattr(qn, "SETTLE", 0.05)
+    monkeypatch.setattr(qn, "DBUS_MONITOR", ["sh", "-c", script])
+    events = []
+    watcher = qn.Watcher(lambda: events.append("online"), lambda: events.append("offline"))
+
+    async def run():
+        task = asyncio.create_task(watcher.run())
+        await scenario()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    return events
+
+
+def test_suspend_and_resume_report_once_each(monkeypatch):
+    script = (f"printf '%s' '{SLEEP_SIGNAL.format('true')}'; sleep 0.2; "
+              f"printf '%s' '{SLEEP_SIGNAL.format('false')}'; exec sleep 5")
+    events = _watch(monkeypatch, script, lambda: asyncio.sleep(0.5))
+    assert events == ["offline", "online"]
+
+
+def test_route_loss_and_return_coalesce_into_one_refresh(monkeypatch, route_table):
+    async def scenario():
+        await asyncio.sleep(0.05)
+        route_table.write_text(LAN_ONLY)
+        await asyncio.sleep(0.1)
+        # The route flaps while the link comes back; only the settled state counts.
+        for text in (DEFAULT_ROUTE, LAN_ONLY, DEFAULT_ROUTE):
+            route_table.write_text(text)
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+
+    assert _watch(monkeypatch, "exit 0", scenario) == ["offline", "online"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Tests for quota_schedule.py (stdlib only, no external deps)."""
+import pytest
+
+import quota_schedule as qs
+
+NOW = 1_000_000.0
+
+
+def _chain(samples, base=300, start=NOW):
+    """Feed successive window lists through plan() at the times it schedules."""
+    state, now, plans = None, start, []
+    for windows in samples:
+        state = qs.plan(windows, state, now, base=base)
+        plans.append(state)
+        now = state["refresh_at"]
+    return plans
+
+
+def test_first_fetch_uses_base_interval():
+    state = qs.plan([(10, 0.9, None)], None, NOW, base=300)
+    assert state["interval"] == 300
+    assert state["refresh_at"] == NOW + 300
+
+
+def test_flat_usage_backs_off_to_max_interval():
+    plans = _chain([[(10, 0.9, None)]] * 8)
+    assert [p["interval"] for p in plans] == [300, 600, 1200, 2400, 3600, 3600, 3600, 3600]
+
+
+def test_movement_resets_back_off():
+    plans = _chain([[(10, 0.9, None)]] * 4 + [[(11, 0.89, None)]])
+    assert plans[-2]["interval"] == 2400
+    assert plans[-1]["interval"] == 300
+
+
+def test_low_remaining_and_moving_polls_at_minimum():
+    plans = _chain([[(80, 0.2, None)], [(85, 0.15, None)]])
+    assert plans[-1]["interval"] == qs.MIN_INTERVAL
+
+
+def test_low_remaining_but_flat_does_not_poll_fast():
+    plans = _chain([[(85, 0.15, None)]] * 2)
+    assert plans[-1]["interval"] == 600
+
+
+def test_fast_burn_polls_several_times_before_exhaustion():
+    # 20% spent over 300 s with 40% left: exhausted in ~600 s.
+    first = qs.plan([(40, 0.6, None)], None, NOW)
+    second = qs.plan([(60, 0.4, None)], first, NOW + 300)
+    assert second["interval"] == pytest.approx(600 / qs.POLLS_BEFORE_EXHAUSTION)
+
+
+def test_reset_before_next_poll_is_fetched_just_after_reset():
+    state = qs.plan([(10, 0.9, NOW + 100)], None, NOW, base=300)
+    assert state["refresh_at"] == NOW + 100 + qs.RESET_GRACE
+
+
+def test_reset_pull_forward_keeps_back_off():
+    plans = _chain([[(10, 0.9, None)]] * 3)
+    state = qs.plan([(10, 0.9, plans[-1]["refresh_at"] + 50)], plans[-1],
+                    plans[-1]["refresh_at"])
+    assert state["interval"] == 50 + qs.RESET_GRACE
+    assert state["backoff"] == 2400
+
+
+def test_past_or_unknown_resets_are_ignored():
+    state = qs.plan([(10, 0.9, NOW - 10), (3, None, None)], None, NOW, base=300)
+    assert state["interval"] == 300
+
+
+def test_flat_day_cuts_fetches_by_an_order_of_magnitude():
+    day, now, state, fetches = 86_400, NOW, None, 0
+    while now < NOW + day:
+        state = qs.plan([(42, 0.8, None)], state, now, base=300)
+        now = state["refresh_at"]
+        fetches += 1
+    assert fetches * 10 <= day // 300
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
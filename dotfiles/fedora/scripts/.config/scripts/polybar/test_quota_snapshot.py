@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Tests for quota_snapshot.py (stdlib only, no external deps)."""
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import quota_cache
+import quota_snapshot
+
+STATUSLINE = Path(__file__).resolve().parents[5] / "shared" / "claude" / "statusline.sh"
+
+
+def test_records_are_fixed_width_in_slot_order(snapshot_path):
+    quota_snapshot.publish("openrouter", samples={"balance": 12.5}, fetched_at=1000)
+    lines = snapshot_path.read_text().splitlines(keepends=True)
+    assert len(lines) == len(quota_snapshot.SLOTS) + 1
+    assert all(len(line) == quota_snapshot.RECORD for line in lines)
+    assert lines[0].split() == ["quota-snapshot", "1", str(len(quota_snapshot.SLOTS))]
+    assert [line.split()[0] for line in lines[1:]] == list(quota_snapshot.SLOTS)
+    slot = quota_snapshot.SLOTS.index("openrouter") + 1
+    assert lines[slot].split() == ["openrouter", "-", "0", "12.50", "1000", "ok"]
+
+
+def test_percent_and_reset_come_from_the_tightest_window():
+    windows = [("5h", 0.8, 2000), ("weekly", 0.305, 9000), ("mcp", None, None)]
+    fields = quota_snapshot.parse(quota_snapshot.record("zai", windows, fetched_at=1000.7))
+    assert fields == {"provider": "zai", "percent": "30", "reset_at": "9000",
+                      "balance": "-", "fetched_at": "1000", "status": "ok"}
+
+
+def test_an_error_keeps_the_last_good_values():
+    quota_snapshot.publish("zai", [("5h", 0.5, 2000)], fetched_at=1000)
+    quota_snapshot.publish("zai", error=True)
+    assert quota_snapshot.read("zai") == {"provider": "zai", "percent": "50",
+                                          "reset_at": "2000", "balance": "-",
+                                          "fetched_at": "1000", "status": "error"}
+
+
+def test_other_records_survive_a_publish():
+    quota_snapshot.publish("zai", [("5h", 0.5, 2000)], fetched_at=1000)
+    quota_snapshot.publish("synthetic", [("5h", 0.9, 3000)], fetched_at=1100)
+    assert quota_snapshot.read("zai")["percent"] == "50"
+    assert quota_snapshot.read("synthetic")["percent"] == "90"
+
+
+def test_read_of_missing_unpublished_or_other_version_is_none(snapshot_path):
+    assert quota_snapshot.read("zai") is None
+    quota_snapshot.publish("synthetic", [("5h", 0.9, 3000)], fetched_at=1100)
+    assert quota_snapshot.read("zai") is None
+    assert quota_snapshot.read("weather") is None
+    snapshot_path.write_text(snapshot_path.read_text().replace("quota-snapshot 1", "quota-snapshot 2"))
+    assert quota_snapshot.read("synthetic") is None
+
+
+def test_providers_without_a_slot_are_ignored(snapshot_path):
+    quota_snapshot.publish("demo", [("5h", 0.5, 2000)], fetched_at=1000)
+    assert not snapshot_path.exists()
+
+
+def test_single_flight_publishes_each_fetch(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path))
+    windows = lambda data: [("5h", data["left"], 5000)]
+    quota_cache.single_flight("zai", "key", lambda: {"left": 0.42}, windows=windows)
+    assert quota_snapshot.read("zai")["percent"] == "42"
+
+    def boom():
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        quota_cache.single_flight("zai", "other-key", boom, windows=windows)
+    assert quota_snapshot.read("zai")["status"] == "error"
+
+
+@pytest.mark.skipif(not STATUSLINE.exists(), reason="statusline.sh not in this checkout")
+def test_statusline_reads_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_snapshot, "SNAPSHOT_PATH",
+                        str(tmp_path / "quota-monitors" / "snapshot"))
+    quota_snapshot.publish("zai", [("5h", 0.73, 0)], fetched_at=1000)
+    script = f"source <(sed -n '/^quota_info()/,/^}}/p' {STATUSLINE}); " \
+             "fg_white() { :; }; fg_green() { echo -n G; }; reset() { :; }; dim() { :; }; " \
+             "quota_info zai"
+    proc = subprocess.run(["bash", "-c", script], capture_output=True, text=True, timeout=10,
+                          env={**os.environ, "XDG_RUNTIME_DIR": str(tmp_path)})
+    assert proc.stdout == "Quota: G73%"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
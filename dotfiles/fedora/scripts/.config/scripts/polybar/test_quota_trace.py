@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Tests for quota_trace.py (stdlib only, no external deps)."""
+import json
+import os
+
+import pytest
+
+import quota_cache
+import quota_trace as qt
+
+
+def _records():
+    return list(qt.read_records())
+
+
+def test_run_logs_its_spans_and_duration():
+    with qt.run("demo", "fetch"):
+        with qt.span("parse"):
+            pass
+        qt.add("ttfb", 0.25)
+        qt.add("ttfb", 0.5)
+    (record,) = _records()
+    assert record["provider"] == "demo" and record["kind"] == "fetch"
+    assert record["error"] is None
+    assert record["spans"]["ttfb"] == 0.75
+    assert set(record["spans"]) == {"parse", "ttfb", "fetch"}
+
+
+def test_failed_run_names_the_exception():
+    with pytest.raises(KeyError):
+        qt.traced("demo", lambda: {}["limits"])
+    assert _records()[0]["error"] == "KeyError"
+
+
+def test_spans_outside_a_run_are_dropped():
+    with qt.span("parse"):
+        qt.add("dns", 1.0)
+    assert _records() == []
+
+
+def test_nested_fetch_run_is_logged_separately():
+    with qt.run("demo"):
+        with qt.run("demo", "fetch"):
+            qt.http_timings("https://x", {"dns": 0.1, "connect": 0.2, "reused": False})
+        with qt.span("format"):
+            pass
+    fetch, render = _records()
+    assert set(fetch["spans"]) == {"dns", "connect", "fetch"}
+    assert set(render["spans"]) == {"format", "render"}
+
+
+def test_startup_is_measured_from_process_start():
+    startup = qt.startup_time()
+    assert startup is not None and 0 <= startup < 3600
+    with qt.run("demo", startup=True):
+        pass
+    assert "startup" in _records()[0]["spans"]
+
+
+def test_single_flight_traces_each_fetch(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path))
+    quota_cache.single_flight("demo", "key", lambda: {"left": 1}, max_age=0)
+
+    def unchanged():
+        raise quota_cache.Unchanged()
+
+    quota_cache.single_flight("demo", "key", unchanged, max_age=0)
+    assert [(r["kind"], r["error"]) for r in _records()] == \
+        [("fetch", None), ("fetch", "Unchanged")]
+
+
+def test_log_rotates_and_keeps_backups(monkeypatch, trace_log):
+    monkeypatch.setattr(qt, "MAX_BYTES", 2000)
+    for i in range(200):
+        qt.write({"at": float(i), "provider": "demo", "spans": {"render": 0.001}})
+    files = sorted(os.listdir(trace_log.parent))
+    assert files == ["trace.jsonl", "trace.jsonl.1", "trace.jsonl.2", "trace.jsonl.3",
+                     "trace.jsonl.lock"]
+    assert all(os.path.getsize(trace_log.parent / f) <= 2000 for f in files)
+    ats = [r["at"] for r in _records()]
+    assert ats == sorted(ats) and ats[-1] == 199.0
+
+
+def test_read_records_filters_window_and_skips_torn_lines(trace_log):
+    for at, provider in [(10.0, "a"), (20.0, "b"), (30.0, "a")]:
+        qt.write({"at": at, "provider": provider, "spans": {}})
+    with open(trace_log, "a") as f:
+        f.write('{"at": 40.0, "provi')
+    assert [r["at"] for r in qt.read_records(15, 35)] == [20.0, 30.0]
+    assert [r["at"] for r in qt.read_records(provider="a")] == [10.0, 30.0]
+
+
+def test_summary_percentiles_per_provider_and_phase():
+    records = [{"provider": "zai", "spans": {"ttfb": i / 1000}} for i in range(1, 101)]
+    stats = qt.summarize(records)[("zai", "ttfb")]
+    assert stats == {"n": 100, "p50": 0.05, "p95": 0.095, "p99": 0.099}
+
+
+def test_cli_prints_table(capsys):
+    with qt.run("zai", "fetch"):
+        qt.add("ttfb", 0.2)
+    assert qt.main(["--since", "1h", "--provider", "zai"]) == 0
+    header, *rows = capsys.readouterr().out.splitlines()
+    assert header.split()[:3] == ["provider", "phase", "n"]
+    assert any(row.split()[:4] == ["zai", "ttfb", "1", "200.0"] for row in rows)
+    assert qt.main(["--since", "1h", "--provider", "nobody"]) == 1
+
+
+def test_tracing_can_be_turned_off(monkeypatch, trace_log):
+    monkeypatch.setattr(qt, "ENABLED", False)
+    with qt.run("demo"):
+        pass
+    assert not trace_log.exists()
+
+
+def test_records_are_single_json_lines(trace_log):
+    with qt.run("demo"):
+        qt.add("parse", 0.001)
+    lines = trace_log.read_text().splitlines()
+    assert len(lines) == 1 and json.loads(lines[0])["provider"] == "demo"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
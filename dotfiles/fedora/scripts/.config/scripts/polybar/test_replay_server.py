@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Tests for replay_server.py through quota_client (stdlib only)."""
+import json
+import time
+
+import pytest
+
+import quota_cache
+import quota_client
+import quota_http
+import replay_server
+
+UPSTREAMS = {
+    "synthetic.json": "https://api.synthetic.new/v2/quotas",
+    "zai.json": "https://api.z.ai/api/monitor/usage/quota/limit",
+    "openrouter.json": "https://openrouter.ai/api/v1/credits",
+    "neuralwatt.json": "https://api.neuralwatt.com/v1/quota",
+    "claude.json": "https://platform.claude.com/api/organizations/org-1/prepaid/credits",
+    "opencode-go.html": "https://opencode.ai/workspace/wrk_1/go",
+    "weather.json": "http://api.openweathermap.org/data/2.5/weather?q=Vancouver&appid=k",
+}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota_cache, "CACHE_DIR", str(tmp_path))
+    with replay_server.ReplayServer(seed=1) as httpd:
+        monkeypatch.setattr(quota_client, "BASE_URL", httpd.base_url)
+        yield httpd
+    quota_client.close_all()
+
+
+def _fetch(url, **kwargs):
+    with quota_client.request(url, **kwargs) as response:
+        return response, response.read()
+
+
+def test_every_route_has_a_fixture():
+    assert {name for _, name in replay_server.ROUTES} == set(UPSTREAMS)
+    assert len(replay_server.load_fixtures()) == len(replay_server.ROUTES)
+
+
+@pytest.mark.parametrize("name", sorted(UPSTREAMS))
+def test_upstream_urls_replay_their_fixture(server, name):
+    response, body = _fetch(UPSTREAMS[name])
+    with open(f"{replay_server.FIXTURE_DIR}/{name}", "rb") as f:
+        assert body == f.read()
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert server.hits == {name: 1}
+
+
+def test_unknown_path_is_404(server):
+    response, _ = _fetch("https://api.z.ai/nope")
+    assert response.status == 404 and server.hits == {"404": 1}
+
+
+def test_etag_revalidation_gets_304(server):
+    response, _ = _fetch(UPSTREAMS["zai.json"])
+    again, body = _fetch(UPSTREAMS["zai.json"], headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status == 304 and body == b""
+
+
+def test_rate_limit_is_429_with_retry_after(server):
+    server.rate_limit = 1
+    with pytest.raises(quota_http.HTTPError) as exc:
+        quota_http.get_json(UPSTREAMS["openrouter.json"])
+    assert exc.value.status == 429
+    assert exc.value.headers["Retry-After"] == str(replay_server.RETRY_AFTER)
+
+
+def test_truncated_body_fails_the_fetch(server):
+    server.truncate = 1
+    with pytest.raises(ConnectionError):
+        quota_http.get_json(UPSTREAMS["zai.json"])
+    server.truncate = 0
+    assert json.loads(_fetch(UPSTREAMS["zai.json"])[1])["success"] is True
+
+
+def test_latency_and_jitter_delay_responses(server):
+    server.latency, server.jitter = 0.05, 0.02
+    delays = [server.delay() for _ in range(50)]
+    assert all(0.03 <= delay <= 0.07 for delay in delays) and len(set(delays)) > 1
+    started = time.perf_counter()
+    _fetch(UPSTREAMS["claude.json"])
+    assert time.perf_counter() - started >= 0.03
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
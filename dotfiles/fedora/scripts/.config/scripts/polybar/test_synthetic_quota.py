@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Tests for synthetic-quota.py (stdlib only, no external deps)."""
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).with_name("synthetic-quota.py")
+
+spec = importlib.util.spec_from_file_location("synthetic_quota", SCRIPT)
+sq = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(sq)
+
+
+def _account(remaining, credits, percent, tick, regen, requests):
+    return {
+        "rollingFiveHourLimit": {"remaining": remaining, "max": 135, "nextTickAt": tick},
+        "weeklyTokenLimit": {"remainingCredits": credits, "percentRemaining": percent,
+                             "nextRegenAt": regen},
+        "search": {"hourly": {"limit": 250, "requests": requests,
+                              "renewsAt": "2026-10-18T13:00:00.000Z"}},
+    }
+
+
+def test_combine_quotas_of_two_accounts():
+    combined = sq.combine_quotas([
+        _account(100, "$18.00", 75, "2026-10-18T14:37:12.000Z", "2026-10-21T00:00:00.000Z", 10),
+        _account(35.5, "$2.50", 25, "2026-10-18T12:05:00.000Z", "2026-10-22T00:00:00.000Z", 5),
+    ])
+    assert combined == {
+        "rollingFiveHourLimit": {"remaining": 135.5, "max": 270,
+                                 "nextTickAt": "2026-10-18T12:05:00.000Z"},
+        "weeklyTokenLimit": {"remainingCredits": "$20.50", "percentRemaining": 50,
+                             "nextRegenAt": "2026-10-21T00:00:00.000Z"},
+        "search": {"hourly": {"limit": 500, "requests": 15,
+                              "renewsAt": "2026-10-18T13:00:00.000Z"}},
+    }
+
+
+def test_combined_quotas_ignore_missing_reset_times():
+    first = _account(1, "$1.00", 10, None, "bogus", 0)
+    second = _account(1, "$1.00", 10, "2026-10-18T12:05:00Z", None, 0)
+    combined = sq.combine_quotas([first, second])
+    assert combined["rollingFiveHourLimit"]["nextTickAt"] == "2026-10-18T12:05:00Z"
+    assert combined["weeklyTokenLimit"]["nextRegenAt"] is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
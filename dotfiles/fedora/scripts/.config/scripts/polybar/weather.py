@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # /// script
-# dependencies = ["requests"]
+# dependencies = []
 # ///
 
 """\
@@ -13,16 +13,12 @@ Icons are from Nerd Font.
 Usage: weather.py
 """
 
-import requests
 import os
 import sys
 
-# Openweather API Key
-api_key = os.environ.get('OPENWEATHER_API_KEY', '')
-
-if not api_key:
-    print("")
-    sys.exit(1)
+import quota_format
+import quota_network
+from quota_http import get_json
 
 # City/Town
 location = "Vancouver"
@@ -30,6 +26,10 @@ location = "Vancouver"
 # standard, imperial or metric
 units = "metric"
 
+API_URL = "http://api.openweathermap.org/data/2.5/weather"
+ERROR_TEXT = ""
+FALLBACK_ICON = ""
+
 # Weather icon codes from https://openweathermap.org/weather-conditions
 weather_icons = {
     "01d": "", # Clear sky day
@@ -52,29 +52,33 @@ weather_icons = {
     "50n": "", # Mist night
 }
 
-# Get the weather data from the OpenWeatherMap API
-try:
-    weather_request = requests.get("http://api.openweathermap.org/data/2.5/weather?q=" + location + "&appid=" + api_key + "&units=" + units )
-    weather_data = weather_request.json()
-except:
-    print("")
-    sys.exit(1)
 
-if weather_request.status_code != 200:
-    print("")
-    sys.exit(1)
+def fetch_weather(api_key):
+    """Get the weather data from the OpenWeatherMap API (raises on non-2xx),
+    failing at once rather than after a timeout when offline."""
+    quota_network.check()
+    return get_json(API_URL + "?q=" + location + "&appid=" + api_key + "&units=" + units)
+
+
+def format_weather(weather_data):
+    """Temperature and condition icon, e.g. '12° <icon>'."""
+    temp = weather_data["main"]["temp"]
+    icon = weather_icons.get(weather_data["weather"][0]["icon"], FALLBACK_ICON)
+    return str(round(temp)) + "° " + icon
+
+
+def render():
+    """Fetch and format the weather line. Raises on any failure."""
+    # Openweather API Key
+    api_key = os.environ.get('OPENWEATHER_API_KEY', '')
+    if not api_key:
+        raise RuntimeError("OPENWEATHER_API_KEY is not set")
+    return format_weather(fetch_weather(api_key))
 
-# Get the temperature
-temp = weather_data["main"]["temp"]
 
-# Get the weather icon
-icon = weather_data["weather"][0]["icon"]
+def main():
+    sys.exit(quota_format.print_line("weather", render, ERROR_TEXT))
 
-# Get the icon from the dictionary
-try:
-    icon = weather_icons[icon]
-except:
-    icon = ""
 
-# Print the weather info
-print(str(round(temp)) + "° " + icon)
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # /// script
-# dependencies = ["requests"]
+# dependencies = []
 # ///
 
 """\
@@ -10,98 +10,67 @@ Displays remaining API quota and time until reset for zai (api.z.ai).
 Shows TOKENS_LIMIT and TIME_LIMIT quotas.
 Intended for use in polybar.
 
-Usage: zai-quota.py
+ZAI_API_KEY may list several keys separated by commas; the bar then shows
+their mean usage per limit (see quota_accounts.py).
+
+Usage: zai-quota.py [--accounts]
 """
 
-import requests
-import os
 import sys
-from datetime import datetime, timezone
-
-
-def format_time_remaining(minutes_remaining):
-    """Format time remaining in compact form (e.g., '4h 30m', '45m')."""
-    if minutes_remaining is None:
-        return ""
-    if minutes_remaining <= 0:
-        return "now"
-
-    hours = int(minutes_remaining // 60)
-    minutes = int(minutes_remaining % 60)
-
-    if hours > 0:
-        return f"{hours}h {minutes}m"
-    else:
-        return f"{minutes}m"
 
+import quota_accounts
+import quota_forecast
+import quota_format
+import quota_trace
+from quota_cache import cached_many
+from quota_http import get_json
 
-def get_time_to_reset(next_reset_timestamp_ms):
-    """Calculate minutes remaining until nextResetTime (Unix timestamp in milliseconds)."""
-    if not next_reset_timestamp_ms:
-        return None
 
-    now = datetime.now(timezone.utc)
-    reset_time = datetime.fromtimestamp(next_reset_timestamp_ms / 1000, tz=timezone.utc)
-    diff = reset_time - now
+API_URL = "https://api.z.ai/api/monitor/usage/quota/limit"
+ERROR_TEXT = quota_format.ERROR_TEXT
+CACHE_TTL = 300
 
-    return max(0, diff.total_seconds() / 60)
 
-
-def get_color(percentage_remaining):
-    """Return color based on percentage remaining."""
-    if percentage_remaining > 50:
-        return "#2aa198"  # Green
-    elif percentage_remaining >= 20:
-        return "#b58900"  # Yellow
-    else:
-        return "#dc322f"  # Red
-
-
-def format_limit(limit_data, icon="", show_time=True):
-    """Format a single limit for display."""
+def format_limit(limit_data, icon="", show_time=True, warning=""):
+    """Format a single limit for display, followed by any exhaustion warning."""
     if not limit_data:
         if icon:
-            return f"%{{F#dc322f}}{icon}?%{{F-}}"
-        return "%{{F#dc322f}}?%{{F-}}"
+            return f"%{{F{quota_format.RED}}}{icon}?%{{F-}}"
+        return quota_format.ERROR_TEXT
 
     percentage_used = limit_data.get("percentage", 0)
     percentage_remaining = 100 - percentage_used
-    color = get_color(percentage_remaining)
+    color = quota_format.color_for_percent(percentage_remaining)
 
+    # nextResetTime is a Unix timestamp in milliseconds
     next_reset_ms = limit_data.get("nextResetTime")
-    minutes_to_reset = get_time_to_reset(next_reset_ms)
-    time_remaining = format_time_remaining(minutes_to_reset) if (minutes_to_reset is not None and show_time) else ""
+    reset_at = next_reset_ms / 1000 if next_reset_ms else None
+    time_remaining = quota_format.countdown_to(reset_at) if show_time else ""
 
     prefix = f"{icon} " if icon else ""
     if time_remaining:
-        return f"{prefix}%{{F{color}}}{int(percentage_remaining)}%%{{F-}} [{time_remaining}]"
+        return f"{prefix}%{{F{color}}}{int(percentage_remaining)}%%{{F-}} [{time_remaining}]{warning}"
     else:
-        return f"{prefix}%{{F{color}}}{int(percentage_remaining)}%%{{F-}}"
+        return f"{prefix}%{{F{color}}}{int(percentage_remaining)}%%{{F-}}{warning}"
 
 
-# ZAI API Key
-api_key = os.environ.get('ZAI_API_KEY', '')
+def limit_warning(forecast, metric, limit_data):
+    """quota_forecast warning for a limit, measured against its nextResetTime."""
+    reset_ms = (limit_data or {}).get("nextResetTime")
+    return quota_forecast.warning(forecast, metric, reset_ms / 1000 if reset_ms else None)
 
-if not api_key:
-    print("%{{F#dc322f}}?%{{F-}}")
-    sys.exit(1)
 
-# Get quota data from zai API
-try:
+def fetch_limits(api_key):
+    """Fetch quota limits from the zai API."""
     headers = {"Authorization": api_key, "Content-Type": "application/json"}
-    response = requests.get(
-        "https://api.z.ai/api/monitor/usage/quota/limit",
-        headers=headers,
-        timeout=10
-    )
-    response.raise_for_status()
-    data = response.json()
-except Exception:
-    print("%{{F#dc322f}}?%{{F-}}")
-    sys.exit(1)
-
-# Extract quota data
-try:
+    return get_json(API_URL, headers=headers, timeout=10)
+
+
+def format_limits(data, forecast=None):
+    """Format TOKENS_LIMIT and TIME_LIMIT quotas. Raises if neither is present.
+
+    `forecast` is the quota_forecast state used for exhaustion warnings.
+    """
     limits = data.get("data", {}).get("limits", [])
 
     # Find limits by type
@@ -114,23 +83,79 @@ try:
             time_limit = item
 
     if tokens_limit is None and time_limit is None:
-        print("%{{F#dc322f}}?%{{F-}}")
-        sys.exit(1)
+        raise KeyError("no TOKENS_LIMIT or TIME_LIMIT in response")
 
     # Format main token limit (no icon, with time)
-    tokens_str = format_limit(tokens_limit, icon="", show_time=True)
+    tokens_str = format_limit(tokens_limit, icon="", show_time=True,
+                              warning=limit_warning(forecast, "tokens", tokens_limit))
 
     # Format time limit (search icon for web tool rate limits, no time)
-    time_str = format_limit(time_limit, icon="\uf002", show_time=False)
+    time_str = format_limit(time_limit, icon="\uf002", show_time=False,
+                            warning=limit_warning(forecast, "time", time_limit))
 
     # Output both quotas
     if tokens_str and time_str:
-        print(f"{tokens_str} · {time_str}")
+        return f"{tokens_str} · {time_str}"
     elif tokens_str:
-        print(tokens_str)
-    else:
-        print(time_str)
-
-except (KeyError, TypeError):
-    print("%{{F#dc322f}}?%{{F-}}")
-    sys.exit(1)
+        return tokens_str
+    return time_str
+
+
+def combine_limits(datas):
+    """Several keys' limits as one response: the mean percentage used per
+    limit type, resetting when the first of them does."""
+    by_type = {}
+    for data in datas:
+        for item in data.get("data", {}).get("limits", []):
+            by_type.setdefault(item.get("type"), []).append(item)
+    limits = []
+    for kind, items in by_type.items():
+        resets = [item["nextResetTime"] for item in items if item.get("nextResetTime")]
+        limits.append({
+            "type": kind,
+            "percentage": sum(item.get("percentage", 0) for item in items) / len(items),
+            "nextResetTime": min(resets) if resets else None,
+        })
+    return {"data": {"limits": limits}}
+
+
+def schedule_windows(data):
+    """Quota windows as (level, fraction remaining, reset time) for quota_schedule."""
+    windows = []
+    for item in data.get("data", {}).get("limits", []):
+        used = item.get("percentage", 0)
+        reset_ms = item.get("nextResetTime")
+        windows.append((used, (100 - used) / 100, reset_ms / 1000 if reset_ms else None))
+    return windows
+
+
+def history_samples(data):
+    """Percent remaining of the token and time limits for quota_history."""
+    metrics = {"TOKENS_LIMIT": "tokens", "TIME_LIMIT": "time"}
+    return {metrics[item["type"]]: 100 - item.get("percentage", 0)
+            for item in data.get("data", {}).get("limits", [])
+            if item.get("type") in metrics}
+
+
+def render(detail=False):
+    """Fetch and format the quota line (per-key lines with `detail`).
+    Raises on any failure."""
+    # ZAI API Keys
+    api_keys = quota_accounts.from_env('ZAI_API_KEY')
+    if not api_keys:
+        raise RuntimeError("ZAI_API_KEY is not set")
+
+    outcomes = cached_many("zai", api_keys, fetch_limits, CACHE_TTL,
+                           windows=schedule_windows, samples=history_samples)
+    with quota_trace.span("format"):
+        return quota_accounts.render("zai", api_keys, outcomes, format_limits, combine_limits,
+                                     mean=True, detail=detail, error_text=ERROR_TEXT)
+
+
+def main():
+    detail = quota_accounts.wants_detail(sys.argv)
+    sys.exit(quota_format.print_line("zai", lambda: render(detail), ERROR_TEXT))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 #!/bin/bash
 #
 # Claude Code Status Line
-# Displays: model, context window %, tokens, git info
+# Displays: model, provider quota, context window %, tokens, git info
 #
 
 # Prevent git from taking optional locks that refresh the index.
@@ -27,6 +27,14 @@ get_provider() {
     esac
 }
 
+# Quota monitor (polybar/quota_snapshot.py) slot for the active provider
+get_quota_slot() {
+    case "${ANTHROPIC_BASE_URL:-}" in
+        "https://api.z.ai/api/anthropic") echo "zai" ;;
+        "https://api.synthetic.new/anthropic") echo "synthetic" ;;
+    esac
+}
+
 # ANSI color codes - use tput if available, otherwise ANSI escapes
 if command -v tput >/dev/null 2>&1 && [ -n "$TERM" ] && [ "$TERM" != "dumb" ]; then
     reset() { tput sgr0; }
@@ -100,6 +108,51 @@ get_token_breakdown() {
     echo "$(fg_cyan)I:$(reset)$(fmt_num $TOTAL_INPUT) $(fg_green)O:$(reset)$(fmt_num $TOTAL_OUTPUT) $(fg_yellow)W:$(reset)$(fmt_num $CACHE_CREATE) $(fg_magenta)R:$(reset)$(fmt_num $CACHE_READ) $(fg_white)T:$(reset)$(fmt_num $total)"
 }
 
+# Remaining quota from the polybar quota monitors' snapshot file. Read with
+# bash builtins only (no external commands, no network), so it costs under a
+# millisecond; prints nothing if the monitors haven't published the slot.
+quota_info() {
+    local slot=$1
+    local file="${XDG_RUNTIME_DIR:-/tmp}/quota-monitors/snapshot"
+    local magic version name pct reset_at balance fetched_at status _
+    [[ -n "$slot" && -r "$file" ]] || return
+
+    {
+        read -r magic version _ || return
+        [[ "$magic" == "quota-snapshot" && "$version" == "1" ]] || return
+        while read -r name pct reset_at balance fetched_at status _; do
+            [[ "$name" == "$slot" ]] && break
+            name=""
+        done
+    } < "$file"
+    [[ -n "$name" && "$pct" =~ ^[0-9]+$ ]] || return
+
+    local color
+    if (( pct > 50 )); then
+        color=$(fg_green)
+    elif (( pct >= 20 )); then
+        color=$(fg_yellow)
+    else
+        color=$(fg_red)
+    fi
+    echo -n "$(fg_white)Quota:$(reset) ${color}${pct}%$(reset)"
+
+    # Time to reset, as the polybar monitors show it
+    local now left
+    printf -v now '%(%s)T' -1
+    if [[ "$reset_at" =~ ^[0-9]+$ ]] && (( reset_at > now )); then
+        left=$(( (reset_at - now) / 60 ))
+        if (( left >= 1440 )); then
+            echo -n " [$((left / 1440))d $((left % 1440 / 60))h]"
+        elif (( left >= 60 )); then
+            echo -n " [$((left / 60))h $((left % 60))m]"
+        else
+            echo -n " [${left}m]"
+        fi
+    fi
+    [[ "$status" == "ok" ]] || echo -n "$(dim)~$(reset)"
+}
+
 # Git information gathering
 git_info() {
     local dir="$CWD"
@@ -178,6 +231,7 @@ git_info() {
 # Build status line components
 provider_section="$(bold)$(fg_yellow)$(get_provider)$(reset)"
 model_section="$(bold)$(fg_cyan)${MODEL_ID}$(reset)"
+quota_section=$(quota_info "$(get_quota_slot)")
 context_section="$(fg_white)Ctx:$(reset) $(context_color "$CONTEXT_PERCENT")${CONTEXT_PERCENT}%$(reset)"
 token_section="$(get_token_breakdown)"
 git_section=$(git_info)
@@ -186,6 +240,7 @@ git_section=$(git_info)
 status_line=""
 status_line+="${provider_section}"
 status_line+="${SEP}${model_section}"
+[[ -n "$quota_section" ]] && status_line+="${SEP}${quota_section}"
 status_line+="${SEP}${context_section}"
 status_line+="${SEP}${token_section}"
 [[ -n "$git_section" ]] && status_line+="${SEP}${git_section}"